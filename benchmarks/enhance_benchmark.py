@@ -0,0 +1,128 @@
+"""Compare the ffmpeg and NumPy audio enhancement engines, and check that
+they agree.
+
+Generates a test track with ffmpeg (noisy, speech-like bursts), enhances a
+copy with each engine and reports their wall-clock times. Then checks
+
+- that the NumPy engine's block processing matches running its chain over
+  the whole signal at once (overlap-add at the block edges), and
+- that its output matches the ffmpeg chain's in integrated loudness and in
+  level per octave band,
+
+and exits non-zero if any check fails.
+
+    uv run benchmarks/enhance_benchmark.py --duration 3600 --threads 16
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import signal
+
+from multicam_podcast_editor import dsp_enhance
+from multicam_podcast_editor.audio_enhancement import podcast_audio
+from multicam_podcast_editor.pcm import read_pcm
+
+# octave bands the chains actually shape (highpass to lowpass)
+BANDS = (125, 250, 500, 1000, 2000, 4000)
+
+
+def _make_track(path: str, duration: float):
+    if os.path.exists(path):
+        return
+
+    audio = (
+        f"anoisesrc=d={duration}:c=pink:r=48000:a=0.4:seed=3,"
+        "volume='0.05+0.95*gt(sin(t*1.7)*sin(t*0.23),0)':eval=frame[speech];"
+        f"anoisesrc=d={duration}:c=white:r=48000:a=0.004:seed=4[noise];"
+        "[speech][noise]amix=inputs=2:normalize=0"
+    )
+    cmd = ["ffmpeg", "-v", "error", "-y", "-f", "lavfi"]
+    cmd += ["-i", f"color=c=gray:s=160x90:r=5:d={duration}"]
+    cmd += ["-filter_complex", audio, "-c:v", "libx264", "-preset", "ultrafast"]
+    cmd += ["-c:a", "aac", "-b:a", "192k", "-shortest", path]
+    subprocess.run(cmd, check=True)
+
+
+def _band_levels(audio: np.ndarray) -> np.ndarray:
+    levels = []
+    for center in BANDS:
+        sos = signal.butter(
+            4, [center / 2**0.5, center * 2**0.5], "bandpass", fs=dsp_enhance.SAMPLE_RATE, output="sos"
+        )
+        band = signal.sosfilt(sos, audio.mean(axis=1))
+        levels.append(10 * np.log10(np.mean(band**2) + 1e-20))
+    return np.array(levels)
+
+
+def _check_blocks(source: str, enhance_type: str, seconds: float, threads: int) -> bool:
+    audio = read_pcm(source, dsp_enhance.SAMPLE_RATE, 2, duration=seconds)
+    whole = dsp_enhance.process(audio, enhance_type)
+
+    pieces = [audio[i : i + 100000] for i in range(0, len(audio), 100000)]
+    blocks = []
+    with ProcessPoolExecutor(max_workers=threads) as pool:
+        dsp_enhance.enhance_stream(pieces, 2, enhance_type, pool, threads, blocks.append)
+    blocked = np.concatenate(blocks)
+
+    error = float(np.abs(blocked - whole).max())
+    ok = blocked.shape == whole.shape and error < 1e-6
+    print(f"{enhance_type}: blocks vs whole signal, max difference {error:.2e} {'ok' if ok else 'FAIL'}")
+    return ok
+
+
+def _check_engines(ffmpeg_out: str, numpy_out: str, enhance_type: str, tolerance_db: float) -> bool:
+    reference = read_pcm(ffmpeg_out, dsp_enhance.SAMPLE_RATE, 2)
+    ours = read_pcm(numpy_out, dsp_enhance.SAMPLE_RATE, 2)
+
+    loudness = dsp_enhance.loudness(ours) - dsp_enhance.loudness(reference)
+    bands = _band_levels(ours) - _band_levels(reference)
+    ok = abs(loudness) <= tolerance_db and bool(np.all(np.abs(bands) <= tolerance_db))
+
+    print(f"{enhance_type}: integrated loudness numpy - ffmpeg {loudness:+.2f} LU")
+    for center, diff in zip(BANDS, bands):
+        print(f"{enhance_type}:   {center:>5} Hz band {diff:+.2f} dB")
+    print(f"{enhance_type}: engines within {tolerance_db} dB {'ok' if ok else 'FAIL'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=1800)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--types", nargs="+", default=["podcast", "music"])
+    parser.add_argument("--block-check-seconds", type=float, default=120)
+    parser.add_argument("--tolerance-db", type=float, default=1.5)
+    parser.add_argument("--workdir", default="temp/bench_enhance")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    source = f"{args.workdir}/source.mp4"
+    _make_track(source, args.duration)
+
+    ok = True
+    for enhance_type in args.types:
+        outputs = {}
+        for engine in ("ffmpeg", "numpy"):
+            output = f"{args.workdir}/{enhance_type}_{engine}.mp4"
+            shutil.copy(source, output)
+            start = time.perf_counter()
+            podcast_audio([output], enhance_type, args.threads, two_pass=True, use_cache=False, engine=engine)
+            elapsed = time.perf_counter() - start
+            print(f"{enhance_type}, {engine}: {elapsed:.1f}s ({args.duration / elapsed:.1f}x realtime)")
+            outputs[engine] = output
+
+        ok &= _check_blocks(source, enhance_type, args.block_check_seconds, args.threads)
+        ok &= _check_engines(outputs["ffmpeg"], outputs["numpy"], enhance_type, args.tolerance_db)
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
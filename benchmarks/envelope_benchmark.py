@@ -0,0 +1,106 @@
+"""Compare the streaming envelope engine against per-window MoviePy max_volume.
+
+Generates a synthetic multitrack (tiny video, noisy speech-like audio) with
+ffmpeg and times both ways of building `average_volumes`.
+
+    uv run benchmarks/envelope_benchmark.py --tracks 5 --duration 7200
+"""
+
+import argparse
+import os
+import subprocess
+import time
+
+import numpy as np
+from moviepy import VideoFileClip
+
+from multicam_podcast_editor.envelope import compute_envelopes
+
+
+def _make_track(path: str, duration: float, seed: int):
+    if os.path.exists(path):
+        return
+
+    # amplitude-modulated noise so the buckets actually differ per track
+    audio = (
+        f"anoisesrc=d={duration}:c=pink:r=44100:a=0.5:seed={seed},"
+        f"volume='0.2+0.8*gt(sin(t*{0.05 + seed * 0.013}),0)':eval=frame"
+    )
+    cmd = [
+        "ffmpeg",
+        "-v",
+        "error",
+        "-y",
+        "-f",
+        "lavfi",
+        "-i",
+        f"color=c=gray:s=160x90:r=5:d={duration}",
+        "-f",
+        "lavfi",
+        "-i",
+        audio,
+        "-c:v",
+        "libx264",
+        "-preset",
+        "ultrafast",
+        "-c:a",
+        "aac",
+        "-b:a",
+        "128k",
+        "-shortest",
+        path,
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def _moviepy_volumes(paths: list[str]) -> list[list[float]]:
+    volumes = []
+    for path in paths:
+        aud = VideoFileClip(path).audio
+        volumes.append(
+            [
+                aud.subclipped(x, x + 5).max_volume()  # pyright: ignore
+                for x in range(0, int(aud.duration - 5) + 1, 5)  # pyright: ignore
+            ]
+        )
+    return volumes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tracks", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=7200)
+    parser.add_argument("--threads", type=int, default=10)
+    parser.add_argument("--workdir", default="temp/bench_envelope")
+    parser.add_argument(
+        "--skip-moviepy", action="store_true", help="only time the new engine"
+    )
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    paths = [f"{args.workdir}/track{i}.mp4" for i in range(args.tracks)]
+    for i, path in enumerate(paths):
+        _make_track(path, args.duration, i)
+
+    start = time.perf_counter()
+    envelopes = compute_envelopes([(p, 0.0) for p in paths], threads=args.threads)
+    new_volumes = [env.buckets(5.0) for env in envelopes]
+    new_time = time.perf_counter() - start
+    print(f"envelope engine: {new_time:.2f}s")
+
+    if args.skip_moviepy:
+        return
+
+    start = time.perf_counter()
+    old_volumes = _moviepy_volumes(paths)
+    old_time = time.perf_counter() - start
+    print(f"moviepy max_volume: {old_time:.2f}s ({old_time / new_time:.1f}x slower)")
+
+    for i, (old, new) in enumerate(zip(old_volumes, new_volumes)):
+        n = min(len(old), len(new))
+        diff = np.max(np.abs(np.subtract(old[:n], new[:n]))) if n else 0.0
+        print(f"track {i}: {len(old)} vs {len(new)} buckets, max abs diff {diff:.5f}")
+
+
+if __name__ == "__main__":
+    main()
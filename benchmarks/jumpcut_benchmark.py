@@ -0,0 +1,78 @@
+"""Compare the jump-cut engines at 10, 100 and 1000 cuts.
+
+Generates a test video with ffmpeg, cuts evenly spaced gaps out of it with
+every engine and reports the wall-clock time of each.
+
+    uv run benchmarks/jumpcut_benchmark.py --duration 1800 --cuts 10 100 1000
+"""
+
+import argparse
+import os
+import subprocess
+import time
+
+from multicam_podcast_editor.jumpcuts import JUMPCUT_ENGINES, render_jumpcut
+
+
+def _make_video(path: str, duration: float, size: str):
+    if os.path.exists(path):
+        return
+
+    cmd = [
+        "ffmpeg",
+        "-v",
+        "error",
+        "-y",
+        "-f",
+        "lavfi",
+        "-i",
+        f"testsrc2=s={size}:r=30:d={duration}",
+        "-f",
+        "lavfi",
+        "-i",
+        f"sine=f=440:r=48000:d={duration}",
+        "-c:v",
+        "libx264",
+        "-preset",
+        "ultrafast",
+        "-c:a",
+        "aac",
+        path,
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def _keep_intervals(duration: float, cuts: int, gap: float):
+    step = duration / (cuts + 1)
+    return [(i * step + (gap if i > 0 else 0.0), (i + 1) * step) for i in range(cuts + 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--duration", type=float, default=1800)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--cuts", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--gap", type=float, default=0.5)
+    parser.add_argument("--threads", type=int, default=10)
+    parser.add_argument("--engines", nargs="+", default=list(JUMPCUT_ENGINES))
+    parser.add_argument("--workdir", default="temp/bench_jumpcut")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    source = f"{args.workdir}/source.mp4"
+    _make_video(source, args.duration, args.size)
+
+    for cuts in args.cuts:
+        keep = _keep_intervals(args.duration, cuts, args.gap)
+        for engine in args.engines:
+            output = f"{args.workdir}/out_{engine}_{cuts}.mp4"
+            start = time.perf_counter()
+            render_jumpcut(source, keep, output, args.threads, engine)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{cuts} cuts, {engine}: {elapsed:.1f}s ({args.duration / elapsed:.1f}x realtime)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Compare the multicam render backends on a synthetic multicam timeline.
+
+Generates a main camera plus person cameras with ffmpeg, builds a random
+timeline of camera switches and renders it with every backend.
+
+    uv run benchmarks/multicam_render_benchmark.py --cameras 4 --duration 1800
+"""
+
+import argparse
+import os
+import random
+import subprocess
+import time
+from pathlib import Path
+
+from multicam_podcast_editor.multicam import RENDER_BACKENDS, render_timeline
+
+
+def _make_camera(path: str, duration: float, seed: int, size: str):
+    if os.path.exists(path):
+        return
+
+    cmd = [
+        "ffmpeg",
+        "-v",
+        "error",
+        "-y",
+        "-f",
+        "lavfi",
+        "-i",
+        f"testsrc2=s={size}:r=30:d={duration},hue=h={seed * 60}",
+        "-f",
+        "lavfi",
+        "-i",
+        f"sine=f={220 + seed * 110}:r=48000:d={duration}",
+        "-c:v",
+        "libx264",
+        "-preset",
+        "ultrafast",
+        "-g",
+        "60",
+        "-c:a",
+        "aac",
+        path,
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def _random_timeline(cameras: int, duration: float, seed: int):
+    rng = random.Random(seed)
+    segments = []
+    t = 0.0
+    while t < duration - 1:
+        length = min(rng.choice([5, 5, 10, 15, 30]), duration - t)
+        segments.append((rng.randrange(cameras), t, float(length)))
+        t += length
+    return segments
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cameras", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=1800)
+    parser.add_argument("--size", default="1280x720")
+    parser.add_argument("--threads", type=int, default=10)
+    parser.add_argument("--render-workers", type=int, default=0)
+    parser.add_argument("--backends", nargs="+", default=list(RENDER_BACKENDS))
+    parser.add_argument("--workdir", default="temp/bench_multicam")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    paths = [f"{args.workdir}/camera{i}.mp4" for i in range(args.cameras)]
+    for i, path in enumerate(paths):
+        _make_camera(path, args.duration, i, args.size)
+
+    timeline = _random_timeline(args.cameras, args.duration, 0)
+    paddings = [0.0 for _ in paths]
+    print(f"{len(timeline)} segments over {args.duration}s")
+
+    for backend in args.backends:
+        output = Path(args.workdir) / f"out_{backend}.mp4"
+        start = time.perf_counter()
+        render_timeline(
+            timeline,
+            paths,
+            paddings,
+            output,
+            args.threads,
+            backend=backend,
+            render_workers=args.render_workers,
+            use_cache=False,
+        )
+        elapsed = time.perf_counter() - start
+        print(f"{backend}: {elapsed:.1f}s ({args.duration / elapsed:.1f}x realtime)")
+
+
+if __name__ == "__main__":
+    main()
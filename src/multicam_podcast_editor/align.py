@@ -0,0 +1,116 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import numpy as np
+from scipy import fft
+
+from multicam_podcast_editor.pcm import read_pcm
+from multicam_podcast_editor.tprint import print_decorator
+
+print = print_decorator(print)
+
+COARSE_RATE = 8000
+FINE_RATE = 44100
+
+# Only this much of each track takes part in the coarse correlation, and no
+# track may start more than MAX_OFFSET seconds before/after the target.
+SEARCH_SECONDS = 600.0
+MAX_OFFSET = 300.0
+
+# The fine pass re-reads this much audio at full rate around the coarse peak.
+FINE_SECONDS = 30.0
+FINE_MARGIN = 0.01
+
+
+def _gcc_phat(reference: np.ndarray, other: np.ndarray, max_lag: int) -> np.ndarray:
+    """Cross-correlation of `other` against `reference` for lags in ±max_lag.
+
+    Index ``max_lag + k`` holds the score of ``other[n] ~ reference[n + k]``.
+    The spectrum is whitened (PHAT) so different microphones recording the
+    same room still give one sharp peak.
+    """
+
+    n = fft.next_fast_len(len(reference) + len(other))
+    spectrum = fft.rfft(reference, n, workers=-1) * np.conj(fft.rfft(other, n, workers=-1))
+    spectrum /= np.abs(spectrum) + 1e-12
+    corr = fft.irfft(spectrum, n, workers=-1)
+
+    # negative lags wrap around to the end of the circular correlation
+    return np.concatenate([corr[n - max_lag :], corr[: max_lag + 1]])
+
+
+def _best_lag(reference: np.ndarray, other: np.ndarray, max_lag: int) -> int:
+    corr = _gcc_phat(reference, other, max_lag)
+    return int(np.argmax(corr)) - max_lag
+
+
+def find_offset(
+    target: str,
+    other: str,
+    target_coarse: np.ndarray | None = None,
+    search_seconds: float = SEARCH_SECONDS,
+    max_offset: float = MAX_OFFSET,
+) -> float:
+    """Seconds `other` has to be delayed by to line up with `target`.
+
+    A coarse lag is found on decimated mono audio, then refined at the full
+    sample rate on a short section around it.
+    """
+
+    if target_coarse is None:
+        target_coarse = read_pcm(target, COARSE_RATE, 1, 0, search_seconds + max_offset)
+
+    other_coarse = read_pcm(other, COARSE_RATE, 1, 0, search_seconds)
+    if len(other_coarse) == 0 or len(target_coarse) == 0:
+        print(f"no audio to align {other} with, leaving it unpadded")
+        return 0.0
+
+    max_lag = int(max_offset * COARSE_RATE)
+    coarse = _best_lag(target_coarse, other_coarse, max_lag) / COARSE_RATE
+
+    # Fine pass: a section of `other` against the same section of `target`
+    # shifted by the coarse lag, allowing only a couple of coarse samples of
+    # slack either way.
+    section_start = max(0.0, -coarse) + 1.0
+    margin = FINE_MARGIN + 2 / COARSE_RATE
+    other_fine = read_pcm(other, FINE_RATE, 1, section_start, FINE_SECONDS)
+    target_fine = read_pcm(
+        target, FINE_RATE, 1, section_start + coarse - margin, FINE_SECONDS + 2 * margin
+    )
+    if len(other_fine) == 0 or len(target_fine) == 0:
+        return coarse
+
+    fine_lag = _best_lag(target_fine, other_fine, int(margin * FINE_RATE) * 2)
+    # target_fine starts `margin` early, so a perfect coarse guess peaks there
+    return coarse - margin + fine_lag / FINE_RATE
+
+
+def align_tracks(
+    target: str,
+    others: List[str],
+    threads: int = 10,
+    search_seconds: float = SEARCH_SECONDS,
+    max_offset: float = MAX_OFFSET,
+) -> Dict[str, float]:
+    """Align every file in `others` against `target` in parallel.
+
+    Returns the padding per file keyed by its path as given in `others`
+    (not just its name, so same-named files from different directories
+    don't overwrite each other).
+    """
+
+    target_coarse = read_pcm(target, COARSE_RATE, 1, 0, search_seconds + max_offset)
+
+    workers = max(1, min(len(others), threads))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(find_offset, target, other, target_coarse, search_seconds, max_offset)
+            for other in others
+        ]
+        offsets = [f.result() for f in futures]
+
+    result = dict(zip(others, offsets))
+    for name, offset in result.items():
+        print(f"aligned {name} at {offset:.4f}s")
+
+    return result
@@ -0,0 +1,110 @@
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+from multicam_podcast_editor.cache import atomic_write, cache_key, cache_path, evict, file_fingerprint, lookup
+from multicam_podcast_editor.envelope import EnvelopePyramid, compute_envelope
+from multicam_podcast_editor.ingest import Source
+from multicam_podcast_editor.tprint import print_decorator
+
+print = print_decorator(print)
+
+KIND = "analysis"
+MAX_BYTES = 1 << 30
+# whole-file envelopes, for stages that look at one file on its own
+ENVELOPE_KIND = "envelope"
+ENVELOPE_MAX_BYTES = 512 << 20
+# bump whenever what analyze() stores, or how it computes it, changes
+VERSION = 4
+
+
+@dataclass
+class CachedAnalysis:
+    paddings: List[float]
+    durations: List[float]
+    envelopes: List[EnvelopePyramid]
+
+
+def analysis_key(sources: List[Source], max_time: float, align_videos: bool) -> str:
+    # The audio is either the file's own or a sidecar resampled from it to
+    # the main track's rate, which the key has to tell apart.
+    return cache_key(
+        VERSION,
+        [(file_fingerprint(s.path), s.audio_path != s.path, s.sample_rate) for s in sources],
+        float(max_time),
+        bool(align_videos),
+    )
+
+
+def load_analysis(key: str) -> CachedAnalysis | None:
+    path = lookup(KIND, key, ".npz")
+    if path is None:
+        return None
+
+    try:
+        with np.load(path) as data:
+            durations = data["durations"].tolist()
+            envelopes = [
+                EnvelopePyramid(data[f"peak_{i}"], data[f"power_{i}"], duration)
+                for i, duration in enumerate(durations)
+            ]
+            paddings = data["paddings"].tolist()
+    except (OSError, KeyError, ValueError) as e:
+        print(f"ignoring unreadable analysis cache {path}: {e}")
+        return None
+
+    print(f"using cached analysis {path}")
+    return CachedAnalysis(paddings, durations, envelopes)
+
+
+def store_analysis(key: str, paddings: List[float], envelopes: List[EnvelopePyramid]):
+    path = cache_path(KIND, key, ".npz")
+    arrays: dict[str, np.ndarray] = {
+        "paddings": np.asarray(paddings, dtype=np.float64),
+        "durations": np.asarray([env.duration for env in envelopes], dtype=np.float64),
+    }
+    for i, env in enumerate(envelopes):
+        arrays[f"peak_{i}"] = env.level(env.resolution)
+        arrays[f"power_{i}"] = env.power
+
+    atomic_write(path, lambda partial: np.savez(partial, **arrays))
+    print(f"stored analysis in {path}")
+
+    evict(KIND, MAX_BYTES)
+
+
+def _envelope_key(path: str) -> str:
+    return cache_key(VERSION, file_fingerprint(path))
+
+
+def store_envelope(path: str, envelope: EnvelopePyramid):
+    """Keep the envelope of all of `path` (decoded from 0, untrimmed) for later stages."""
+
+    entry = cache_path(ENVELOPE_KIND, _envelope_key(path), ".npz")
+    arrays = {
+        "peak": envelope.level(envelope.resolution),
+        "power": envelope.power,
+        "duration": np.float64(envelope.duration),
+    }
+    atomic_write(entry, lambda partial: np.savez(partial, **arrays))
+    evict(ENVELOPE_KIND, ENVELOPE_MAX_BYTES)
+
+
+def file_envelope(path: str, use_cache: bool = True) -> EnvelopePyramid:
+    """Envelope of the whole of `path`, reusing one stored by an earlier stage or run."""
+
+    if use_cache:
+        cached = lookup(ENVELOPE_KIND, _envelope_key(path), ".npz")
+        if cached is not None:
+            try:
+                with np.load(cached) as data:
+                    print(f"using cached envelope {cached} for {path}")
+                    return EnvelopePyramid(data["peak"], data["power"], float(data["duration"]))
+            except (OSError, KeyError, ValueError) as e:
+                print(f"ignoring unreadable envelope cache {cached}: {e}")
+
+    envelope = compute_envelope(path)
+    if use_cache:
+        store_envelope(path, envelope)
+    return envelope
@@ -1,13 +1,16 @@
-import os
-import shutil
-import subprocess
 from typing import Dict, List
 
-import audalign as ad
-from audalign.config.correlation_spectrogram import CorrelationSpectrogramConfig
+from multicam_podcast_editor.align import align_tracks
+from multicam_podcast_editor.analysis_cache import (
+    analysis_key,
+    load_analysis,
+    store_analysis,
+    store_envelope,
+)
+from multicam_podcast_editor.envelope import compute_envelopes
+from multicam_podcast_editor.ingest import Source
 from multicam_podcast_editor.tprint import print_decorator
 from moviepy import (
-    AudioClip,
     ColorClip,
     VideoClip,
     VideoFileClip,
@@ -18,12 +21,14 @@ print = print_decorator(print)
 
 
 def analyze(
-    vid_list: List[str],
+    sources: List[Source],
     max_time: float,
     align_videos=True,
-    skip_bitrate_sync=False,
     threads=10,
+    bucket: float = 5.0,
+    use_cache: bool = True,
 ):
+    vid_list = [s.path for s in sources]
     print("list of vids found to process" + str(vid_list))
 
     ######### private functions ##############
@@ -34,112 +39,85 @@ def analyze(
 
         return concatenate_videoclips([blank_clip, vid])
 
-    def cleanup_second():
-        if os.path.exists("temp/list.txt"):
-            os.remove("temp/list.txt")
-
-        if os.path.exists("temp/second.mp4"):
-            os.remove("temp/second.mp4")
-
-    def _add_second_to(file: str):
-        cleanup_second()
-        # first add a second to the main video because sometimes it doesn't start first
-        fp_file = os.path.abspath(file)
-
-        command = f"ffmpeg -i '{fp_file}' -t 5 -c:v copy temp/second.mp4"
-        print(f"running command {command}")
-        subprocess.run(command, shell=True)
-
-        with open("temp/list.txt", "w") as filelist:
-            filelist.writelines(["file second.mp4\n", f"file '{fp_file}'"])
-
-        fp_list = os.path.abspath("temp/list.txt")
-        fp_output = os.path.abspath("temp/output.mp4")
-
-        command = f"ffmpeg -f concat -safe 0 -i '{fp_list}' -c copy {fp_output}"
-        print(f"running command {command}")
-        subprocess.run(command, shell=True)
-
-        shutil.move(fp_output, fp_file)
-        cleanup_second()
+    def _shift_video_by(vid: VideoClip, padding: float):
+        # a negative padding means this person started recording before the
+        # main video, so the head of their clip is dropped instead
+        if padding > 0:
+            return _padd_video_by(vid, padding)
+        if padding < 0:
+            return vid.subclipped(-padding)
+        return vid
 
     #################################
 
-    _add_second_to(vid_list[0])
-
-    if os.path.exists("temp/temp_video.mp4"):
-        os.remove("temp/temp_video.mp4")
-
-    print(f"syncing the bit rate of the f8ollowing: {vid_list}")
-    if not skip_bitrate_sync:
-        for vid in vid_list:
-            fp_tempvid = os.path.abspath("temp/temp_video.mp4")
-
-            command = f"ffmpeg -threads {threads} -filter_threads {threads} -filter_complex_threads {threads} -i '{os.path.abspath(vid)}' -c:v copy -b:a 128k -ar 44100 -frame_size 1024 {fp_tempvid}"
-            print(f"running command {command}")
-            subprocess.run(command, shell=True)
-
-            shutil.move(fp_tempvid, vid)
+    key = None
+    cached = None
+    if use_cache:
+        key = analysis_key(sources, max_time, align_videos)
+        cached = load_analysis(key)
 
-    print("finished making all bit rates the same")
+    # Keep track of how much padding was applied to each video so the multicam
+    # step (which now relies exclusively on ffmpeg) can accurately map the
+    # timestamps it generates back to the original source files. The first
+    # entry corresponds to the main video, which defines the timeline and is
+    # never padded.
+    paddings: list[float] = [0.0 for _ in vid_list]
 
-    if align_videos:
+    if cached is not None:
+        paddings = cached.paddings
+    elif align_videos:
         #####################################################
         ### padd the person clips to align them to main vid #
         #####################################################
 
-        config = CorrelationSpectrogramConfig()
-        config.multiprocessing = False
-        correlation_rec = ad.CorrelationSpectrogramRecognizer(config)
-
-        result: Dict[str, float] = ad.target_align(  # pyright: ignore
-            target_file=vid_list[0],
-            directory_path="./temp",
-            recognizer=correlation_rec,
+        result: Dict[str, float] = align_tracks(
+            sources[0].audio_path, [s.audio_path for s in sources[1:]], threads
         )
 
         print(result)
 
-    # Keep track of how much padding was applied to each video so the multicam
-    # step (which now relies exclusively on ffmpeg) can accurately map the
-    # timestamps it generates back to the original source files. The first
-    # entry corresponds to the main video which has no audio-sync padding
-    # applied (only the 5 s duplicate that we remove later).
-    paddings: list[float] = [0.0 for _ in vid_list]
+        for vid_index, source in enumerate(sources[1:], start=1):
+            paddings[vid_index] = result[source.audio_path]
 
     # Load the video clips via MoviePy for further volume analysis.
     vids: list[VideoClip] = [VideoFileClip(v) for v in vid_list]
 
     print("videos loaded")
 
-    if align_videos:
-        for vid_index, vid in enumerate(vid_list):
-            if vid_index == 0:
-                # Remove the duplicated 5-second intro that was added earlier for
-                # safer ffmpeg concat syncing.
-                vids[vid_index] = vids[vid_index].subclipped(5)
-                continue
+    for vid_index, vid in enumerate(vid_list[1:], start=1):
+        padding = paddings[vid_index]
+        print(f"will pad {padding} seconds to {vid}")
+
+        vids[vid_index] = _shift_video_by(vids[vid_index], padding)
+
+    print("finish syncing based on audio")
 
-            padding = result[vid.replace("temp/", "")]  # pyright: ignore
-            paddings[vid_index] = padding
-            print(f"will pad {padding} seconds to {vid}")
+    max_duration = max_time + 10 if max_time > 0 else None
+    if max_duration is not None:
+        # only the start of each file is needed, trim virtually instead of
+        # rewriting the inputs
+        vids = [v.subclipped(0, min(v.duration, max_duration)) for v in vids]
 
-            vids[vid_index] = _padd_video_by(vids[vid_index], padding).subclipped(5)
+    if cached is not None:
+        envelopes = cached.envelopes
+    else:
+        print("Starting video chunking")
+        # source time that lines up with 0 on each clip's timeline
+        tracks = [(s.audio_path, -padding) for s, padding in zip(sources, paddings)]
+        envelopes = compute_envelopes(tracks, max_duration, threads=threads)
 
-        print("finish syncing based on audio")
+        if key is not None:
+            store_analysis(key, paddings, envelopes)
 
-    print("Starting video chunking")
-    average_volumes = []
-    for i, vid in enumerate(vids):
-        aud: AudioClip = vid.audio  # pyright: ignore
-        new_volume = [
-            aud.subclipped(x, x + 5).max_volume()
-            for x in range(0, int(aud.duration - 5) + 1, 5)
-        ]
+            # untrimmed, unshifted tracks are whole-file envelopes the later
+            # stages (jump cuts) can pick up
+            if max_duration is None:
+                for (path, offset), env in zip(tracks, envelopes):
+                    if offset == 0:
+                        store_envelope(path, env)
 
-        average_volumes.append(new_volume)
-        print(f"finished analyzing volume for video {i}")
+    average_volumes = [env.buckets(bucket) for env in envelopes]
 
-    print("finished chunking audio into 5 second average segments")
+    print(f"finished chunking audio into {bucket} second segments")
 
-    return vids, average_volumes, paddings
+    return vids, average_volumes, paddings, envelopes
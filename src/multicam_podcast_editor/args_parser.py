@@ -8,7 +8,12 @@ class Args:
     multicam: bool = False
     short: float | None = None
     till: float | None = None
+    shorts: List[Tuple[float, float | None, str]] = field(default_factory=list)
+    shorts_file: str | None = None
+    find_shorts: int = 0
+    short_length: float = 60.0
     cut: List[Tuple[float, float]] | None = None
+    cut_mode: str = "encode"
     caption_video: bool = False
     caption_csv: str | None = None
     caption_position: Tuple[int, int] | None = None
@@ -19,13 +24,24 @@ class Args:
     screenshare_input: List[str] = field(default_factory=list)
     jump_cuts: bool = False
     jump_cuts_margin: float = 0.75
+    jump_cuts_engine: str = "trim"
+    jump_cuts_threshold: str = "-30dB"
     audio_podcast_enhancements: bool = False
     audio_music_enhancements: bool = False
+    two_pass_loudnorm: bool = False
+    audio_engine: str = "ffmpeg"
     transcribe: bool = False
+    transcribe_workers: int = 1
     skip_bitrate_sync: bool = False
     threads: int = 10
+    render_workers: int = 0
+    multicam_backend: str = "segments"
+    short_backend: str = "moviepy"
+    plan_only: bool = False
     word_pause: float = 1.2
+    bucket_size: float = 5.0
     align_videos: bool = True
+    use_cache: bool = True
     output_name: str = "final"
     caption_type: int = 1
     font: str = "./FreeMonospacedBold.otf"
@@ -71,6 +87,21 @@ def build_parser():
         default=0.75,
         help="The amount of silence to look for x2. defaults to 0.75 so 1.5 seconds of silence is required to jumpcut",
     )
+    parser.add_argument(
+        "-jt",
+        "--jump-cuts-threshold",
+        type=str,
+        help="The level below which audio counts as silence for jumpcuts, like -30dB, or 'auto' to pick it per file from its level histogram. Defaults to -30dB",
+        default="-30dB",
+    )
+    parser.add_argument(
+        "-je",
+        "--jump-cuts-engine",
+        type=str,
+        choices=["trim", "select"],
+        help="how to cut out the silences. 'trim' trims and concatenates the kept parts a chunk at a time in parallel, 'select' runs one select expression over every frame (slow with many cuts). Defaults to trim",
+        default="trim",
+    )
     parser.add_argument(
         "-ape",
         "--audio-podcast-enhancements",
@@ -83,17 +114,38 @@ def build_parser():
         action="store_true",
         help="enhance the audio using some standard music audio filters. Will enhance anything in the output folder that is the --output-name or final.mp4 by default",
     )
+    parser.add_argument(
+        "-tpl",
+        "--two-pass-loudnorm",
+        action="store_true",
+        help="for podcast audio enhancement, measure each file's loudness first (cached) and normalize it linearly instead of loudnorm's dynamic single pass",
+    )
+    parser.add_argument(
+        "-aen",
+        "--audio-engine",
+        type=str,
+        choices=["ffmpeg", "numpy"],
+        help="how to run the audio enhancements. 'ffmpeg' runs the filter chain in ffmpeg (one core per file), 'numpy' runs an equivalent chain in-process over blocks of the audio on all cores. Defaults to ffmpeg",
+        default="ffmpeg",
+    )
     parser.add_argument(
         "-t",
         "--transcribe",
         action="store_true",
         help="transcribe the podcast to a text file. If given 1 input file, it'll transcribe to a csv for captioning. If multiple input files, it'll assume it's the whole multicam setup (see multicam option for how to provide inputs)",
     )
+    parser.add_argument(
+        "-tw",
+        "--transcribe-workers",
+        type=int,
+        help="how many speakers of a multicam transcript to transcribe at the same time. The --threads budget is split between them. Defaults to 1",
+        default=1,
+    )
     parser.add_argument(
         "-sb",
         "--skip-bitrate-sync",
         action="store_true",
-        help="by default the audio bitrates of each file will be made the same",
+        help="by default audio with a different sample rate than the main file is resampled into a small audio-only copy in temp/ingest before mixing",
     )
     parser.add_argument(
         "-nt",
@@ -102,6 +154,27 @@ def build_parser():
         help="the amount of threads to use for certain task when generating video or audio. Defaults to 10",
         default=10,
     )
+    parser.add_argument(
+        "-rw",
+        "--render-workers",
+        type=int,
+        help="how many multicam segments to render at the same time. The --threads budget is split between them. Defaults to half of --threads",
+        default=0,
+    )
+    parser.add_argument(
+        "-mb",
+        "--multicam-backend",
+        type=str,
+        choices=["segments", "filtergraph", "smart", "mezzanine"],
+        help="how to render multicam edits. 'segments' encodes every camera switch separately and concatenates them, 'filtergraph' encodes the whole timeline (and audio mix) in one ffmpeg pass, 'smart' only re-encodes the partial GOPs on either side of each switch and copies the rest (cameras must share codec and format), 'mezzanine' transcodes every camera once to a common cached format and stream-copies the cut out of them. Defaults to segments",
+        default="segments",
+    )
+    parser.add_argument(
+        "-po",
+        "--plan-only",
+        action="store_true",
+        help="for multicam, only decide the camera switches and write them to output/<output-name>.timeline.json and .edl without rendering it. The other requested stages still run, except the ones that work on the rendered video (--cut, --jump-cuts, audio enhancements)",
+    )
     parser.add_argument(
         "-s",
         "--short",
@@ -114,6 +187,41 @@ def build_parser():
         type=float,
         help="When to stop generating the short. If not set, then a short will default to 1 minute. Ex: --short 127 --till 148 (ie, create a 21 second short starting at 127 seconds in until 148s)",
     )
+    parser.add_argument(
+        "--shorts",
+        type=str,
+        nargs=3,
+        action="append",
+        metavar=("START", "END", "NAME"),
+        help="Create several shorts from one analysis. They render in parallel with -shb ffmpeg, the default moviepy backend renders them one after another. Each one is saved to output/NAME.mp4, use - as END for 1 minute. Ex: --shorts 127 148 intro --shorts 900 955 hot-take",
+    )
+    parser.add_argument(
+        "--shorts-file",
+        type=str,
+        help="A file with one 'start end name' short per line, rendered like --shorts",
+    )
+    parser.add_argument(
+        "--find-shorts",
+        type=int,
+        metavar="N",
+        help="Rank the whole episode for the N liveliest non-overlapping ranges (speaker exchanges, loudness swings, laughter and words per second from output/transcript.txt when present), write them to output/<output-name>.shorts.txt and render them like --shorts",
+        default=0,
+    )
+    parser.add_argument(
+        "--short-length",
+        type=float,
+        metavar="seconds",
+        help="The length of the shorts --find-shorts looks for. Defaults to 60",
+        default=60.0,
+    )
+    parser.add_argument(
+        "-shb",
+        "--short-backend",
+        type=str,
+        choices=["moviepy", "ffmpeg"],
+        help="how to render shorts. 'moviepy' composites every window in python, 'ffmpeg' compiles the whole layout into one ffmpeg filter graph (much faster). Defaults to moviepy",
+        default="moviepy",
+    )
     parser.add_argument(
         "-c",
         "--cut",
@@ -122,6 +230,14 @@ def build_parser():
         action="append",
         help="Pairs of start and stop times in seconds to skip. Example: -c 1.0 2.0 -c 3.0 4.0",
     )
+    parser.add_argument(
+        "-cm",
+        "--cut-mode",
+        type=str,
+        choices=["encode", "smart", "copy"],
+        help="how to render --cut. 'encode' re-encodes every kept part, 'smart' re-encodes only the partial GOPs on either side of each cut (none before a keyframe within 0.25s) and stream-copies the rest, 'copy' stream-copies everything from the keyframe before each cut (fastest, cuts may move by up to a second or two). Defaults to encode",
+        default="encode",
+    )
     parser.add_argument(
         "-w",
         "--word-pause",
@@ -129,6 +245,14 @@ def build_parser():
         help="The length of time between words to detect a new line in the transcript. Defaults to 1.2",
         default=1.2,
     )
+    parser.add_argument(
+        "-bs",
+        "--bucket-size",
+        type=float,
+        metavar="seconds",
+        help="The length of the windows used to decide which camera to show in multicam and shorts. Defaults to 5",
+        default=5.0,
+    )
     parser.add_argument(
         "-a",
         "--align-videos",
@@ -136,6 +260,11 @@ def build_parser():
         help="align videos based on volumes",
         default=True,
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="ignore and don't update the cache folder (analysis results, multicam segments etc. kept between runs on the same input files)",
+    )
     parser.add_argument(
         "-o",
         "--output-name",
@@ -273,26 +402,60 @@ def parse_cli_args(args):
     if args.input is not None and len(args.input) > 0:
         inputs: List[str] = sum(args.input, [])
 
+    # these pick up output/<output-name>.mp4, which --plan-only doesn't render
+    # (and would leave an older render of in place)
+    if args.plan_only and args.multicam:
+        needs_render = {
+            "--cut": args.cut is not None,
+            "--jump-cuts": args.jump_cuts,
+            "--audio-podcast-enhancements": args.audio_podcast_enhancements,
+            "--audio-music-enhancements": args.audio_music_enhancements,
+        }
+        conflicts = [flag for flag, used in needs_render.items() if used]
+        if len(conflicts) > 0:
+            raise Exception(
+                f"--plan-only doesn't render the multicam video that {', '.join(conflicts)} work on"
+            )
+
     return Args(
         multicam=args.multicam,
         inputs=inputs,
         screenshare_input=screenshares,
         short=args.short,
         till=args.till,
+        shorts=[
+            (float(start), None if end == "-" else float(end), name)
+            for start, end, name in args.shorts or []
+        ],
+        shorts_file=args.shorts_file,
+        find_shorts=args.find_shorts,
+        short_length=args.short_length,
         cut=args.cut,
+        cut_mode=args.cut_mode,
         jump_cuts=args.jump_cuts,
         jump_cuts_margin=args.jump_cuts_margin,
+        jump_cuts_engine=args.jump_cuts_engine,
+        jump_cuts_threshold=args.jump_cuts_threshold,
         caption_video=args.caption_video,
         caption_csv=args.caption_csv,
         caption_position=int_pos,
         caption_size=int_size,
         audio_podcast_enhancements=args.audio_podcast_enhancements,
         audio_music_enhancements=args.audio_music_enhancements,
+        two_pass_loudnorm=args.two_pass_loudnorm,
+        audio_engine=args.audio_engine,
         transcribe=args.transcribe,
+        transcribe_workers=args.transcribe_workers,
         skip_bitrate_sync=args.skip_bitrate_sync,
         threads=args.threads,
+        render_workers=args.render_workers,
+        multicam_backend=args.multicam_backend,
+        short_backend=args.short_backend,
+        plan_only=args.plan_only,
         word_pause=args.word_pause,
+        bucket_size=args.bucket_size,
         align_videos=args.align_videos,
+        use_cache=not args.no_cache,
         output_name=args.output_name,
         caption_type=args.caption_type,
         font=args.font,
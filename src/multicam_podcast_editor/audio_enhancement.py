@@ -1,8 +1,12 @@
 import os
 import logging
-from shutil import move
 import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
+from multicam_podcast_editor.dsp_enhance import enhance_file
+from multicam_podcast_editor.loudness import linear_loudnorm, measure
 from multicam_podcast_editor.tprint import print_decorator
 
 logging.basicConfig(level=logging.WARNING)
@@ -11,38 +15,160 @@ logging.getLogger("ffmpeg_normalize").setLevel(logging.WARNING)
 print = print_decorator(print)
 
 
-def podcast_audio(vid_list, enhance_type, threads=10):
-    print("list of vids found to process" + str(vid_list))
+ENHANCE_ENGINES = ("ffmpeg", "numpy")
+
+LOUDNORM = "loudnorm=I=-18:TP=-1:LRA=9"
 
-    if os.path.exists("temp_video.mp4"):
-        os.remove("temp_video.mp4")
 
+def _filters(enhance_type: str) -> tuple[str, str | None]:
+    """The filter chain, and the loudnorm that ends it (if any) separately."""
+
+    # decode at 48 kHz like the old WAV extraction did
     if enhance_type == "music":
-        filters = (
-            "afftdn=nr=12:nf=-50, anequalizer='c0 f=200 w=200 g=1.5 t=0, c0 f=7000 w=2000 g=2 t=0, c1 f=200 w=200 g=1.5 t=0, c1 f=7000 w=2000 g=2 t=0', "
+        return (
+            "aresample=48000, afftdn=nr=12:nf=-50, anequalizer='c0 f=200 w=200 g=1.5 t=0, c0 f=7000 w=2000 g=2 t=0, c1 f=200 w=200 g=1.5 t=0, c1 f=7000 w=2000 g=2 t=0', "
             "acompressor=threshold=-18dB:ratio=3:1:attack=5:release=50 "
-        )
-    else:
-        filters = (
-            "highpass=f=100, lowpass=f=5000, adeclip=window=20, afftdn=nf=-50:tn=1, "
-            "alimiter=level_in=1:level_out=1:limit=0.794, compand=attacks=0.5:decays=1:points=-70/-70|-30/-30|-15/-15|0/-10,"
-            " firequalizer=gain_entry='entry(200,-4);entry(4000,-3)', loudnorm=I=-18:TP=-1:LRA=9"
-        )
-
-    for vid in vid_list:
-        subprocess.run(
-            f"ffmpeg -i {vid} -vn -acodec pcm_s16le -ar 48000 temp/temp-audio.wav -y",
-            shell=True,
-        )
-
-        subprocess.run(
-            f'ffmpeg -i temp/temp-audio.wav -af "{filters}"  temp/temp-enhanced-audio2.wav -y',
-            shell=True,
-        )
-
-        subprocess.run(
-            f"ffmpeg -i {vid} -i temp/temp-enhanced-audio2.wav -c:v copy -map 0:v:0 -map 1:a:0 temp/output.mp4 -y",
-            shell=True,
-        )
-
-        move(os.path.abspath("temp/output.mp4"), vid)
+        ), None
+
+    return (
+        "aresample=48000, highpass=f=100, lowpass=f=5000, adeclip=window=20, afftdn=nf=-50:tn=1, "
+        "alimiter=level_in=1:level_out=1:limit=0.794, compand=attacks=0.5:decays=1:points=-70/-70|-30/-30|-15/-15|0/-10,"
+        " firequalizer=gain_entry='entry(200,-4);entry(4000,-3)'"
+    ), LOUDNORM
+
+
+def _enhance(vid: str, filters: str, threads: int):
+    """Filter the audio of `vid` in place, copying its video untouched."""
+
+    directory, base_name = os.path.split(vid)
+    stem, ext = os.path.splitext(base_name)
+    # next to the original so the final rename is atomic
+    partial = os.path.join(directory, f".{stem}.enhancing{ext}")
+
+    cmd = [
+        "ffmpeg",
+        "-v",
+        "error",
+        "-y",
+        "-threads",
+        str(threads),
+        "-i",
+        vid,
+        "-map",
+        "0:v:0?",
+        "-map",
+        "0:a:0",
+        "-c:v",
+        "copy",
+        # back to 48 kHz after loudnorm's internal upsampling
+        "-af",
+        f"{filters}, aresample=48000",
+        partial,
+    ]
+
+    try:
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        os.replace(partial, vid)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+def _measure_all(
+    vid_list: list[str], chain: str, loudnorm: str, workers: int, use_cache: bool
+) -> dict[str, dict]:
+    """loudnorm measurements of every file, skipping the ones already known."""
+
+    measurements: dict[str, dict] = {}
+
+    def _run(vid: str):
+        try:
+            measurements[vid] = measure(vid, chain, loudnorm, use_cache)
+        except (subprocess.CalledProcessError, RuntimeError) as e:
+            details = e.stderr if isinstance(e, subprocess.CalledProcessError) else e
+            print(f"Error measuring loudness of {vid}, falling back to one pass: {details}")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_run, vid_list))
+    return measurements
+
+
+def _numpy_audio(vid_list: list[str], enhance_type: str, threads: int):
+    """One file after the other, each spread over a process pool block by block."""
+
+    workers = max(1, threads)
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        for vid in vid_list:
+            start = time.perf_counter()
+            try:
+                enhance_file(vid, enhance_type, pool, workers, threads)
+            except Exception as e:
+                details = e.stderr if isinstance(e, subprocess.CalledProcessError) else e
+                print(f"Error enhancing audio of {vid}: {details}")
+                if isinstance(e, BrokenProcessPool):
+                    # a worker died (out of memory?), the next file needs a new pool
+                    pool.shutdown(cancel_futures=True)
+                    pool = ProcessPoolExecutor(max_workers=workers)
+                continue
+            print(f"enhanced audio of {vid} in {time.perf_counter() - start:.1f}s")
+    finally:
+        pool.shutdown()
+
+
+def podcast_audio(
+    vid_list, enhance_type, threads=10, two_pass=False, use_cache=True, engine="ffmpeg"
+):
+    """Enhance the audio of every file in `vid_list` in place, concurrently.
+
+    Each file goes through a single ffmpeg process that filters the audio
+    in-graph and stream-copies the video, and only replaces the original once
+    it has been written completely. A failure is reported for its file and
+    doesn't stop the others.
+
+    With `two_pass`, loudnorm first measures every file (audio only, cached
+    by content) and then normalizes linearly with the measured values instead
+    of running its dynamic single-pass mode.
+
+    The ``numpy`` engine runs the same chains in-process over blocks of the
+    audio on all cores instead (see dsp_enhance), and always normalizes
+    linearly.
+    """
+
+    print("list of vids found to process" + str(vid_list))
+    if len(vid_list) == 0:
+        return
+
+    assert engine in ENHANCE_ENGINES, f"unknown enhancement engine {engine}"
+    if engine == "numpy":
+        _numpy_audio(vid_list, enhance_type, threads)
+        return
+
+    chain, loudnorm = _filters(enhance_type)
+    workers = max(1, min(len(vid_list), threads))
+    threads_per_file = max(1, threads // workers)
+
+    measurements: dict[str, dict] = {}
+    if two_pass and loudnorm is not None:
+        start = time.perf_counter()
+        measurements = _measure_all(vid_list, chain, loudnorm, workers, use_cache)
+        print(f"measured loudness in {time.perf_counter() - start:.1f}s")
+
+    def _run(vid: str):
+        filters = chain
+        if vid in measurements:
+            filters += ", " + linear_loudnorm(loudnorm, measurements[vid])
+        elif loudnorm is not None:
+            filters += ", " + loudnorm
+
+        start = time.perf_counter()
+        try:
+            _enhance(vid, filters, threads_per_file)
+        except Exception as e:
+            details = e.stderr if isinstance(e, subprocess.CalledProcessError) else e
+            print(f"Error enhancing audio of {vid}: {details}")
+            return
+        print(f"enhanced audio of {vid} in {time.perf_counter() - start:.1f}s")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_run, vid_list))
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable
+
+from multicam_podcast_editor.tprint import print_decorator
+
+print = print_decorator(print)
+
+# Lives next to temp/ and output/, but unlike temp/ it survives between runs.
+CACHE_DIR = Path("cache")
+
+_SAMPLE_SIZE = 1 << 20
+_fingerprints: dict[tuple[str, int, int], str] = {}
+
+
+def file_fingerprint(path: str) -> str:
+    """Content hash of a media file.
+
+    Hashing tens of GB of video on every run would cost as much as the work
+    the caches save, so this hashes the size plus 1 MiB from the start, the
+    middle and the end of the file. Any re-encode, trim or remux changes at
+    least one of those.
+    """
+
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if memo_key in _fingerprints:
+        return _fingerprints[memo_key]
+
+    digest = hashlib.sha256(str(stat.st_size).encode())
+    with open(path, "rb") as f:
+        for offset in (0, stat.st_size // 2, stat.st_size - _SAMPLE_SIZE):
+            f.seek(max(0, offset))
+            digest.update(f.read(_SAMPLE_SIZE))
+
+    fingerprint = digest.hexdigest()
+    _fingerprints[memo_key] = fingerprint
+    return fingerprint
+
+
+def cache_key(*parts) -> str:
+    """Stable key for any mix of fingerprints and parameters."""
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+
+def cache_path(kind: str, key: str, ext: str) -> Path:
+    directory = CACHE_DIR / kind
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"{key}{ext}"
+
+
+def atomic_write(path: Path, writer: Callable[[Path], None]):
+    """Have `writer` fill a temporary file next to `path`, then move it into place.
+
+    An interrupted run can't leave a truncated entry behind, and concurrent
+    writers of the same entry each get their own temporary name, so the
+    last complete one wins. The temporary name keeps `path`'s suffix for
+    writers that pick the format from it (np.save, ffmpeg).
+    """
+
+    fd, name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.stem}.", suffix=path.suffix)
+    os.close(fd)
+    partial = Path(name)
+    try:
+        writer(partial)
+        partial.replace(path)
+    finally:
+        partial.unlink(missing_ok=True)
+
+
+def lookup(kind: str, key: str, ext: str) -> Path | None:
+    """Return the cached file if present, marking it as recently used."""
+    path = cache_path(kind, key, ext)
+    if not path.exists():
+        return None
+
+    path.touch()
+    return path
+
+
+def evict(kind: str, max_bytes: int):
+    """Drop least recently used entries of `kind` until it fits in `max_bytes`."""
+    directory = CACHE_DIR / kind
+    if not directory.exists():
+        return
+
+    entries = sorted(
+        # dot files are atomic_write's entries still being written
+        (p for p in directory.iterdir() if p.is_file() and not p.name.startswith(".")),
+        key=lambda p: p.stat().st_mtime,
+    )
+    total = sum(p.stat().st_size for p in entries)
+
+    for entry in entries:
+        if total <= max_bytes:
+            break
+        total -= entry.stat().st_size
+        entry.unlink()
+        print(f"evicted {entry} from the {kind} cache")
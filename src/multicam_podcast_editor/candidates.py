@@ -0,0 +1,154 @@
+import re
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+from multicam_podcast_editor.tprint import print_decorator
+
+print = print_decorator(print)
+
+# (speaker, start seconds, text) as written to output/transcript.txt
+TranscriptEntry = Tuple[str, float, str]
+
+LAUGHTER = re.compile(r"laugh|haha", re.IGNORECASE)
+
+# how much each (standardized) feature counts towards a window's score
+WEIGHTS = {
+    "exchanges": 1.0,
+    "loudness_variance": 0.75,
+    "laughter": 1.5,
+    "words_per_second": 0.5,
+}
+
+_TRANSCRIPT_LINE = re.compile(r"^\[(\d+)h (\d+)m (\d+)s\] ([^:]+): (.*)$")
+
+
+def load_transcript(path: str = "output/transcript.txt") -> List[TranscriptEntry]:
+    """Parse a transcript written by :pyfunc:`transcribe`."""
+
+    entries: List[TranscriptEntry] = []
+    for line in Path(path).read_text().splitlines():
+        match = _TRANSCRIPT_LINE.match(line)
+        if match:
+            hours, minutes, seconds, name, text = match.groups()
+            entries.append((name, int(hours) * 3600 + int(minutes) * 60 + int(seconds), text))
+    return entries
+
+
+def _window_sums(values: np.ndarray, width: int) -> np.ndarray:
+    """Sum of every `width` long window of `values`, by prefix sums."""
+    prefix = np.concatenate([[0.0], np.cumsum(values, dtype=np.float64)])
+    return prefix[width:] - prefix[:-width]
+
+
+def _standardize(values: np.ndarray) -> np.ndarray:
+    std = values.std()
+    return (values - values.mean()) / std if std > 0 else np.zeros_like(values)
+
+
+def _window_width(bucket_total: int, length: float, bucket: float) -> int:
+    return min(bucket_total, max(1, round(length / bucket)))
+
+
+def window_features(
+    average_volumes: List[List[float]],
+    transcript: List[TranscriptEntry] | None,
+    length: float,
+    bucket: float = 5.0,
+    speaker_paddings: dict[str, float] | None = None,
+) -> dict[str, np.ndarray]:
+    """Per-feature score of every `length` second window starting on a bucket.
+
+    Transcript times are in each speaker's own recording, `speaker_paddings`
+    (speaker name to alignment padding) moves them onto the main timeline
+    the volumes are on.
+    """
+
+    bucket_total = max(len(v) for v in average_volumes[1:])
+    people = np.full((len(average_volumes) - 1, bucket_total), -100.0)
+    for p, xvol in enumerate(average_volumes[1:]):
+        people[p, : len(xvol)] = xvol
+    width = _window_width(bucket_total, length, bucket)
+
+    loudness = people.max(axis=0)
+    mean = _window_sums(loudness, width) / width
+    loudness_variance = _window_sums(loudness**2, width) / width - mean**2
+
+    exchanges = np.zeros(bucket_total)
+    laughter = np.zeros(bucket_total)
+    words = np.zeros(bucket_total)
+    if transcript:
+        speaker_paddings = speaker_paddings or {}
+        # timeline = source time + padding, and in timeline order again so
+        # exchanges compare neighbours in time
+        transcript = sorted(
+            ((name, start + speaker_paddings.get(name, 0.0), text) for name, start, text in transcript),
+            key=lambda entry: entry[1],
+        )
+        starts = np.asarray([start for _, start, _ in transcript])
+        idx = np.clip((starts / bucket).astype(np.int64), 0, bucket_total - 1)
+        speakers = [name for name, _, _ in transcript]
+        changed = np.asarray([False] + [a != b for a, b in zip(speakers, speakers[1:])])
+        np.add.at(exchanges, idx, changed)
+        np.add.at(laughter, idx, [len(LAUGHTER.findall(text)) for _, _, text in transcript])
+        np.add.at(words, idx, [len(text.split()) for _, _, text in transcript])
+    else:
+        # without a transcript, a change of the loudest person stands in for
+        # a change of speaker
+        winner = people.argmax(axis=0)
+        exchanges[1:] = winner[1:] != winner[:-1]
+
+    return {
+        "exchanges": _window_sums(exchanges, width),
+        "loudness_variance": loudness_variance,
+        "laughter": _window_sums(laughter, width),
+        "words_per_second": _window_sums(words, width) / (width * bucket),
+    }
+
+
+def find_short_candidates(
+    average_volumes: List[List[float]],
+    transcript: List[TranscriptEntry] | None = None,
+    length: float = 60.0,
+    count: int = 5,
+    bucket: float = 5.0,
+    speaker_paddings: dict[str, float] | None = None,
+) -> List[Tuple[float, float, float]]:
+    """Rank every `length` second window and return the best `count` that don't overlap.
+
+    Windows are scored on speaker exchanges, loudness variance, laughter and
+    words per second (the last two only with a transcript), each standardized
+    across the episode and weighted by :pydata:`WEIGHTS`. See
+    `window_features` for `speaker_paddings`. Returns ``(start, end, score)``
+    in seconds, best first.
+    """
+
+    features = window_features(average_volumes, transcript, length, bucket, speaker_paddings)
+    scores = sum(WEIGHTS[name] * _standardize(values) for name, values in features.items())
+    scores = np.asarray(scores, dtype=np.float64)
+
+    bucket_total = max(len(v) for v in average_volumes[1:])
+    width = _window_width(bucket_total, length, bucket)
+    taken = np.zeros(bucket_total, dtype=bool)
+    candidates: List[Tuple[float, float, float]] = []
+    for start in np.argsort(-scores, kind="stable").tolist():
+        if len(candidates) >= count:
+            break
+        if taken[start : start + width].any():
+            continue
+        taken[start : start + width] = True
+        candidates.append((start * bucket, (start + width) * bucket, float(scores[start])))
+
+    for start, end, score in candidates:
+        print(f"short candidate {start:.0f}s - {end:.0f}s (score {score:.2f})")
+    return candidates
+
+
+def write_short_ranges(path: Path, candidates: List[Tuple[float, float, float]], name: str):
+    """Write candidates in the ``--shorts-file`` format."""
+
+    lines = ["# start end name (score)"]
+    for n, (start, end, score) in enumerate(candidates, start=1):
+        lines.append(f"{start:.0f} {end:.0f} {name}-short{n}  # {score:.2f}")
+    path.write_text("\n".join(lines) + "\n")
@@ -4,8 +4,6 @@ import random
 from typing import List, TypedDict
 
 from numpy.lib import math
-import torch
-from faster_whisper import WhisperModel
 from moviepy import (
     Clip,
     CompositeVideoClip,
@@ -14,6 +12,8 @@ from moviepy import (
     vfx,
 )
 
+from multicam_podcast_editor.whisper_models import get_model
+
 AVOID_LIST = {
     "a",
     "about",
@@ -158,9 +158,7 @@ def transcribe_file(file: str):
     video = VideoFileClip(file)
     video.audio.write_audiofile("temp/temp.wav")  # pyright: ignore
 
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-
-    model = WhisperModel("large-v3", device, compute_type="float32")
+    model = get_model("large-v3")
     segments, _ = model.transcribe(
         "temp/temp.wav",
         suppress_tokens=[],
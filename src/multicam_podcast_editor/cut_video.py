@@ -1,17 +1,127 @@
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Tuple
 import subprocess
 import os
 import tempfile
+from multicam_podcast_editor.jumpcuts import _trim_graph
+from multicam_podcast_editor.media_index import (
+    MATCHING_ENCODERS,
+    MediaIndex,
+    matching_encode,
+    media_index,
+)
 from multicam_podcast_editor.tprint import print_decorator
 
 print = print_decorator(print)
 
+CUT_MODES = ("encode", "smart", "copy")
+
+# how far from a keyframe a cut point may be for `smart` to stream-copy
+KEYFRAME_TOLERANCE = 0.25
+
+
+
+def _play_segments(cuts: List[Tuple[float, float]], duration: float) -> List[Tuple[float, float]]:
+    # Sort cuts by start time and calculate playable segments
+    sorted_cuts = sorted(cuts, key=lambda x: x[0])
+    play_segments = []
+    start = 0
+    for cut_start, cut_end in sorted_cuts:
+        if start < cut_start:
+            play_segments.append((start, cut_start))
+        start = cut_end
+    if start < duration:
+        play_segments.append((start, duration))
+    return play_segments
+
+
+def _encode_cmd(vid: str, start: float, end: float, threads: int, output: str) -> List[str]:
+    # -ss before -i seeks to the keyframe before `start` and only decodes from
+    # there, and still trims exactly at `start` since the stream is re-encoded
+    return [
+        "ffmpeg",
+        "-y",
+        "-ss",
+        str(start),
+        "-t",
+        str(end - start),
+        "-i",
+        vid,
+        "-c:v",
+        "libx264",
+        "-c:a",
+        "aac",
+        "-preset",
+        "slow",
+        "-b:v",
+        "3000k",
+        "-threads",
+        str(threads),
+        "-avoid_negative_ts",
+        "make_zero",
+        output,
+    ]
+
+
+def _matching_encode_cmd(
+    vid: str, index: MediaIndex, start: float, end: float, threads: int, output: str
+) -> List[str]:
+    """Re-encode the video to the source's own codec and format so it splices
+    onto copied pieces. The audio is rendered separately (`_audio_cmd`)."""
+
+    cmd = ["ffmpeg", "-y", "-threads", str(threads), "-ss", str(start), "-t", str(end - start)]
+    cmd += ["-i", vid, *matching_encode(index.video, "slow")]
+    cmd += ["-an", "-avoid_negative_ts", "make_zero", output]
+    return cmd
+
+
+def _copy_cmd(vid: str, start: float, end: float, output: str) -> List[str]:
+    # `start` is a keyframe, so the input seek lands on it exactly
+    return [
+        "ffmpeg",
+        "-y",
+        "-ss",
+        str(start),
+        "-i",
+        vid,
+        "-t",
+        str(end - start),
+        "-map",
+        "0:v:0",
+        "-c",
+        "copy",
+        "-avoid_negative_ts",
+        "make_zero",
+        output,
+    ]
+
+
+def _audio_cmd(
+    vid: str, index: MediaIndex, ranges: List[Tuple[float, float]], script: str, output: str
+) -> List[str]:
+    """Trim the audio to `ranges` and encode it as one stream.
+
+    Splicing copied and re-encoded AAC would put encoder priming silence at
+    every re-encoded head and let the audio drift against the video, so the
+    stream-copy modes cut the audio sample-exactly in one encode instead.
+    """
+
+    with open(script, "w") as f:
+        f.write(_trim_graph(ranges, 0.0, False, True))
+
+    audio = index.audio
+    cmd = ["ffmpeg", "-y", "-i", vid, "-filter_complex_script", script, "-map", "[aout]"]
+    cmd += ["-c:a", "aac", "-b:a", "192k", "-ar", str(audio["sample_rate"])]
+    cmd += ["-ac", str(audio["channels"]), output]
+    return cmd
+
 
 def cut_video(
     vid: str,
     cuts: List[Tuple[float, float]],
     threads: int = 10,
     output_name: str = "final",
+    mode: str = "encode",
 ):
     """
     Cut specified segments from a video and concatenate the remaining parts using FFmpeg.
@@ -19,69 +129,107 @@ def cut_video(
     Args:
         vid (str): Path to the input video file.
         cuts (List[Tuple[float, float]]): List of (start, end) times in seconds to cut out.
-        threads (int): Number of threads for video processing.
+        threads (int): Number of threads for video processing, shared by the segments
+            that are encoded at the same time.
         output_name (str): Base name for the output file.
+        mode (str): ``encode`` re-encodes every kept segment, ``smart`` stream-copies
+            whole GOPs of each segment (starting from a keyframe within
+            KEYFRAME_TOLERANCE of it) and re-encodes the partial GOPs at its ends
+            to match the source, ``copy`` stream-copies everything from the keyframe before
+            each cut (cuts may move by up to a GOP). Both only copy the video and
+            trim the audio to match it in a single encode.
     """
+    assert mode in CUT_MODES, f"unknown cut mode {mode}"
     print(f"Cutting video {vid} with cuts: {cuts}")
 
-    # Get video duration using FFmpeg
-    ffprobe_cmd = [
-        "ffprobe",
-        "-v",
-        "error",
-        "-show_entries",
-        "format=duration",
-        "-of",
-        "default=noprint_wrappers=1:nokey=1",
-        vid,
-    ]
-    duration = float(subprocess.check_output(ffprobe_cmd).decode().strip())
-
-    # Sort cuts by start time and calculate playable segments
-    sorted_cuts = sorted(cuts, key=lambda x: x[0])
-    play_segments = []
-    start = 0
-    for cut_start, cut_end in sorted_cuts:
-        if start < cut_start:
-            play_segments.append((start, cut_start))
-        start = cut_end
-    if start < duration:
-        play_segments.append((start, duration))
+    # Duration (and keyframes) come from the shared media index
+    index = media_index(vid)
+    play_segments = _play_segments(cuts, index.duration)
 
     print(f"Playable segments: {play_segments}")
 
+    if mode != "encode" and index.video.get("codec_name") not in MATCHING_ENCODERS:
+        print(f"can't stream-copy {index.video.get('codec_name')} video, encoding every segment")
+        mode = "encode"
+
+    workers = max(1, min(len(play_segments), threads // 2))
+    threads_per_worker = max(1, threads // workers)
+
     # Create temporary directory for intermediate files
     with tempfile.TemporaryDirectory() as tmpdirname:
+        jobs: list[list[str]] = []
         temp_files = []
-        # Process each playable segment
+        # where each kept segment's video really starts, for the audio
+        video_ranges: list[tuple[float, float]] = []
+        copied = 0.0
         for i, (start, end) in enumerate(play_segments):
-            temp_output = os.path.join(tmpdirname, f"segment_{i}.mp4")
-            duration = end - start
-            ffmpeg_cmd = [
-                "ffmpeg",
-                "-y",
-                "-i",
-                vid,
-                "-ss",
-                str(start),
-                "-t",
-                str(duration),
-                "-c:v",
-                "libx264",
-                "-c:a",
-                "aac",
-                "-preset",
-                "slow",
-                "-b:v",
-                "3000k",
-                "-threads",
-                str(threads),
-                "-avoid_negative_ts",
-                "make_zero",
-                temp_output,
+            if mode == "encode":
+                temp_output = os.path.join(tmpdirname, f"segment_{i}.mp4")
+                jobs.append(_encode_cmd(vid, start, end, threads_per_worker, temp_output))
+                temp_files.append(temp_output)
+                continue
+
+            # MPEG-TS pieces carry their parameter sets in-band, so copied and
+            # re-encoded pieces concatenate cleanly. Keyframe times are relative
+            # to the file's start_time, like the -ss input seeks.
+            if mode == "copy":
+                copy_from = index.keyframe_before(start)
+                video_ranges.append((copy_from, end))
+            else:
+                copy_from = index.snap(start, KEYFRAME_TOLERANCE)
+                if copy_from in index.keyframes:
+                    video_ranges.append((copy_from, end))
+                else:
+                    video_ranges.append((start, end))
+                    # re-encode only up to the next keyframe, copy from there
+                    copy_from = index.keyframe_after(start)
+                    if copy_from is None or copy_from >= end:
+                        copy_from = end
+                    head = os.path.join(tmpdirname, f"segment_{i}_head.ts")
+                    jobs.append(
+                        _matching_encode_cmd(vid, index, start, copy_from, threads_per_worker, head)
+                    )
+                    temp_files.append(head)
+
+            # smart copies whole GOPs only, a copy ending mid-GOP leaves its
+            # trailing B-frames without their forward references
+            copy_end = end
+            if mode == "smart":
+                copy_end = max(copy_from, index.keyframe_before(end))
+                # the file's last GOP is whole wherever it ends
+                if copy_end >= end - 1e-3 or end >= index.duration - 1e-3:
+                    copy_end = end
+
+            if copy_end - copy_from > 1e-3:
+                body = os.path.join(tmpdirname, f"segment_{i}.ts")
+                jobs.append(_copy_cmd(vid, copy_from, copy_end, body))
+                temp_files.append(body)
+                copied += copy_end - copy_from
+
+            if end - copy_end > 1e-3:
+                tail = os.path.join(tmpdirname, f"segment_{i}_tail.ts")
+                jobs.append(
+                    _matching_encode_cmd(vid, index, copy_end, end, threads_per_worker, tail)
+                )
+                temp_files.append(tail)
+
+        audio_file = None
+        if mode != "encode":
+            kept = sum(end - start for start, end in play_segments)
+            print(f"stream-copying {copied:.0f}s of {kept:.0f}s")
+            if index.audio:
+                audio_file = os.path.join(tmpdirname, "audio.m4a")
+                script = os.path.join(tmpdirname, "audio_graph.txt")
+                # decodes the whole file, so it goes first
+                jobs.insert(0, _audio_cmd(vid, index, video_ranges, script, audio_file))
+        print(f"processing {len(jobs)} pieces with {workers} workers")
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(subprocess.run, cmd, check=True, capture_output=True) for cmd in jobs
             ]
-            subprocess.run(ffmpeg_cmd, check=True, capture_output=True)
-            temp_files.append(temp_output)
+            for future in futures:
+                future.result()
 
         # Create file list for concatenation
         concat_list_path = os.path.join(tmpdirname, "concat_list.txt")
@@ -101,6 +249,10 @@ def cut_video(
             "0",  # Allow unsafe file paths
             "-i",
             concat_list_path,
+        ]
+        if audio_file is not None:
+            concat_cmd += ["-i", audio_file, "-map", "0:v:0", "-map", "1:a:0"]
+        concat_cmd += [
             "-c",
             "copy",  # Copy streams without re-encoding
             "-threads",
@@ -0,0 +1,426 @@
+import os
+import subprocess
+import tempfile
+from collections import deque
+from concurrent.futures import Executor, Future
+from functools import lru_cache
+from typing import Callable, Iterable, Iterator, Tuple
+
+import numpy as np
+from scipy import ndimage, signal
+
+from multicam_podcast_editor.media_index import media_index
+from multicam_podcast_editor.pcm import iter_pcm_blocks
+from multicam_podcast_editor.tprint import print_decorator
+
+print = print_decorator(print)
+
+SAMPLE_RATE = 48000
+
+# Samples each block contributes to the output (20 s, a whole number of
+# loudness segments, STFT hops and dynamics hops).
+BLOCK = 960000
+# Samples of context decoded on both sides of a block so the recursive
+# filters and level followers have settled by the time its own part starts.
+CONTEXT = 192000
+# Half-length of the crossfade between neighbouring blocks.
+FADE = 2048
+
+# Blocks decoded ahead of the one being written, per worker. Bounds memory
+# to a few blocks per worker however long the file is.
+IN_FLIGHT = 2
+
+# Where the enhanced audio waits for its loudness gain, as 24-bit FLAC.
+WORK_DIR = "temp/enhance"
+# Level the intermediate is written at, so peaks above full scale (before
+# the gain brings them down) survive the integer samples. 24 bits leave
+# over 120 dB of range below that.
+HEADROOM_DB = 12.0
+
+# loudnorm=I=-18:TP=-1
+TARGET_I = -18.0
+TARGET_TP = -1.0
+
+# STFT of the noise reduction
+NFFT = 2048
+HOP = 512
+
+# BS.1770 K-weighting at 48 kHz
+_K_WEIGHTING = np.array(
+    [
+        [1.53512485958697, -2.69169618940638, 1.19839281085285, 1.0, -1.69065929318241, 0.73248077421585],
+        [1.0, -2.0, 1.0, 1.0, -1.99004745483398, 0.99007225036621],
+    ]
+)
+# loudness is measured on 100 ms segments, 4 of them make a gating block
+_SEGMENT = SAMPLE_RATE // 10
+
+
+@lru_cache
+def _butter(kind: str, frequency: float) -> np.ndarray:
+    # ffmpeg's highpass/lowpass default to a Butterworth (Q=0.707) biquad
+    return signal.butter(2, frequency, kind, fs=SAMPLE_RATE, output="sos")
+
+
+@lru_cache
+def _peaking(frequency: float, width: float, gain_db: float) -> np.ndarray:
+    """RBJ peaking biquad, `width` in Hz like anequalizer's.
+
+    anequalizer (t=0) designs a higher-order Butterworth band instead. Both
+    have the full gain at `frequency` and half of it (in dB) at the band
+    edges, but anequalizer's falls off faster outside the band, so this
+    boosts a little more of the neighbouring spectrum.
+    """
+
+    a = 10 ** (gain_db / 40)
+    w0 = 2 * np.pi * frequency / SAMPLE_RATE
+    alpha = np.sin(w0) / (2 * frequency / width)
+    b = [1 + alpha * a, -2 * np.cos(w0), 1 - alpha * a]
+    den = [1 + alpha / a, -2 * np.cos(w0), 1 - alpha / a]
+    return signal.tf2sos(b, den)
+
+
+@lru_cache
+def _fir_equalizer(entries: Tuple[Tuple[float, float], ...], taps: int = 4095) -> np.ndarray:
+    """Linear-phase FIR following firequalizer's gain_entry curve (dB linear in Hz)."""
+
+    frequencies = [0.0] + [f for f, _ in entries] + [SAMPLE_RATE / 2]
+    gains_db = [entries[0][1]] + [g for _, g in entries] + [entries[-1][1]]
+    return signal.firwin2(taps, frequencies, 10 ** (np.array(gains_db) / 20), fs=SAMPLE_RATE)
+
+
+def _fir(audio: np.ndarray, taps: np.ndarray) -> np.ndarray:
+    # "same" mode drops the group delay, like firequalizer's delay compensation
+    return signal.oaconvolve(audio, taps[:, None], mode="same", axes=0)
+
+
+def _follow(levels: np.ndarray, attack: float, release: float, hop: int) -> np.ndarray:
+    """Attack/release smoothing of per-hop `levels` (hops x channels)."""
+
+    up = 1 - np.exp(-hop / (SAMPLE_RATE * attack))
+    down = 1 - np.exp(-hop / (SAMPLE_RATE * release))
+    out = np.empty_like(levels)
+    state = levels[0].copy()
+    for i, level in enumerate(levels):
+        state += (level - state) * np.where(level > state, up, down)
+        out[i] = state
+    return out
+
+
+def _hop_levels(audio: np.ndarray, hop: int, kind: str) -> np.ndarray:
+    frames = -(-len(audio) // hop)
+    padded = np.pad(audio, ((0, frames * hop - len(audio)), (0, 0)))
+    hops = padded.reshape(frames, hop, -1)
+    if kind == "peak":
+        return np.abs(hops).max(axis=1)
+    if kind == "rms":
+        return np.sqrt((hops**2).mean(axis=1))
+    return np.abs(hops).mean(axis=1)
+
+
+def _apply_gain(audio: np.ndarray, gain_db: np.ndarray, hop: int) -> np.ndarray:
+    centers = np.arange(len(gain_db)) * hop + hop / 2
+    positions = np.arange(len(audio))
+    gain = np.column_stack(
+        [np.interp(positions, centers, 10 ** (g / 20)) for g in gain_db.T]
+    )
+    return audio * gain
+
+
+def _denoise(audio: np.ndarray, floor_db: float, track: bool, reduction_db: float = 12.0) -> np.ndarray:
+    """Spectral gating like afftdn: attenuate each bin by up to `reduction_db`
+    where its power is near the noise.
+
+    The noise is either the fixed `floor_db` white floor or, with `track`,
+    the minimum of the smoothed power over the surrounding 1.5 s of every
+    bin (minimum statistics). Both only look at nearby frames, so a block
+    gives the same result as the whole file would.
+    """
+
+    window = signal.windows.hann(NFFT, sym=False)
+    _, _, spectrum = signal.stft(
+        audio.T, fs=SAMPLE_RATE, window=window, nperseg=NFFT, noverlap=NFFT - HOP,
+        boundary="even", padded=True,
+    )
+    power = np.abs(spectrum) ** 2
+
+    # stft scales by 1/sum(window), so a full-scale white floor per bin is:
+    floor = 10 ** (floor_db / 10) * (window**2).sum() / window.sum() ** 2
+    if track:
+        frames = int(1.5 * SAMPLE_RATE / HOP)
+        smoothed = ndimage.uniform_filter1d(power, 8, axis=-1, mode="nearest")
+        noise = ndimage.minimum_filter1d(smoothed, frames, axis=-1, mode="nearest")
+        noise = np.maximum(noise, floor)
+    else:
+        noise = floor
+
+    gain = np.maximum(1 - noise / np.maximum(power, 1e-20), 10 ** (-reduction_db / 20))
+    _, cleaned = signal.istft(
+        spectrum * gain, fs=SAMPLE_RATE, window=window, nperseg=NFFT, noverlap=NFFT - HOP,
+        boundary=True,
+    )
+    return cleaned.T[: len(audio)].astype(np.float32)
+
+
+def _limiter(audio: np.ndarray, limit: float, attack=0.005, release=0.05, hop=48) -> np.ndarray:
+    level = _follow(_hop_levels(audio, hop, "peak"), attack, release, hop)
+    gain_db = np.minimum(0.0, 20 * np.log10(limit / np.maximum(level, 1e-9)))
+    return _apply_gain(audio, gain_db, hop)
+
+
+def _compand(audio: np.ndarray, points, attack: float, decay: float, hop=480) -> np.ndarray:
+    """compand's transfer curve (linear past its last point) on a tracked level."""
+
+    level = _follow(_hop_levels(audio, hop, "mean"), attack, decay, hop)
+    level_db = 20 * np.log10(np.maximum(level, 1e-9))
+    xs, ys = zip(*points)
+    out_db = np.interp(level_db, xs, ys)
+    slope = (ys[-1] - ys[-2]) / (xs[-1] - xs[-2])
+    out_db = np.where(level_db > xs[-1], ys[-1] + (level_db - xs[-1]) * slope, out_db)
+    out_db = np.where(level_db < xs[0], level_db, out_db)
+    return _apply_gain(audio, out_db - level_db, hop)
+
+
+def _compressor(audio: np.ndarray, threshold_db, ratio, attack, release, hop=48) -> np.ndarray:
+    # acompressor detects on the rms, linked across channels by their average
+    level = _follow(_hop_levels(audio, hop, "rms").mean(axis=1, keepdims=True), attack, release, hop)
+    over = np.maximum(0.0, 20 * np.log10(np.maximum(level, 1e-9)) - threshold_db)
+    gain_db = np.repeat(-over * (1 - 1 / ratio), audio.shape[1], axis=1)
+    return _apply_gain(audio, gain_db, hop)
+
+
+def process(audio: np.ndarray, enhance_type: str) -> np.ndarray:
+    """The enhancement chain of `enhance_type` (without loudnorm) on 48 kHz audio.
+
+    Mirrors audio_enhancement's ffmpeg chains filter by filter, except
+    adeclip, which only ever touches clipped samples and is left out. The
+    highpass/lowpass biquads are ffmpeg's exactly. The others follow the
+    same curves and time constants with their own designs (see `_peaking`
+    and `_denoise`), so the two engines agree in level per band rather than
+    sample by sample.
+    """
+
+    if enhance_type == "music":
+        audio = _denoise(audio, -50.0, track=False)
+        audio = signal.sosfilt(np.vstack([_peaking(200, 200, 1.5), _peaking(7000, 2000, 2.0)]), audio, axis=0)
+        return _compressor(audio, -18.0, 3.0, 0.005, 0.05).astype(np.float32)
+
+    audio = signal.sosfilt(np.vstack([_butter("highpass", 100), _butter("lowpass", 5000)]), audio, axis=0)
+    audio = _denoise(audio, -50.0, track=True)
+    audio = _limiter(audio, 0.794)
+    audio = _compand(audio, [(-70, -70), (-30, -30), (-15, -15), (0, -10)], 0.5, 1.0)
+    audio = _fir(audio, _fir_equalizer(((200.0, -4.0), (4000.0, -3.0))))
+    return audio.astype(np.float32)
+
+
+def _process_block(
+    block: np.ndarray, lead: int, length: int, first: bool, last: bool, enhance_type: str
+) -> Tuple[np.ndarray, float]:
+    """Process a block with its context, keep its own samples plus the
+    crossfades into its neighbours, and the true peak of its own part."""
+
+    out = process(block, enhance_type)
+    start = lead if first else lead - FADE
+    end = lead + length + (0 if last else FADE)
+    kept = out[start:end].copy()
+
+    ramp = np.sin(np.linspace(0, np.pi / 2, 2 * FADE, endpoint=False) + np.pi / (8 * FADE)) ** 2
+    if not first:
+        kept[: 2 * FADE] *= ramp[:, None]
+    if not last:
+        kept[-2 * FADE :] *= ramp[::-1, None]
+
+    # 4x oversampled peak, as loudnorm's true peak limit is
+    peak = np.abs(signal.resample_poly(out[lead : lead + length], 4, 1, axis=0)).max(initial=0.0)
+    return kept, float(peak)
+
+
+def _blocks(
+    pieces: Iterable[np.ndarray], channels: int
+) -> Iterator[Tuple[np.ndarray, int, int, bool, bool]]:
+    """(block with context, offset of its own part, its length, first, last)
+    for every BLOCK of the audio arriving in `pieces`, holding at most one
+    block plus context in memory."""
+
+    buffer = np.zeros((0, channels), dtype=np.float32)
+    buffer_start = 0
+    k = 0
+    pending = None
+
+    def _window(k: int, total: int):
+        lo = max(0, k * BLOCK - CONTEXT)
+        hi = min(total, (k + 1) * BLOCK + CONTEXT)
+        length = total - k * BLOCK
+        if length >= BLOCK + 2 * FADE:
+            length = BLOCK
+        # otherwise this is the last block and takes the few samples left
+        # too, which couldn't be crossfaded into on their own
+        return buffer[lo - buffer_start : hi - buffer_start], k * BLOCK - lo, length, k == 0
+
+    for piece in pieces:
+        buffer = np.concatenate([buffer, piece])
+        while buffer_start + len(buffer) >= (k + 1) * BLOCK + CONTEXT:
+            # only known not to be the last one once the next has samples
+            if pending is not None:
+                yield (*pending, False)
+            pending = _window(k, buffer_start + len(buffer))
+            k += 1
+            drop = max(0, k * BLOCK - CONTEXT - buffer_start)
+            buffer, buffer_start = buffer[drop:], buffer_start + drop
+
+    total = buffer_start + len(buffer)
+    while k * BLOCK < total:
+        if pending is not None:
+            yield (*pending, False)
+        pending = _window(k, total)
+        k += 1
+        if k * BLOCK > total - 2 * FADE:
+            break
+    if pending is not None:
+        yield (*pending, True)
+
+
+def integrated_loudness(segment_powers: np.ndarray) -> float:
+    """Gated BS.1770 loudness from the K-weighted mean square of every 100 ms
+    segment (summed over channels)."""
+
+    if len(segment_powers) < 4:
+        return -70.0
+    blocks = np.lib.stride_tricks.sliding_window_view(segment_powers, 4).mean(axis=1)
+    loudness = -0.691 + 10 * np.log10(np.maximum(blocks, 1e-20))
+    blocks = blocks[loudness > -70]
+    if len(blocks) == 0:
+        return -70.0
+    relative = -0.691 + 10 * np.log10(blocks.mean()) - 10
+    loudness = -0.691 + 10 * np.log10(blocks)
+    return float(-0.691 + 10 * np.log10(blocks[loudness > relative].mean()))
+
+
+class _Loudness:
+    """Running K-weighted 100 ms segment powers of the samples written so far."""
+
+    def __init__(self, channels: int):
+        self.state = np.zeros((len(_K_WEIGHTING), 2, channels))
+        self.powers: list[np.ndarray] = []
+        self.rest = np.zeros(0)
+
+    def add(self, audio: np.ndarray):
+        weighted, self.state = signal.sosfilt(_K_WEIGHTING, audio, axis=0, zi=self.state)
+        power = np.concatenate([self.rest, (weighted**2).sum(axis=1)])
+        whole = len(power) // _SEGMENT * _SEGMENT
+        self.powers.append(power[:whole].reshape(-1, _SEGMENT).mean(axis=1))
+        self.rest = power[whole:]
+
+    def integrated(self) -> float:
+        return integrated_loudness(np.concatenate(self.powers) if self.powers else np.zeros(0))
+
+
+def loudness(audio: np.ndarray) -> float:
+    """Integrated loudness of 48 kHz `audio` (frames x channels) in LUFS."""
+
+    meter = _Loudness(audio.shape[1])
+    meter.add(audio)
+    return meter.integrated()
+
+
+def enhance_stream(
+    pieces: Iterable[np.ndarray],
+    channels: int,
+    enhance_type: str,
+    pool: Executor,
+    workers: int,
+    write: Callable[[np.ndarray], object],
+) -> Tuple[float, float]:
+    """Run `process` over the audio arriving in `pieces` block by block in
+    `pool`, passing the crossfaded result to `write` in order.
+
+    Returns the integrated loudness and the true peak of the result.
+    """
+
+    loudness = _Loudness(channels)
+    peak = 0.0
+    in_flight: deque[Future] = deque()
+    tail = np.zeros((0, channels), dtype=np.float32)
+
+    def _collect(future: Future):
+        nonlocal tail, peak
+        kept, block_peak = future.result()
+        peak = max(peak, block_peak)
+        kept[: len(tail)] += tail
+        # hold back the fade-out until the next block's fade-in arrives
+        hold = min(2 * FADE, len(kept))
+        ready, tail = kept[: len(kept) - hold], kept[len(kept) - hold :]
+        loudness.add(ready)
+        write(ready)
+
+    for block, lead, length, first, last in _blocks(pieces, channels):
+        in_flight.append(pool.submit(_process_block, block, lead, length, first, last, enhance_type))
+        while len(in_flight) > IN_FLIGHT * workers:
+            _collect(in_flight.popleft())
+    while in_flight:
+        _collect(in_flight.popleft())
+
+    loudness.add(tail)
+    write(tail)
+    return loudness.integrated(), peak
+
+
+def enhance_file(vid: str, enhance_type: str, pool: Executor, workers: int, threads: int):
+    """Enhance the audio of `vid` in place with the NumPy engine.
+
+    The decoded audio goes through `enhance_stream` straight into an ffmpeg
+    encode to a FLAC file in WORK_DIR. The final ffmpeg run then only
+    applies the loudnorm gain (linear, capped so the true peak stays under
+    -1 dBTP) and muxes the audio with the untouched video.
+    """
+
+    channels = int(media_index(vid).audio.get("channels", 1))
+    directory, base_name = os.path.split(vid)
+    stem, ext = os.path.splitext(base_name)
+    partial = os.path.join(directory, f".{stem}.enhancing{ext}")
+    os.makedirs(WORK_DIR, exist_ok=True)
+    fd, flac = tempfile.mkstemp(dir=WORK_DIR, prefix=f"{stem}.", suffix=".flac")
+    os.close(fd)
+
+    encode = ["ffmpeg", "-v", "error", "-y", "-f", "f32le", "-ar", str(SAMPLE_RATE)]
+    encode += ["-ac", str(channels), "-i", "pipe:0", "-c:a", "flac"]
+    encode += ["-sample_fmt", "s32", "-bits_per_raw_sample", "24", flac]
+    headroom = 10 ** (-HEADROOM_DB / 20)
+
+    try:
+        # stderr to a file, a full pipe would stall the encoder while we write
+        errors = tempfile.TemporaryFile()
+        encoder = subprocess.Popen(encode, stdin=subprocess.PIPE, stderr=errors)
+        assert encoder.stdin is not None
+        try:
+            integrated, peak = enhance_stream(
+                iter_pcm_blocks(vid, SAMPLE_RATE, channels),
+                channels,
+                enhance_type,
+                pool,
+                workers,
+                lambda audio: encoder.stdin.write((audio * headroom).astype("<f4").tobytes()),
+            )
+        finally:
+            encoder.communicate()
+            errors.seek(0)
+            stderr = errors.read().decode(errors="ignore")
+            errors.close()
+        if encoder.returncode != 0:
+            raise subprocess.CalledProcessError(encoder.returncode, encode, stderr=stderr)
+
+        gain_db = 0.0
+        if enhance_type != "music":
+            peak_db = 20 * np.log10(max(peak, 1e-9))
+            gain_db = min(TARGET_I - integrated, TARGET_TP - peak_db)
+            print(f"{vid}: {integrated:.1f} LUFS, peak {peak_db:.1f} dBTP, gain {gain_db:+.1f} dB")
+
+        cmd = ["ffmpeg", "-v", "error", "-y", "-threads", str(threads), "-i", vid, "-i", flac]
+        cmd += ["-map", "0:v:0?", "-map", "1:a:0", "-c:v", "copy"]
+        cmd += ["-af", f"volume={gain_db + HEADROOM_DB:.2f}dB", partial]
+        subprocess.run(cmd, check=True, capture_output=True, text=True)
+        os.replace(partial, vid)
+    finally:
+        for path in (flac, partial):
+            if os.path.exists(path):
+                os.remove(path)
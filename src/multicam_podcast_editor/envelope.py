@@ -0,0 +1,206 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import numpy as np
+
+from multicam_podcast_editor.pcm import iter_pcm_blocks
+from multicam_podcast_editor.tprint import print_decorator
+
+print = print_decorator(print)
+
+# MoviePy reads clip audio as 44.1 kHz stereo, so decoding the same way keeps
+# the peaks identical to the old `max_volume()` buckets.
+SAMPLE_RATE = 44100
+CHANNELS = 2
+
+# Pyramid levels in seconds. Every level is an integer multiple of the one
+# before it, the first one is what gets decoded.
+LEVELS = (0.01, 0.1, 1.0, 5.0)
+
+
+def bucket_count(duration: float, window: float) -> int:
+    """Number of buckets the old `range(0, int(duration - 5) + 1, 5)` produced,
+    for any window.
+
+    Only the start of the last whole window counts, not whole seconds of it,
+    so sub-second windows keep their tail buckets. As int() truncated towards
+    zero, a track less than a second shorter than the window still gets one.
+    """
+    last = duration - window
+    return math.floor(max(last, 0.0) / window + 1e-9) + 1 if last > -1 else 0
+
+
+def _reduce_max(values: np.ndarray, factor: int) -> np.ndarray:
+    padded = math.ceil(len(values) / factor) * factor
+    values = np.pad(values, (0, padded - len(values)))  # peaks are >= 0
+    return values.reshape(-1, factor).max(axis=1)
+
+
+class EnvelopePyramid:
+    """Peak envelope of one track at several resolutions.
+
+    The finest level is kept with its mean square so RMS can be derived, and a
+    sparse table over the second level answers the max of any time range in
+    constant time (at most a handful of finest-level samples on each edge).
+    """
+
+    def __init__(self, base_peak: np.ndarray, base_power: np.ndarray, duration: float):
+        self.duration = duration
+        self.power = base_power.astype(np.float32)
+        self.levels: dict[float, np.ndarray] = {LEVELS[0]: base_peak.astype(np.float32)}
+
+        for prev, level in zip(LEVELS, LEVELS[1:]):
+            factor = int(round(level / prev))
+            self.levels[level] = _reduce_max(self.levels[prev], factor)
+
+        self._factor = int(round(LEVELS[1] / LEVELS[0]))
+        coarse = self.levels[LEVELS[1]]
+        self._sparse = [coarse]
+        span = 1
+        while span * 2 <= len(coarse):
+            prev = self._sparse[-1]
+            self._sparse.append(np.maximum(prev[:-span], prev[span:]))
+            span *= 2
+
+    @property
+    def resolution(self) -> float:
+        return LEVELS[0]
+
+    def level(self, seconds: float) -> np.ndarray:
+        return self.levels[seconds]
+
+    def range_max(self, start: float, end: float) -> float:
+        """Peak between `start` and `end` seconds on the track's timeline."""
+        return float(self.range_max_many(np.array([start]), np.array([end]))[0])
+
+    def range_max_many(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        base = self.levels[LEVELS[0]]
+        f = self._factor
+
+        bs = np.clip(np.floor(np.asarray(starts) / LEVELS[0] + 1e-6).astype(np.int64), 0, len(base))
+        be = np.clip(np.ceil(np.asarray(ends) / LEVELS[0] - 1e-6).astype(np.int64), 0, len(base))
+        be = np.maximum(be, bs)
+
+        # whole coarse cells inside the range, through the sparse table
+        cs = -(-bs // f)
+        ce = np.maximum(be // f, cs)
+        length = ce - cs
+        result = np.zeros(len(bs), dtype=np.float32)
+        has_coarse = length > 0
+        if has_coarse.any():
+            k = np.floor(np.log2(np.maximum(length, 1))).astype(np.int64)
+            for lvl in np.unique(k[has_coarse]):
+                sel = has_coarse & (k == lvl)
+                table = self._sparse[lvl]
+                left = table[cs[sel]]
+                right = table[ce[sel] - (1 << lvl)]
+                result[sel] = np.maximum(left, right)
+
+        # loose finest-level samples before and after the coarse cells; when the
+        # range has no whole coarse cell, these cover it entirely
+        head_end = np.where(has_coarse, cs * f, be)
+        tail_start = np.where(has_coarse, ce * f, be)
+        for j in range(2 * f):
+            idx = bs + j
+            ok = idx < head_end
+            if ok.any():
+                result[ok] = np.maximum(result[ok], base[idx[ok]])
+            idx = tail_start + j
+            ok = idx < be
+            if ok.any():
+                result[ok] = np.maximum(result[ok], base[idx[ok]])
+
+        return result
+
+    def buckets(self, window: float = 5.0) -> List[float]:
+        """Per-window peaks in the shape `multicam()` and `shortcut()` expect."""
+        count = bucket_count(self.duration, window)
+        if window in self.levels:
+            peaks = self.levels[window][:count]
+        else:
+            starts = np.arange(count) * window
+            peaks = self.range_max_many(starts, starts + window)
+
+        peaks = peaks.tolist()
+        return peaks + [0.0] * (count - len(peaks))
+
+    def rms(self, window: float = 5.0) -> np.ndarray:
+        factor = max(1, int(round(window / LEVELS[0])))
+        padded = math.ceil(len(self.power) / factor) * factor
+        power = np.pad(self.power, (0, padded - len(self.power)))
+        return np.sqrt(power.reshape(-1, factor).mean(axis=1)).astype(np.float32)
+
+
+def compute_envelope(
+    path: str,
+    offset: float = 0.0,
+    max_duration: float | None = None,
+) -> EnvelopePyramid:
+    """Decode `path` once and reduce it to an envelope pyramid.
+
+    `offset` is the source time that lines up with 0 on the timeline. A
+    negative offset means the track starts late and gets leading silence.
+    """
+
+    window_frames = int(round(LEVELS[0] * SAMPLE_RATE))
+    peaks: list[np.ndarray] = []
+    powers: list[np.ndarray] = []
+    carry = np.zeros((0, CHANNELS), dtype=np.float32)
+    total_frames = 0
+
+    for block in iter_pcm_blocks(
+        path,
+        SAMPLE_RATE,
+        CHANNELS,
+        block_frames=window_frames * 1000,
+        start=offset,
+        duration=max_duration,
+    ):
+        total_frames += len(block)
+        if len(carry) > 0:
+            block = np.concatenate([carry, block])
+
+        full = len(block) // window_frames * window_frames
+        if full > 0:
+            windows = block[:full].reshape(-1, window_frames * CHANNELS)
+            peaks.append(np.abs(windows).max(axis=1))
+            powers.append(np.square(windows).mean(axis=1))
+        carry = block[full:]
+
+    if len(carry) > 0:
+        peaks.append(np.abs(carry).max(keepdims=True).reshape(1))
+        powers.append(np.square(carry).mean(keepdims=True).reshape(1))
+
+    if len(peaks) == 0:
+        empty = np.zeros(0, dtype=np.float32)
+        return EnvelopePyramid(empty, empty, 0.0)
+
+    return EnvelopePyramid(
+        np.concatenate(peaks), np.concatenate(powers), total_frames / SAMPLE_RATE
+    )
+
+
+def compute_envelopes(
+    tracks: List[Tuple[str, float]],
+    max_duration: float | None = None,
+    threads: int = 10,
+) -> List[EnvelopePyramid]:
+    """Compute envelope pyramids for every (path, offset) pair concurrently.
+
+    ffmpeg does the decoding in its own process and the NumPy reductions
+    release the GIL, so plain threads are enough to keep every track busy.
+    """
+
+    workers = max(1, min(len(tracks), threads))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(compute_envelope, path, offset, max_duration)
+            for path, offset in tracks
+        ]
+        envelopes = [f.result() for f in futures]
+
+    for (path, _), env in zip(tracks, envelopes):
+        print(f"finished analyzing volume for {path} ({env.duration:.1f}s)")
+
+    return envelopes
@@ -0,0 +1,92 @@
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List
+
+from multicam_podcast_editor.cache import cache_key
+from multicam_podcast_editor.media_index import media_index
+from multicam_podcast_editor.tprint import print_decorator
+
+print = print_decorator(print)
+
+SIDECAR_DIR = "temp/ingest"
+
+
+@dataclass
+class Source:
+    """An input file read in place.
+
+    `audio_path` is the file itself unless its audio had to be resampled to
+    match the main track, in which case it points at a small audio-only
+    sidecar in temp/ingest.
+    """
+
+    path: str
+    audio_path: str
+    sample_rate: int
+    duration: float
+
+
+def _write_sidecar(path: str, sample_rate: int, max_duration: float | None) -> str:
+    os.makedirs(SIDECAR_DIR, exist_ok=True)
+    # the name alone isn't unique, cam.mp4 can come from several directories
+    stem = os.path.splitext(os.path.basename(path))[0]
+    sidecar = f"{SIDECAR_DIR}/{stem}-{cache_key(os.path.abspath(path))[:12]}.m4a"
+
+    cmd = ["ffmpeg", "-v", "error", "-nostdin", "-y", "-i", path]
+    if max_duration is not None:
+        cmd += ["-t", str(max_duration)]
+    cmd += ["-vn", "-map", "0:a:0", "-ar", str(sample_rate), "-c:a", "aac", "-b:a", "128k", sidecar]
+
+    print(f"resampling audio of {path} to {sample_rate}Hz in {sidecar}")
+    subprocess.run(cmd, check=True)
+    return sidecar
+
+
+def ingest(
+    paths: List[str],
+    max_time: float = -1,
+    skip_bitrate_sync: bool = False,
+    threads: int = 10,
+) -> List[Source]:
+    """Probe the inputs without copying or re-muxing any of them.
+
+    Trims and the audio-sync offsets are applied virtually by the later stages.
+    Only tracks whose audio sample rate differs from the main (first) track
+    are written out again, and then only their audio.
+    """
+
+    for path in paths:
+        assert os.path.exists(path), f"vid file {path} not a valid file"
+
+    workers = max(1, min(len(paths), threads))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        indexes = list(pool.map(media_index, paths))
+
+    sources = [
+        Source(path, path, index.audio.get("sample_rate", 0), index.duration)
+        for path, index in zip(paths, indexes)
+    ]
+
+    main_rate = sources[0].sample_rate
+    max_duration = max_time + 10 if max_time > 0 else None
+    mismatched = [
+        s for s in sources[1:] if s.sample_rate not in (0, main_rate)
+    ]
+
+    if not skip_bitrate_sync and len(mismatched) > 0:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            sidecars = pool.map(
+                lambda s: _write_sidecar(s.path, main_rate, max_duration), mismatched
+            )
+            for source, sidecar in zip(mismatched, sidecars):
+                source.audio_path = sidecar
+
+    for source in sources:
+        print(
+            f"ingested {source.path} ({source.duration:.1f}s, {source.sample_rate}Hz"
+            f"{', audio from ' + source.audio_path if source.audio_path != source.path else ''})"
+        )
+
+    return sources
@@ -1,88 +1,355 @@
 import subprocess
-import re
 import os
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
 
+import numpy as np
 
-def apply_jumpcuts(vids: list[str], margin: float, output_name: str):
-    silence_threshold: str = "-30dB"
+from multicam_podcast_editor.analysis_cache import file_envelope
+from multicam_podcast_editor.envelope import EnvelopePyramid
+from multicam_podcast_editor.media_index import media_index
+
+JUMPCUT_ENGINES = ("trim", "select")
+
+# quietest level the silence detection tells apart
+FLOOR_DB = -90.0
+
+# Keep-intervals per ffmpeg process in the trim engine. Every frame passes
+# each trim of its process, so this bounds the per-frame work however many
+# cuts the whole file has.
+CHUNK_INTERVALS = 25
+
+VIDEO_ENCODE = ["-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-pix_fmt", "yuv420p"]
+AUDIO_ENCODE = ["-c:a", "aac", "-b:a", "192k"]
+ENCODE = VIDEO_ENCODE + AUDIO_ENCODE
+
+
+def _envelope_db(envelope: EnvelopePyramid) -> np.ndarray:
+    peaks = envelope.level(envelope.resolution)
+    return 20 * np.log10(np.maximum(peaks, 10 ** (FLOOR_DB / 20)))
+
+
+def adaptive_threshold(envelope: EnvelopePyramid) -> float:
+    """Threshold in dB splitting the envelope's level histogram into pauses and
+    speech (Otsu's method)."""
+
+    db = _envelope_db(envelope)
+    hist, edges = np.histogram(db, bins=int(-FLOOR_DB), range=(FLOOR_DB, 0.0))
+    centers = (edges[:-1] + edges[1:]) / 2
+
+    weight_low = np.cumsum(hist)
+    weight_high = weight_low[-1] - weight_low
+    sum_low = np.cumsum(hist * centers)
+    mean_low = sum_low / np.maximum(weight_low, 1)
+    mean_high = (sum_low[-1] - sum_low) / np.maximum(weight_high, 1)
+    between = weight_low * weight_high * (mean_low - mean_high) ** 2
+    return float(edges[int(np.argmax(between)) + 1])
+
+
+def detect_silences(
+    vid: str, threshold: str, duration: float, use_cache: bool = True
+) -> List[Tuple[float, float]]:
+    """(start, end) of every span of at least `duration` seconds below `threshold`.
+
+    Works on the file's 10 ms peak envelope, cached by earlier stages when
+    they decoded the same file. `threshold` is in ffmpeg's silencedetect
+    notation (``-30dB``) or ``auto`` to derive it from the envelope.
+    """
+
+    envelope = file_envelope(vid, use_cache)
+    if envelope.duration == 0:
+        return []
+
+    if threshold == "auto":
+        threshold_db = adaptive_threshold(envelope)
+        print(f"adaptive silence threshold for {vid}: {threshold_db:.1f}dB")
+    else:
+        threshold_db = float(threshold.lower().removesuffix("db"))
+
+    silent = _envelope_db(envelope) < threshold_db
+
+    # run-length encode the silent windows
+    edges = np.diff(np.concatenate([[0], silent.astype(np.int8), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    resolution = envelope.resolution
+    long_enough = (ends - starts) * resolution >= duration
+    return [
+        (start * resolution, min(end * resolution, envelope.duration))
+        for start, end in zip(starts[long_enough].tolist(), ends[long_enough].tolist())
+    ]
+
+
+def keep_intervals(
+    silences: List[Tuple[float, float]], duration: float, padding: float
+) -> List[Tuple[float, float]]:
+    """The (start, end) ranges left after cutting every silence long enough
+    to still be a silence with `padding` kept on both sides.
+
+    A silence of exactly `2 * padding` leaves nothing to cut, so it doesn't
+    split the keep around it into two touching ones (each a render seam).
+    """
+
+    chunks_to_cut = [
+        (start + padding, end - padding) for start, end in silences if end - start > 2 * padding
+    ]
+
+    keep: List[Tuple[float, float]] = []
+    last_end = 0.0
+    for start, end in sorted(chunks_to_cut):
+        if start > last_end:
+            keep.append((last_end, start))
+        last_end = max(last_end, end)
+
+    if duration > last_end:
+        keep.append((last_end, duration))
+    return keep
+
+
+def _render_select(vid: str, keep: List[Tuple[float, float]], output_path: str, threads: int):
+    """One select/aselect expression over the whole file (the original engine)."""
+
+    select_filter = "+".join(f"between(t,{start},{end})" for start, end in keep)
+
+    index = media_index(vid)
+    process_command = ["ffmpeg", "-y", "-threads", str(threads), "-i", vid]
+    if index.video:
+        process_command += ["-vf", f"select='{select_filter}',setpts=N/FRAME_RATE/TB"]
+    if index.audio:
+        process_command += ["-af", f"aselect='{select_filter}',asetpts=N/SR/TB"]
+    process_command.append(output_path)
+    subprocess.run(process_command, check=True, capture_output=True, text=True)
+
+
+def _trim_graph(
+    keep: List[Tuple[float, float]], offset: float, has_video: bool, has_audio: bool
+) -> str:
+    """trim/atrim every interval (relative to an input seeked to `offset`) and concat them."""
+
+    count = len(keep)
+    filters = []
+    if has_video:
+        filters.append("[0:v]split=" + str(count) + "".join(f"[vs{i}]" for i in range(count)))
+    if has_audio:
+        filters.append("[0:a]asplit=" + str(count) + "".join(f"[as{i}]" for i in range(count)))
+
+    concat_inputs = ""
+    for i, (start, end) in enumerate(keep):
+        start, end = start - offset, end - offset
+        if has_video:
+            filters.append(f"[vs{i}]trim=start={start:.6f}:end={end:.6f},setpts=PTS-STARTPTS[v{i}]")
+            concat_inputs += f"[v{i}]"
+        if has_audio:
+            filters.append(
+                f"[as{i}]atrim=start={start:.6f}:end={end:.6f},asetpts=PTS-STARTPTS[a{i}]"
+            )
+            concat_inputs += f"[a{i}]"
+
+    outputs = ("[vout]" if has_video else "") + ("[aout]" if has_audio else "")
+    filters.append(f"{concat_inputs}concat=n={count}:v={int(has_video)}:a={int(has_audio)}{outputs}")
+    return ";\n".join(filters)
+
+
+def _render_trim_chunk(
+    vid: str,
+    keep: List[Tuple[float, float]],
+    output_path: str,
+    script: Path,
+    threads: int,
+    has_video: bool,
+    has_audio: bool,
+    audio_path: str | None = None,
+):
+    """Render `keep` to `output_path`, or with `audio_path` only the video
+    there and the audio to `audio_path` as PCM."""
+
+    # seek the input to the chunk so its trims only ever see its own frames
+    offset = keep[0][0]
+    script.write_text(_trim_graph(keep, offset, has_video, has_audio))
+
+    command = ["ffmpeg", "-y", "-v", "error", "-threads", str(threads)]
+    command += ["-ss", f"{offset:.6f}", "-t", f"{keep[-1][1] - offset:.6f}", "-i", vid]
+    command += ["-filter_complex_script", str(script)]
+    if audio_path is None:
+        maps = ["-map", "[vout]"] if has_video else []
+        maps += ["-map", "[aout]"] if has_audio else []
+        command += [*maps, *ENCODE, output_path]
+    else:
+        if has_video:
+            command += ["-map", "[vout]", *VIDEO_ENCODE, output_path]
+        command += ["-map", "[aout]", "-c:a", "pcm_s16le", audio_path]
+    subprocess.run(command, check=True, capture_output=True, text=True)
+
+
+def _concat_list(path: Path, files: List[str]) -> str:
+    path.write_text("".join(f"file '{Path(f).resolve()}'\n" for f in files))
+    return str(path)
+
+
+def _render_trim(vid: str, keep: List[Tuple[float, float]], output_path: str, threads: int):
+    """Trim/concat the intervals, CHUNK_INTERVALS at a time in parallel, then
+    put the chunks together.
+
+    The video chunks are stream-copied together. Their audio is kept as PCM
+    and encoded once over the whole file, as AAC chunks joined by stream copy
+    would bring encoder priming and a partial last frame to every seam and
+    drift against the video.
+    """
+
+    index = media_index(vid)
+    has_video, has_audio = bool(index.video), bool(index.audio)
+    work_dir = Path("temp/jumpcuts") / Path(output_path).stem
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    chunks = [keep[i : i + CHUNK_INTERVALS] for i in range(0, len(keep), CHUNK_INTERVALS)]
+    if len(chunks) == 1:
+        _render_trim_chunk(
+            vid, keep, output_path, work_dir / "graph.txt", threads, has_video, has_audio
+        )
+        return
+
+    _, ext = os.path.splitext(output_path)
+    workers = max(1, min(len(chunks), threads // 2))
+    threads_per_worker = max(1, threads // workers)
+    chunk_files = [str(work_dir / f"chunk_{i:04d}{ext}") for i in range(len(chunks))]
+    audio_files = [str(work_dir / f"chunk_{i:04d}.wav") for i in range(len(chunks))]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(
+                _render_trim_chunk,
+                vid,
+                chunk,
+                chunk_file,
+                work_dir / f"chunk_{i:04d}.txt",
+                threads_per_worker,
+                has_video,
+                has_audio,
+                audio_file if has_audio else None,
+            )
+            for i, (chunk, chunk_file, audio_file) in enumerate(
+                zip(chunks, chunk_files, audio_files)
+            )
+        ]
+        for future in futures:
+            future.result()
+
+    command = ["ffmpeg", "-y", "-v", "error", "-threads", str(threads)]
+    maps = []
+    if has_video:
+        command += ["-f", "concat", "-safe", "0"]
+        command += ["-i", _concat_list(work_dir / "list.txt", chunk_files)]
+        maps += ["-map", "0:v:0", "-c:v", "copy"]
+    if has_audio:
+        command += ["-f", "concat", "-safe", "0"]
+        command += ["-i", _concat_list(work_dir / "audio_list.txt", audio_files)]
+        maps += ["-map", f"{int(has_video)}:a:0", *AUDIO_ENCODE]
+    command += [*maps, output_path]
+    subprocess.run(command, check=True, capture_output=True, text=True)
+
+
+def render_jumpcut(
+    vid: str,
+    keep: List[Tuple[float, float]],
+    output_path: str,
+    threads: int = 10,
+    engine: str = "trim",
+):
+    """Write the `keep` intervals of `vid` back to back to `output_path`.
+
+    ``trim`` seeks to each chunk of intervals and trims/concats them (in
+    parallel for long files), ``select`` evaluates one select expression over
+    every frame of the file.
+    """
+
+    assert engine in JUMPCUT_ENGINES, f"unknown jumpcut engine {engine}"
+    if engine == "select":
+        _render_select(vid, keep, output_path, threads)
+    else:
+        _render_trim(vid, keep, output_path, threads)
+
+
+def _jumpcut_file(
+    vid: str,
+    output_path: str,
+    margin: float,
+    threads: int,
+    engine: str,
+    silence_threshold: str,
+    use_cache: bool,
+):
     silence_duration: float = margin
     padding: float = margin / 2
 
-    for i, vid in enumerate(vids):
-        base_name = os.path.basename(vid)
-        _, ext = os.path.splitext(base_name)
-
-        is_short = "-short" in base_name
-        if is_short:
-            output_path = f"output/{output_name}-short-jumpcut{ext}"
-        else:
-            output_path = f"output/{output_name}-jumpcut{ext}"
-
-        detect_command = [
-            "ffmpeg",
-            "-i",
-            vid,
-            "-af",
-            f"silencedetect=n={silence_threshold}:d={silence_duration}",
-            "-f",
-            "null",
-            "-",
-        ]
+    silences = detect_silences(vid, silence_threshold, silence_duration, use_cache)
+    if not silences:
+        print(f"No silence detected in {vid}, copying file.")
+        shutil.copy(vid, output_path)
+        return
 
-        try:
-            output = subprocess.run(
-                detect_command,
-                check=True,
-                capture_output=True,
-                text=True,
-            ).stderr
-        except subprocess.CalledProcessError as e:
-            print(f"Error detecting silence: {e.stderr}")
-            continue
-
-        silence_starts = re.findall(r"silence_start: (-?\d+\.?\d*)", output)
-        silence_ends = re.findall(r"silence_end: (-?\d+\.?\d*)", output)
-
-        if not silence_starts:
-            print("No silence detected, copying file.")
-            shutil.copy(vid, output_path)
-            continue
-
-        chunks_to_cut = []
-        for start, end in zip(silence_starts, silence_ends):
-            start, end = float(start), float(end)
-            if end - start >= 2 * padding:
-                chunks_to_cut.append((start + padding, end - padding))
-
-        if not chunks_to_cut:
-            print("No silences long enough to cut after padding, copying file.")
-            shutil.copy(vid, output_path)
-            continue
-
-        clips_to_keep = []
-        last_end = 0.0
-        for start, end in sorted(chunks_to_cut):
-            clips_to_keep.append(f"between(t,{last_end},{start})")
-            last_end = end
-
-        clips_to_keep.append(f"gte(t,{last_end})")
-        select_filter = "+".join(clips_to_keep)
-
-        process_command = [
-            "ffmpeg",
-            "-y",
-            "-i",
-            vid,
-            "-vf",
-            f"select='{select_filter}',setpts=N/FRAME_RATE/TB",
-            "-af",
-            f"aselect='{select_filter}',asetpts=N/SR/TB",
-            output_path,
-        ]
+    duration = media_index(vid).duration
+    keep = keep_intervals(silences, duration, padding)
+    if len(keep) == 1 and keep[0] == (0.0, duration):
+        print(f"No silences long enough to cut after padding in {vid}, copying file.")
+        shutil.copy(vid, output_path)
+        return
+
+    print(f"keeping {len(keep)} intervals of {vid} with the {engine} engine")
+    render_jumpcut(vid, keep, output_path, threads, engine)
 
+
+def apply_jumpcuts(
+    vids: list[str],
+    margin: float,
+    output_name: str,
+    threads: int = 10,
+    engine: str = "trim",
+    silence_threshold: str = "-30dB",
+    use_cache: bool = True,
+):
+    """Jump-cut every video concurrently, splitting `threads` between them.
+
+    A failure is reported for its file and doesn't stop the others.
+    """
+
+    jobs: list[tuple[str, str]] = []
+    for vid in vids:
+        stem, ext = os.path.splitext(os.path.basename(vid))
+        # renders in output/ keep their own name (NAME.mp4 -> NAME-jumpcut.mp4),
+        # an input file is named after the run
+        if os.path.dirname(os.path.normpath(vid)) != "output":
+            stem = output_name
+        jobs.append((vid, f"output/{stem}-jumpcut{ext}"))
+
+    if len(jobs) == 0:
+        return
+
+    workers = max(1, min(len(jobs), threads))
+    threads_per_file = max(1, threads // workers)
+
+    def _run(job: tuple[str, str]):
+        vid, output_path = job
+        start = time.perf_counter()
         try:
-            subprocess.run(process_command, check=True, capture_output=True, text=True)
-        except subprocess.CalledProcessError as e:
-            print(f"Error removing silence: {e.stderr}")
-            continue
+            _jumpcut_file(
+                vid, output_path, margin, threads_per_file, engine, silence_threshold, use_cache
+            )
+        except Exception as e:
+            # one bad file mustn't take the others' results with it
+            details = e.stderr if isinstance(e, subprocess.CalledProcessError) else e
+            print(f"Error jumpcutting {vid}: {details}")
+            return
+
+        elapsed = time.perf_counter() - start
+        duration = media_index(vid).duration
+        print(
+            f"jumpcut {vid} -> {output_path} in {elapsed:.1f}s "
+            f"({duration / max(elapsed, 1e-6):.1f}x realtime)"
+        )
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_run, jobs))
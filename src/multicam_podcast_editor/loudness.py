@@ -0,0 +1,121 @@
+import json
+import re
+import subprocess
+
+from multicam_podcast_editor.cache import atomic_write, cache_key, cache_path, evict, file_fingerprint, lookup
+from multicam_podcast_editor.tprint import print_decorator
+
+print = print_decorator(print)
+
+KIND = "loudness"
+MAX_BYTES = 16 << 20
+VERSION = 2
+
+# what loudnorm's measurement pass reports and its second pass takes back
+MEASURED = ("input_i", "input_tp", "input_lra", "input_thresh", "target_offset")
+
+_JSON = re.compile(r"\{[^{}]*\"input_i\"[^{}]*\}", re.DOTALL)
+_STREAMHASH = re.compile(r"SHA256=([0-9a-f]+)")
+
+
+def _measurement_key(audio: str, chain: str) -> str:
+    return cache_key(VERSION, audio, chain)
+
+
+def _read_json(kind_key: str) -> dict | None:
+    path = lookup(KIND, kind_key, ".json")
+    if path is None:
+        return None
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError) as e:
+        print(f"ignoring unreadable loudness cache {path}: {e}")
+        return None
+
+
+def _write_json(kind_key: str, value: dict):
+    path = cache_path(KIND, kind_key, ".json")
+    atomic_write(path, lambda partial: partial.write_text(json.dumps(value)))
+    evict(KIND, MAX_BYTES)
+
+
+def audio_fingerprint(path: str, use_cache: bool = True) -> str:
+    """Hash of the packets of the first audio stream of `path`.
+
+    Unlike the file fingerprint it survives remuxing, a changed video stream
+    and podcast_audio rewriting the file around the same audio. The packets
+    are only read, not decoded, and the hash is kept per file fingerprint so
+    an unchanged file is read once.
+    """
+
+    file_key = cache_key(VERSION, "audio", file_fingerprint(path))
+    if use_cache:
+        known = _read_json(file_key)
+        if known is not None:
+            return known["audio"]
+
+    cmd = ["ffmpeg", "-v", "error", "-nostdin", "-i", path, "-map", "0:a:0", "-c", "copy"]
+    cmd += ["-f", "streamhash", "-hash", "sha256", "-"]
+    stdout = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    match = _STREAMHASH.search(stdout)
+    if match is None:
+        raise RuntimeError(f"ffmpeg printed no audio hash for {path}")
+
+    if use_cache:
+        _write_json(file_key, {"audio": match.group(1)})
+    return match.group(1)
+
+
+def measure(path: str, chain: str, loudnorm: str, use_cache: bool = True) -> dict:
+    """loudnorm's first pass over the audio of `path` after `chain`.
+
+    Only the audio is decoded. Results are cached by the audio stream's
+    content (`audio_fingerprint`) and the filter chain in front of loudnorm.
+    Jump-cut versions of a file are measured on their own: the cut silences
+    sit above loudnorm's absolute gate, so removing them changes the
+    relative gate, LRA and offset, and the cut is re-encoded.
+    """
+
+    if use_cache:
+        key = _measurement_key(audio_fingerprint(path), chain)
+        measured = _read_json(key)
+        if measured is not None:
+            return measured
+
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-nostdin",
+        "-vn",
+        "-i",
+        path,
+        "-map",
+        "0:a:0",
+        "-af",
+        f"{chain}, {loudnorm}:print_format=json",
+        "-f",
+        "null",
+        "-",
+    ]
+    stderr = subprocess.run(cmd, check=True, capture_output=True, text=True).stderr
+    match = _JSON.search(stderr)
+    if match is None:
+        raise RuntimeError(f"loudnorm printed no measurement for {path}")
+
+    report = json.loads(match.group(0))
+    measured = {name: report[name] for name in MEASURED}
+    print(f"measured loudness of {path}: {measured}")
+
+    if use_cache:
+        _write_json(key, measured)
+    return measured
+
+
+def linear_loudnorm(loudnorm: str, measured: dict) -> str:
+    """Second-pass loudnorm applying `measured` as one linear gain."""
+
+    return (
+        f"{loudnorm}:measured_I={measured['input_i']}:measured_TP={measured['input_tp']}"
+        f":measured_LRA={measured['input_lra']}:measured_thresh={measured['input_thresh']}"
+        f":offset={measured['target_offset']}:linear=true"
+    )
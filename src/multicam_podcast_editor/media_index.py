@@ -0,0 +1,230 @@
+import json
+import subprocess
+from dataclasses import dataclass, field
+from threading import Lock
+
+import numpy as np
+
+from multicam_podcast_editor.cache import atomic_write, cache_key, cache_path, evict, file_fingerprint, lookup
+from multicam_podcast_editor.tprint import print_decorator
+
+print = print_decorator(print)
+
+KIND = "index"
+KEYFRAMES_KIND = "keyframes"
+MAX_BYTES = 64 << 20
+VERSION = 3
+
+_VIDEO_FIELDS = (
+    "codec_name", "profile", "level", "pix_fmt", "width", "height", "r_frame_rate", "time_base", "field_order"
+)
+_AUDIO_FIELDS = ("codec_name", "sample_rate", "channels")
+
+_indexes: dict[str, "MediaIndex"] = {}
+_keyframes: dict[str, np.ndarray] = {}
+_lock = Lock()
+
+
+@dataclass
+class MediaIndex:
+    """What the cutting stages need to know about a file, probed once.
+
+    `video` / `audio` hold the ffprobe fields of the first stream of each
+    type (empty when the file has none). `keyframes` holds the presentation
+    time of every video keyframe in seconds from `start_time` (the timeline
+    ffmpeg's -ss seeks on), sorted; finding them means
+    reading every packet of the file, so that only happens (and is cached
+    separately) the first time something asks for them.
+    """
+
+    path: str
+    duration: float
+    video: dict = field(default_factory=dict)
+    audio: dict = field(default_factory=dict)
+    start_time: float = 0.0
+    use_cache: bool = True
+    _keyframes: np.ndarray | None = field(default=None, repr=False)
+
+    @property
+    def keyframes(self) -> np.ndarray:
+        if self._keyframes is None:
+            self._keyframes = keyframe_index(self.path, self.use_cache)
+        return self._keyframes
+
+    def keyframe_before(self, t: float) -> float:
+        """Last keyframe at or before `t` (where an input seek to `t` lands)."""
+        i = int(np.searchsorted(self.keyframes, t + 1e-3, side="right")) - 1
+        return float(self.keyframes[i]) if i >= 0 else 0.0
+
+    def keyframe_after(self, t: float) -> float | None:
+        """First keyframe at or after `t`, None past the last one."""
+        i = int(np.searchsorted(self.keyframes, t - 1e-3, side="left"))
+        return float(self.keyframes[i]) if i < len(self.keyframes) else None
+
+    def snap(self, t: float, tolerance: float) -> float:
+        """The nearest keyframe to `t` if it is within `tolerance`, else `t`."""
+        if len(self.keyframes) == 0:
+            return t
+        i = int(np.searchsorted(self.keyframes, t))
+        near = [float(self.keyframes[j]) for j in (i - 1, i) if 0 <= j < len(self.keyframes)]
+        best = min(near, key=lambda k: abs(k - t))
+        return best if abs(best - t) <= tolerance else t
+
+
+def _probe(path: str) -> MediaIndex:
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-show_entries",
+        "format=duration,start_time:stream=codec_type," + ",".join(sorted(set(_VIDEO_FIELDS + _AUDIO_FIELDS))),
+        "-of",
+        "json",
+        path,
+    ]
+    probe = json.loads(subprocess.check_output(cmd, text=True))
+
+    video: dict = {}
+    audio: dict = {}
+    for stream in probe.get("streams", []):
+        if stream.get("codec_type") == "video" and not video:
+            video = {k: stream[k] for k in _VIDEO_FIELDS if k in stream}
+        elif stream.get("codec_type") == "audio" and not audio:
+            audio = {k: stream[k] for k in _AUDIO_FIELDS if k in stream}
+
+    if "sample_rate" in audio:
+        audio["sample_rate"] = int(audio["sample_rate"])
+
+    duration = float(probe.get("format", {}).get("duration", 0.0))
+    start_time = float(probe.get("format", {}).get("start_time", 0.0))
+    return MediaIndex(path, duration, video, audio, start_time)
+
+
+def _probe_keyframes(path: str, start_time: float) -> np.ndarray:
+    # packet flags only, nothing gets decoded
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "packet=pts_time,flags",
+        "-of",
+        "csv=p=0",
+        path,
+    ]
+    keyframes: list[float] = []
+    for line in subprocess.check_output(cmd, text=True).splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            keyframes.append(float(pts) - start_time)
+    return np.sort(np.asarray(keyframes, dtype=np.float64))
+
+
+def _load(path: str, key: str) -> MediaIndex | None:
+    cached = lookup(KIND, key, ".json")
+    if cached is None:
+        return None
+
+    try:
+        meta = json.loads(cached.read_text())
+        return MediaIndex(
+            path, meta["duration"], meta["video"], meta["audio"], meta["start_time"]
+        )
+    except (OSError, KeyError, ValueError) as e:
+        print(f"ignoring unreadable media index {cached}: {e}")
+        return None
+
+
+def _store(index: MediaIndex, key: str):
+    path = cache_path(KIND, key, ".json")
+    meta = {
+        "duration": index.duration,
+        "video": index.video,
+        "audio": index.audio,
+        "start_time": index.start_time,
+    }
+    atomic_write(path, lambda partial: partial.write_text(json.dumps(meta)))
+    evict(KIND, MAX_BYTES)
+
+
+def keyframe_index(path: str, use_cache: bool = True) -> np.ndarray:
+    """Sorted keyframe times of `path` relative to its start_time, from memory,
+    the on-disk cache, or a read of every video packet of the file."""
+
+    key = cache_key(VERSION, file_fingerprint(path))
+    with _lock:
+        if key in _keyframes:
+            return _keyframes[key]
+
+    keyframes = None
+    cached = lookup(KEYFRAMES_KIND, key, ".npy") if use_cache else None
+    if cached is not None:
+        try:
+            keyframes = np.load(cached)
+        except (OSError, ValueError) as e:
+            print(f"ignoring unreadable keyframe index {cached}: {e}")
+
+    if keyframes is None:
+        keyframes = _probe_keyframes(path, media_index(path, use_cache).start_time)
+        print(f"indexed {len(keyframes)} keyframes of {path}")
+        if use_cache:
+            target = cache_path(KEYFRAMES_KIND, key, ".npy")
+            atomic_write(target, lambda partial: np.save(partial, keyframes))
+            evict(KEYFRAMES_KIND, MAX_BYTES)
+
+    with _lock:
+        _keyframes[key] = keyframes
+    return keyframes
+
+
+def media_index(path: str, use_cache: bool = True) -> MediaIndex:
+    """Index of `path`, from memory, the on-disk cache, or a fresh probe.
+
+    Entries are keyed on the file's content fingerprint, so an index is only
+    rebuilt when the file changes. Only the container and stream headers are
+    read here; see `MediaIndex.keyframes`.
+    """
+
+    key = cache_key(VERSION, file_fingerprint(path))
+    with _lock:
+        if key in _indexes:
+            index = _indexes[key]
+            return MediaIndex(
+                path, index.duration, index.video, index.audio, index.start_time, use_cache
+            )
+
+    index = _load(path, key) if use_cache else None
+    if index is None:
+        index = _probe(path)
+        print(f"indexed {path}: {index.duration:.1f}s")
+        if use_cache:
+            _store(index, key)
+
+    index.use_cache = use_cache
+    with _lock:
+        _indexes[key] = index
+    return index
+
+
+# encoders able to produce a stream the concat demuxer will splice onto a
+# stream-copied recording
+MATCHING_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+
+
+def matching_encode(video: dict, preset: str) -> list[str]:
+    """ffmpeg output options re-encoding to the codec, profile, level, pixel
+    format and frame rate of the `video` stream fields, so the result
+    splices onto stream-copied pieces of it."""
+
+    encoder = MATCHING_ENCODERS[video["codec_name"]]
+    args = ["-c:v", encoder, "-preset", preset, "-crf", "18"]
+    args += ["-pix_fmt", video["pix_fmt"], "-r", video["r_frame_rate"]]
+    profile = str(video.get("profile", "")).lower().replace(" ", "")
+    if encoder == "libx264" and profile in ("baseline", "main", "high"):
+        args += ["-profile:v", profile]
+    if encoder == "libx264" and isinstance(video.get("level"), int) and video["level"] > 0:
+        # ffprobe reports H.264 levels times ten
+        args += ["-level:v", f"{video['level'] / 10:g}"]
+    return args
@@ -0,0 +1,130 @@
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
+
+from multicam_podcast_editor.cache import atomic_write, cache_key, cache_path, evict, file_fingerprint, lookup
+from multicam_podcast_editor.tprint import print_decorator
+
+print = print_decorator(print)
+
+KIND = "mezzanine"
+MAX_BYTES = 50 << 30
+VERSION = 1
+
+# Intermediate quality – the final multicam cut is stream-copied out of these.
+MEZZANINE_ENCODE = [
+    "-c:v", "libx264", "-preset", "veryfast", "-crf", "16", "-pix_fmt", "yuv420p",
+    "-sc_threshold", "0", "-video_track_timescale", "90000",
+]
+
+
+def _gop(fps: str) -> int:
+    """About half a second of frames."""
+    num, _, den = fps.partition("/")
+    return max(1, round(float(num) / float(den or 1) / 2))
+
+
+def _encode(
+    src_path: str,
+    padding: float,
+    duration: float,
+    video_format: Tuple[int, int, str],
+    bucket: float,
+    out_path: Path,
+    threads: int,
+):
+    width, height, fps = video_format
+    gop = _gop(fps)
+
+    # A person who started recording before the main video has their head cut
+    # off, one who started later gets black frames in front. Recordings that
+    # end early hold their last frame, so every mezzanine spans the full main
+    # timeline.
+    filters = [f"scale={width}:{height}", "setsar=1", f"fps={fps}", "format=yuv420p"]
+    filters.append(f"tpad=start_duration={max(padding, 0):.3f}:stop=-1:stop_mode=clone")
+
+    cmd = ["ffmpeg", "-v", "error", "-nostdin", "-y", "-threads", str(threads)]
+    if padding < 0:
+        cmd += ["-ss", f"{-padding:.3f}"]
+    cmd += ["-i", src_path, "-an", "-vf", ",".join(filters), "-t", f"{duration:.3f}"]
+    cmd += MEZZANINE_ENCODE
+    # Camera switches happen on bucket boundaries, which all get a keyframe so
+    # they can be cut without re-encoding.
+    cmd += ["-g", str(gop), "-keyint_min", str(gop)]
+    cmd += ["-force_key_frames", f"expr:gte(t,n_forced*{bucket})"]
+
+    def encode(partial: Path):
+        print(f"normalizing {src_path} to {width}x{height}@{fps}: {' '.join(cmd + [str(partial)])}")
+        subprocess.run(cmd + [str(partial)], check=True)
+
+    atomic_write(out_path, encode)
+
+
+def normalize(
+    video_paths: List[str],
+    paddings: List[float],
+    duration: float,
+    video_format: Tuple[int, int, str],
+    bucket: float = 5.0,
+    threads: int = 10,
+    use_cache: bool = True,
+) -> List[Path]:
+    """Transcode every camera once into a common mezzanine on the main timeline.
+
+    All mezzanines share resolution, frame rate, pixel format, timebase and a
+    short GOP, start at the main video's first frame (the audio-sync padding is
+    baked in) and run for `duration` seconds with a keyframe on every `bucket`
+    boundary. Any timeline segment can then be stream-copied out of them.
+
+    Mezzanines are kept in the cache folder keyed by the source's content,
+    padding and target format, so re-runs on the same footage reuse them.
+    """
+
+    work_dir = Path("temp/mezzanine")
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    outputs: list[Path] = []
+    jobs: list[tuple[str, float, Path]] = []
+    for src_path, padding in zip(video_paths, paddings):
+        if use_cache:
+            key = cache_key(
+                VERSION,
+                file_fingerprint(src_path),
+                round(padding, 3),
+                round(duration, 3),
+                video_format,
+                bucket,
+                MEZZANINE_ENCODE,
+            )
+            cached = lookup(KIND, key, ".mp4")
+            if cached is not None:
+                print(f"reusing mezzanine of {src_path} from {cached}")
+                outputs.append(cached)
+                continue
+            out_path = cache_path(KIND, key, ".mp4")
+        else:
+            out_path = work_dir / f"{len(outputs):02d}_{Path(src_path).stem}.mp4"
+
+        outputs.append(out_path)
+        jobs.append((src_path, padding, out_path))
+
+    if len(jobs) > 0:
+        workers = max(1, min(len(jobs), threads))
+        threads_per_job = max(1, threads // workers)
+        print(f"normalizing {len(jobs)} cameras with {workers} workers x {threads_per_job} threads")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # list() so a failed encode raises here
+            list(
+                pool.map(
+                    lambda job: _encode(
+                        job[0], job[1], duration, video_format, bucket, job[2], threads_per_job
+                    ),
+                    jobs,
+                )
+            )
+
+    if use_cache:
+        evict(KIND, MAX_BYTES)
+
+    return outputs
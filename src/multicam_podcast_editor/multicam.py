@@ -1,12 +1,23 @@
-import math
 import re
 import subprocess
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Tuple
 from os import PathLike
 
 from moviepy import VideoClip  # only used for durations/metadata – no heavy rendering
 
+from multicam_podcast_editor.cache import cache_key, cache_path, evict, file_fingerprint, lookup
+from multicam_podcast_editor.media_index import MATCHING_ENCODERS, matching_encode, media_index
+from multicam_podcast_editor.mezzanine import normalize
+from multicam_podcast_editor.timeline import (
+    plan_multicam,
+    source_segments,
+    write_edl,
+    write_plan_json,
+)
+
 
 def _parse_screenshare_times(screenshares: List[str]) -> List[Tuple[float, float]]:
     """Extract start- and end-times for screen-share clips from their filenames.
@@ -32,15 +43,9 @@ def _parse_screenshare_times(screenshares: List[str]) -> List[Tuple[float, float
         start_seconds = hours * 3600 + minutes * 60 + seconds + milliseconds / 1000
 
         # We need the duration of the screen-share clip to know when to stop
-        # de-focusing. We query ffprobe instead of loading with MoviePy.
+        # de-focusing. We use the media index instead of loading with MoviePy.
         try:
-            import json, shlex
-
-            cmd = shlex.split(
-                f"ffprobe -v error -select_streams v:0 -show_entries stream=duration -of json '{ss}'"
-            )
-            probe = subprocess.check_output(cmd, text=True)
-            duration = float(json.loads(probe)["streams"][0]["duration"])
+            duration = media_index(ss).duration
         except Exception:
             duration = 0.0
 
@@ -54,6 +59,11 @@ def _parse_screenshare_times(screenshares: List[str]) -> List[Tuple[float, float
     return reduced_focus_times
 
 
+def _frame_rate(rate: str) -> float:
+    num, _, den = rate.partition("/")
+    return float(num) / float(den or 1) if float(den or 1) else 0.0
+
+
 def _safe_mkdir(path: "Path | str | PathLike") -> None:
     """Create directory recursively without throwing if it already exists."""
     Path(path).mkdir(parents=True, exist_ok=True)
@@ -67,6 +77,12 @@ def multicam(
     paddings: List[float],
     threads: int = 10,
     output_name: str = "final",
+    bucket: float = 5.0,
+    audio_paths: List[str] | None = None,
+    render_workers: int = 0,
+    backend: str = "segments",
+    plan_only: bool = False,
+    use_cache: bool = True,
 ):
     """Create a multi-cam cut using ffmpeg for speed.
 
@@ -80,200 +96,401 @@ def multicam(
     vids
         MoviePy clips (only used for metadata such as duration – no rendering).
     average_volumes
-        5-second window max-volume buckets calculated in :pyfunc:`analyze`.
+        `bucket`-second window max-volume buckets calculated in :pyfunc:`analyze`.
     paddings
         The audio-sync padding (in seconds) applied to each video. ``paddings[0]``
-        will always be ``0`` for the main video.
+        will always be ``0`` for the main video, a negative padding means the
+        person started recording before the main video.
+    bucket
+        Length in seconds of each decision window. Must match the window
+        `average_volumes` was built with.
+    audio_paths
+        Where to read each video's audio from for the mix, when it differs
+        from `video_paths` (resampled ingest sidecars). Defaults to
+        `video_paths`.
+    render_workers
+        How many segments to extract at once. ``0`` picks a default from
+        `threads`, which is then split between the workers.
+    backend
+        One of :pydata:`RENDER_BACKENDS`, see :pyfunc:`render_timeline`.
+    plan_only
+        Only decide the edit and write it to ``output/<output_name>.timeline.json``
+        and ``.edl`` (which always happens), without rendering.
+    use_cache
+        Reuse (and store) encoded segments in the cache folder.
     """
 
     print("[multicam] Using ffmpeg backend ✅")
 
     ###########################################################################
-    # Build the decision timeline – which camera should be shown each 5 secs. #
+    # Build the decision timeline – which camera should be shown per bucket.  #
     ###########################################################################
 
     reduced_focus_times = _parse_screenshare_times(screenshares)
 
-    seconds_divided_by_5: int = math.ceil(vids[0].audio.duration / 5)  # pyright: ignore
-    main_clip = vids[0]
+    # Timeline decision data-structure: list of (video_index, local_start, duration),
+    # with consecutive buckets from the same source already merged.
+    final_segments = plan_multicam(
+        average_volumes,
+        vids[0].audio.duration,  # pyright: ignore
+        [person.duration for person in vids[1:]],
+        reduced_focus_times,
+        bucket,
+    )
+    print(f"[multicam] planned {len(final_segments)} segments")
 
-    people_vols = average_volumes[1:]
-    people = vids[1:]
+    ###########################################################################
+    # Export the plan so the edit can be reviewed without rendering.         #
+    ###########################################################################
 
-    # When a person's video ends before the main video, avoid showing a frozen
-    # last frame.
-    mandatory_unfocus: list[tuple[float, float]] = []
-    for person in people:
-        if person.duration < main_clip.duration:
-            mandatory_unfocus.append((person.duration - 5, person.duration + 5))
+    output_dir = Path("output")
+    _safe_mkdir(output_dir)
+    plan_json = output_dir / f"{output_name}.timeline.json"
+    plan_edl = output_dir / f"{output_name}.edl"
+    write_plan_json(plan_json, final_segments, video_paths, paddings, bucket)
 
-    # Timeline decision data-structure: list of (video_index, local_start, duration)
-    final_segments: List[Tuple[int, float, float]] = []
+    main_video = media_index(video_paths[0]).video
+    fps = round(_frame_rate(main_video.get("r_frame_rate", "30/1"))) or 30
+    write_edl(plan_edl, final_segments, video_paths, paddings, fps, output_name)
+    print(f"[multicam] wrote timeline to {plan_json} and {plan_edl}")
 
-    unfocused_count = 0
-    focused_count = 0
+    if plan_only:
+        print("[multicam] plan only – skipping the render")
+        return
 
-    # Helper for adding a segment with the correct (possibly trimmed) duration.
-    def _add_segment(idx: int, start_time: float, end_time: float):
-        duration = end_time - start_time
-        if duration <= 0:
-            return
-        final_segments.append((idx, start_time, duration))
+    ###########################################################################
+    # Render with ffmpeg                                                      #
+    ###########################################################################
 
-    # First 5-second chunk is always the main.
-    _add_segment(0, 0, 5)
+    output_path = Path("output") / f"{output_name}.mp4"
+    render_timeline(
+        final_segments,
+        video_paths,
+        paddings,
+        output_path,
+        threads,
+        audio_paths,
+        backend,
+        render_workers,
+        use_cache,
+        bucket,
+    )
 
-    for i in range(1, seconds_divided_by_5):
-        sec = i * 5
-        n_sec = sec + 5
+    print(f"[multicam] ✅ finished – output at {output_path}")
 
-        # Person stopped recording – fallback to main.
-        if any(start < sec < end for start, end in mandatory_unfocus):
-            _add_segment(0, sec, n_sec)
-            continue
 
-        # Closing seconds of the main video – keep it on-screen.
-        if sec > main_clip.duration - 11:
-            _add_segment(0, sec, n_sec)
-            continue
+###############################################################################
+# Rendering backends                                                          #
+###############################################################################
 
-        # If we are currently in a screenshare window & haven't been unfocused
-        # for >10 seconds, keep main.
-        if unfocused_count < 2 and any(start < sec < end for start, end in reduced_focus_times):
-            _add_segment(0, sec, n_sec)
-            unfocused_count, focused_count = unfocused_count + 1, 0
-            continue
+RENDER_BACKENDS = ("segments", "filtergraph", "smart", "mezzanine")
 
-        # Look at who is loudest in this 5 second bucket.
-        if focused_count < 2:
-            current_iter_vols = [xvol[i] if len(xvol) > i else -100 for xvol in people_vols]
-            sorted_vols = sorted(enumerate(current_iter_vols), key=lambda x: x[1], reverse=True)
+# ffmpeg copes with much bigger graphs, but every segment keeps a trim filter
+# (and possibly a few buffered frames) alive, so long timelines are rendered
+# in chunks of this many segments and stitched back together.
+MAX_GRAPH_SEGMENTS = 150
 
-            first = sorted_vols[0]
-            second = sorted_vols[1] if len(sorted_vols) > 1 else None
+VIDEO_ENCODE = "-c:v libx264 -preset ultrafast -crf 18 -pix_fmt yuv420p"
+# short GOP so every extracted segment starts on a clean keyframe
+SEGMENT_ENCODE = f"{VIDEO_ENCODE} -g 15 -keyint_min 15 -sc_threshold 0"
 
-            if second is None or first[1] * 0.05 > second[1]:
-                # Person `first[0]` (plus 1 because `people` excludes main) wins.
-                _add_segment(first[0] + 1, sec, n_sec)
-                unfocused_count, focused_count = 0, focused_count + 1
-                continue
+# Encoded segments are kept between runs so a re-render after small edits only
+# encodes the segments that changed.
+SEGMENT_CACHE = "segments"
+SEGMENT_CACHE_BYTES = 20 << 30
 
-        # Default to main.
-        _add_segment(0, sec, n_sec)
-        unfocused_count, focused_count = unfocused_count + 1, 0
 
-    ###########################################################################
-    # Merge consecutive segments from the same source to avoid excess cuts.   #
-    ###########################################################################
+def _default_render_workers(threads: int) -> int:
+    """Roughly two encoder threads per segment, which is where ultrafast x264
+    stops scaling on short clips."""
+    return max(1, threads // 2)
 
-    if len(final_segments) > 1:
-        merged_segments: List[Tuple[int, float, float]] = []
-        cur_idx, cur_start, cur_dur = final_segments[0]
-
-        for next_idx, next_start, next_dur in final_segments[1:]:
-            # If the next segment is from the same source and directly follows
-            # the current one, extend the duration instead of creating a cut.
-            if (
-                next_idx == cur_idx
-                and abs((cur_start + cur_dur) - next_start) < 1e-3  # contiguous
-            ):
-                cur_dur += next_dur
-            else:
-                merged_segments.append((cur_idx, cur_start, cur_dur))
-                cur_idx, cur_start, cur_dur = next_idx, next_start, next_dur
-
-        merged_segments.append((cur_idx, cur_start, cur_dur))
-        final_segments = merged_segments
 
-    ###########################################################################
-    # Render video with ffmpeg                                                    #
-    ###########################################################################
+def _run_ffmpeg_jobs(jobs: List[Tuple[int, str]], workers: int, what: str = "segment") -> None:
+    """Run ffmpeg commands through a bounded worker pool.
+
+    Every job is attempted even when others fail, the failures are reported
+    per job and then raised together.
+    """
+
+    def _run(job: Tuple[int, str]) -> Tuple[int, str | None]:
+        job_idx, cmd = job
+        print(f"[multicam] rendering {what} {job_idx}: {cmd}")
+        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+        if result.returncode != 0:
+            return job_idx, result.stderr.strip() or f"exit code {result.returncode}"
+        return job_idx, None
+
+    failures: list[tuple[int, str]] = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for job_idx, error in pool.map(_run, jobs):
+            if error is not None:
+                print(f"[multicam] ❌ {what} {job_idx} failed: {error}")
+                failures.append((job_idx, error))
+
+    if failures:
+        failed = ", ".join(str(idx) for idx, _ in failures)
+        raise RuntimeError(f"[multicam] failed to render {what}s {failed}")
+
+
+def _audio_mix_filter(paddings: List[float], first_input: int = 0) -> str:
+    """Filter graph mixing the person tracks, aligned to the main video.
+
+    The person audio inputs are expected at ffmpeg input indices
+    ``first_input`` onwards, the mix comes out as ``[aout]``.
+    """
+
+    delay_filters = []
+    delayed_labels = []
+    for idx, pad in enumerate(paddings[1:], start=0):
+        label_out = f"a{idx}"
+        input_idx = first_input + idx
+        if pad >= 0:
+            delay_ms = int(pad * 1000)
+            delay_filters.append(f"[{input_idx}:a]adelay={delay_ms}|{delay_ms}[{label_out}]")
+        else:
+            # started before the main video – drop the head instead
+            delay_filters.append(
+                f"[{input_idx}:a]atrim=start={-pad:.3f},asetpts=PTS-STARTPTS[{label_out}]"
+            )
+        delayed_labels.append(f"[{label_out}]")
+
+    return ";".join(delay_filters + [
+        "".join(delayed_labels) + f"amix=inputs={len(delayed_labels)}:duration=longest[aout]"
+    ])
 
+
+class _BranchTimer:
+    """Wall-clock time at which each branch of the render pipeline finished."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.finished: dict[str, float] = {}
+
+    def finish(self, branch: str):
+        self.finished[branch] = time.perf_counter() - self.start
+
+    def report(self):
+        parts = [f"{branch} done at {elapsed:.1f}s" for branch, elapsed in self.finished.items()]
+        inputs = {b: t for b, t in self.finished.items() if b != "mux"}
+        if len(inputs) > 1:
+            parts.append(f"critical path: {max(inputs, key=inputs.get)}")
+        print(f"[multicam] timings: {', '.join(parts)}")
+
+
+def _mix_audio(
+    paddings: List[float], audio_paths: List[str], audio_mix: Path, timer: _BranchTimer
+) -> Path:
+    """Mix the person tracks into `audio_mix`, aligned to the main video."""
+
+    person_inputs = " ".join(f"-i '{p}'" for p in audio_paths[1:])
+    filter_complex = _audio_mix_filter(paddings)
+
+    cmd_audio = (
+        f"ffmpeg -loglevel error {person_inputs} -filter_complex \"{filter_complex}\" "
+        f"-map '[aout]' -c:a aac -b:a 256k -y '{audio_mix}'"
+    )
+    print(f"[multicam] mixing audio: {cmd_audio}")
+    subprocess.run(cmd_audio, shell=True, check=True)
+    timer.finish("audio mix")
+    return audio_mix
+
+
+def render_timeline(
+    final_segments: List[Tuple[int, float, float]],
+    video_paths: List[str],
+    paddings: List[float],
+    output_path: Path,
+    threads: int = 10,
+    audio_paths: List[str] | None = None,
+    backend: str = "segments",
+    render_workers: int = 0,
+    use_cache: bool = True,
+    bucket: float = 5.0,
+):
+    """Render a merged multicam timeline and the person audio mix to `output_path`.
+
+    ``segments`` extracts every segment with its own ffmpeg process and
+    concatenates them, ``filtergraph`` compiles the timeline into trim/concat
+    filter graphs and encodes the whole program (chunked when very long) in as
+    few ffmpeg processes as possible, and ``smart`` only re-encodes from each
+    cut up to the next keyframe and stream-copies the rest. ``mezzanine``
+    transcodes every camera once into a common format aligned to the main
+    timeline, with keyframes on every `bucket` boundary, and stream-copies the
+    whole timeline out of those.
+
+    With `use_cache`, the ``segments`` backend keeps every encoded segment and
+    the ``mezzanine`` backend every camera's mezzanine in the cache folder,
+    keyed by footage, range and encode settings, and reuses them on later
+    renders.
+    """
+
+    assert backend in RENDER_BACKENDS, f"unknown render backend {backend}"
+    _safe_mkdir(output_path.parent)
+
+    mapped_segments = source_segments(final_segments, paddings)
+    audio_paths = audio_paths or video_paths
+
+    # The audio mix only depends on the paddings, so it runs next to the video
+    # work and the two meet at the final mux. A single-pass filter graph mixes
+    # the audio itself.
+    timer = _BranchTimer()
+    single_pass = backend == "filtergraph" and len(mapped_segments) <= MAX_GRAPH_SEGMENTS
+    with ThreadPoolExecutor(max_workers=1) as audio_pool:
+        audio_mix: Future | None = None
+        if len(video_paths) > 1 and not single_pass:
+            audio_dir = Path("temp/multicam")
+            _safe_mkdir(audio_dir)
+            audio_mix = audio_pool.submit(
+                _mix_audio, paddings, audio_paths, audio_dir / "audio_mix.m4a", timer
+            )
+
+        if backend == "smart":
+            _render_smart(
+                mapped_segments, video_paths, output_path, threads, render_workers, audio_mix,
+                timer, use_cache,
+            )
+        elif backend == "mezzanine":
+            _render_mezzanine(
+                final_segments, mapped_segments, video_paths, paddings, output_path, threads,
+                bucket, audio_mix, timer, use_cache,
+            )
+        elif backend == "filtergraph":
+            _render_filtergraph(
+                mapped_segments, video_paths, paddings, audio_paths, output_path, threads,
+                render_workers, audio_mix, timer,
+            )
+        else:
+            _render_segments(
+                mapped_segments, video_paths, output_path, threads, render_workers,
+                audio_mix, timer, use_cache,
+            )
+
+    timer.report()
+
+
+def _render_segments(
+    src_segments: List[Tuple[int, float, float]],
+    video_paths: List[str],
+    output_path: Path,
+    threads: int,
+    render_workers: int,
+    audio_mix: Future | None,
+    timer: _BranchTimer,
+    use_cache: bool = True,
+):
     segment_dir = Path("temp/segments")
     _safe_mkdir(segment_dir)
 
-    concat_file = segment_dir / "list.txt"
-    with concat_file.open("w") as f_list:
-        for seg_idx, (vid_idx, local_start, duration) in enumerate(final_segments):
-            # Map local timeline to original file timeline.
-            if vid_idx == 0:
-                src_start = local_start + 5  # main video had first 5 s removed.
-            else:
-                offset = 5 - paddings[vid_idx]
-                src_start = local_start + offset
-
-                # If the calculated start would be before 0, we fallback to main
-                # camera for safety.
-                if src_start < 0:
-                    vid_idx = 0
-                    src_start = local_start + 5
-
-            src_path = video_paths[vid_idx]
-
-            out_file = segment_dir / f"seg_{seg_idx:04d}.mp4"
-
-            # Build ffmpeg command for the individual segment.  We *re-encode*
-            # with an ultrafast preset instead of stream-copy so the first
-            # frame becomes a clean keyframe.  This prevents visual glitches
-            # (black/green flicker) when switching between cameras that use
-            # different GOP alignment.
+    fingerprints: dict[int, str] = {}
+    if use_cache:
+        for vid_idx in {vid_idx for vid_idx, _, _ in src_segments}:
+            fingerprints[vid_idx] = file_fingerprint(video_paths[vid_idx])
+
+    # (segment index, source, start, duration, encoded file, where it ends up)
+    pending: list[tuple[int, str, float, float, Path, Path]] = []
+    segment_files: list[Path] = []
+    reused = 0
+    for seg_idx, (vid_idx, src_start, duration) in enumerate(src_segments):
+        out_file = segment_dir / f"seg_{seg_idx:04d}.mp4"
+        if use_cache:
+            # An unchanged segment (same footage, range and encode settings)
+            # from an earlier render is reused as is.
+            key = cache_key(
+                fingerprints[vid_idx], round(src_start, 3), round(duration, 3), SEGMENT_ENCODE
+            )
+            cached = lookup(SEGMENT_CACHE, key, ".mp4")
+            if cached is not None:
+                segment_files.append(cached)
+                reused += 1
+                continue
+
+            # encoded in temp/ and only moved into the cache once complete,
+            # so a failed encode never ends up there
+            final = cache_path(SEGMENT_CACHE, key, ".mp4")
+        else:
+            final = out_file
+
+        pending.append((seg_idx, video_paths[vid_idx], src_start, duration, out_file, final))
+        segment_files.append(final)
+
+    if use_cache:
+        print(f"[multicam] reusing {reused} of {len(src_segments)} segments from the cache")
+
+    if len(pending) > 0:
+        workers = render_workers or _default_render_workers(threads)
+        workers = max(1, min(workers, len(pending)))
+        # The thread budget is shared between the workers. Short ultrafast
+        # segments can't use many threads each, so more workers beats more threads.
+        threads_per_worker = max(1, threads // workers)
+
+        # Build ffmpeg command for the individual segment.  We *re-encode*
+        # with an ultrafast preset instead of stream-copy so the first
+        # frame becomes a clean keyframe.  This prevents visual glitches
+        # (black/green flicker) when switching between cameras that use
+        # different GOP alignment.
+        extract_jobs: list[tuple[int, str]] = []
+        for seg_idx, src_path, src_start, duration, out_file, final in pending:
             cmd_extract = (
-                f"ffmpeg -loglevel error -threads {threads} -ss {src_start} -t {duration} "
-                f"-i '{src_path}' -c:v libx264 -preset ultrafast -crf 18 -pix_fmt yuv420p "
-                f"-g 15 -keyint_min 15 -sc_threshold 0 -an -y '{out_file}'"
+                f"ffmpeg -loglevel error -threads {threads_per_worker} -ss {src_start} -t {duration} "
+                f"-i '{src_path}' {SEGMENT_ENCODE} -an -y '{out_file}'"
             )
-            print(f"[multicam] extracting segment {seg_idx}: {cmd_extract}")
-            subprocess.run(cmd_extract, shell=True, check=True)
+            if final != out_file:
+                cmd_extract += f" && mv '{out_file}' '{final}'"
+            extract_jobs.append((seg_idx, cmd_extract))
 
-            f_list.write(f"file '{out_file.resolve()}'\n")
+        print(
+            f"[multicam] extracting {len(extract_jobs)} segments with {workers} workers "
+            f"x {threads_per_worker} threads"
+        )
+        _run_ffmpeg_jobs(extract_jobs, workers)
 
-    combined_video = segment_dir / "combined_video.mp4"
-    cmd_concat = f"ffmpeg -loglevel error -threads {threads} -f concat -safe 0 -i '{concat_file}' -c copy -y '{combined_video}'"
-    print(f"[multicam] concatenating segments: {cmd_concat}")
-    subprocess.run(cmd_concat, shell=True, check=True)
+    _concat_and_mux(segment_files, segment_dir, audio_mix, output_path, threads, timer)
 
-    ###########################################################################
-    # Mix audio (persons only)                                                  #
-    ###########################################################################
+    if use_cache:
+        evict(SEGMENT_CACHE, SEGMENT_CACHE_BYTES)
 
-    if len(video_paths) > 1:
-        audio_mix = segment_dir / "audio_mix.m4a"
 
-        # Build inputs for ffmpeg command.
-        person_inputs = " ".join(f"-i '{p}'" for p in video_paths[1:])
+def _concat_and_mux(
+    pieces: List[Path],
+    work_dir: Path,
+    audio_mix: Future | None,
+    output_path: Path,
+    threads: int,
+    timer: _BranchTimer,
+    ranges: List[Tuple[float, float]] | None = None,
+):
+    """Stream-copy the rendered pieces together and put the person audio mix on it.
 
-        delay_filters = []
-        delayed_labels = []
-        for idx, pad in enumerate(paddings[1:], start=0):
-            delay_ms = max(0, (pad - 5)) * 1000  # align to the 5-second trimming
-            label_out = f"a{idx}"
-            delay_filters.append(f"[{idx}:a]adelay={int(delay_ms)}|{int(delay_ms)}[{label_out}]")
-            delayed_labels.append(f"[{label_out}]")
+    `ranges` optionally limits each piece to an (in, out) point.
+    """
 
-        filter_complex = ";".join(delay_filters + [
-            "".join(delayed_labels) + f"amix=inputs={len(delayed_labels)}:duration=longest[aout]"
-        ])
+    # Written in timeline order regardless of which piece finished first.
+    concat_file = work_dir / "list.txt"
+    with concat_file.open("w") as f_list:
+        for piece_idx, out_file in enumerate(pieces):
+            f_list.write(f"file '{out_file.resolve()}'\n")
+            if ranges is not None:
+                inpoint, outpoint = ranges[piece_idx]
+                f_list.write(f"inpoint {inpoint:.3f}\noutpoint {outpoint:.3f}\n")
 
-        cmd_audio = (
-            f"ffmpeg -loglevel error {person_inputs} -filter_complex \"{filter_complex}\" "
-            f"-map '[aout]' -c:a aac -b:a 256k -y '{audio_mix}'"
-        )
-        print(f"[multicam] mixing audio: {cmd_audio}")
-        subprocess.run(cmd_audio, shell=True, check=True)
-    else:
-        audio_mix = None
+    combined_video = work_dir / "combined_video.mp4"
+    cmd_concat = f"ffmpeg -loglevel error -threads {threads} -f concat -safe 0 -i '{concat_file}' -c copy -y '{combined_video}'"
+    print(f"[multicam] concatenating segments: {cmd_concat}")
+    subprocess.run(cmd_concat, shell=True, check=True)
+    timer.finish("video")
 
     ###########################################################################
     # Combine video & audio                                                     #
     ###########################################################################
 
-    output_path = Path("output") / f"{output_name}.mp4"
-    _safe_mkdir(output_path.parent)
+    # waits for the audio branch if it is still running
+    audio_mix_path = audio_mix.result() if audio_mix is not None else None
 
-    if audio_mix and audio_mix.exists():
+    if audio_mix_path and audio_mix_path.exists():
         cmd_mux = (
-            f"ffmpeg -loglevel error -i '{combined_video}' -i '{audio_mix}' -map 0:v:0 -map 1:a:0 "
-            f"-c:v copy -c:a aac -shortest -y '{output_path}'"
+            f"ffmpeg -loglevel error -i '{combined_video}' -i '{audio_mix_path}' -map 0:v:0 -map 1:a:0 "
+            f"-c:v copy -c:a copy -shortest -y '{output_path}'"
         )
     else:
         # Fallback: use the video with its original (segment) audio – unlikely
@@ -282,5 +499,273 @@ def multicam(
 
     print(f"[multicam] muxing final video: {cmd_mux}")
     subprocess.run(cmd_mux, shell=True, check=True)
+    timer.finish("mux")
 
-    print(f"[multicam] ✅ finished – output at {output_path}")
+
+def _timeline_graph(
+    src_segments: List[Tuple[int, float, float]],
+    video_paths: List[str],
+    video_format: Tuple[int, int, str],
+) -> Tuple[List[str], str]:
+    """Compile segments into ffmpeg inputs and a trim/concat graph ending in ``[vout]``.
+
+    Every source is opened once, seeked to the first frame the chunk needs
+    from it, and split between its segments.
+    """
+
+    width, height, fps = video_format
+
+    order: list[int] = []
+    for vid_idx, _, _ in src_segments:
+        if vid_idx not in order:
+            order.append(vid_idx)
+
+    seeks = {
+        vid_idx: min(start for idx, start, _ in src_segments if idx == vid_idx)
+        for vid_idx in order
+    }
+    inputs = [f"-ss {seeks[vid_idx]:.3f} -i '{video_paths[vid_idx]}'" for vid_idx in order]
+
+    filters: list[str] = []
+    branch_labels: dict[int, list[str]] = {}
+    for input_idx, vid_idx in enumerate(order):
+        uses = sum(1 for idx, _, _ in src_segments if idx == vid_idx)
+        labels = [f"s{input_idx}_{n}" for n in range(uses)]
+        branch_labels[vid_idx] = labels
+        if uses == 1:
+            filters.append(f"[{input_idx}:v]null[{labels[0]}]")
+        else:
+            filters.append(f"[{input_idx}:v]split={uses}" + "".join(f"[{x}]" for x in labels))
+
+    concat_labels = []
+    for seg_idx, (vid_idx, src_start, duration) in enumerate(src_segments):
+        branch = branch_labels[vid_idx].pop(0)
+        # -ss before -i resets the timestamps to 0 at the seek point
+        trim_start = src_start - seeks[vid_idx]
+        filters.append(
+            f"[{branch}]trim=start={trim_start:.3f}:duration={duration:.3f},setpts=PTS-STARTPTS,"
+            f"scale={width}:{height},setsar=1,fps={fps},format=yuv420p[v{seg_idx}]"
+        )
+        concat_labels.append(f"[v{seg_idx}]")
+
+    filters.append("".join(concat_labels) + f"concat=n={len(concat_labels)}:v=1:a=0[vout]")
+    return inputs, ";\n".join(filters)
+
+
+def _render_filtergraph(
+    src_segments: List[Tuple[int, float, float]],
+    video_paths: List[str],
+    paddings: List[float],
+    audio_paths: List[str],
+    output_path: Path,
+    threads: int,
+    render_workers: int,
+    audio_mix: Future | None,
+    timer: _BranchTimer,
+):
+    graph_dir = Path("temp/graph")
+    _safe_mkdir(graph_dir)
+
+    # every camera is scaled to the main camera's format so concat accepts them
+    main_video = media_index(video_paths[0]).video
+    video_format = (int(main_video["width"]), int(main_video["height"]), main_video["r_frame_rate"])
+
+    chunks = [
+        src_segments[i : i + MAX_GRAPH_SEGMENTS]
+        for i in range(0, len(src_segments), MAX_GRAPH_SEGMENTS)
+    ]
+    has_audio = len(video_paths) > 1
+
+    if len(chunks) == 1:
+        # Everything, audio included, in a single ffmpeg process.
+        inputs, graph = _timeline_graph(chunks[0], video_paths, video_format)
+        maps = "-map '[vout]'"
+        if has_audio:
+            inputs += [f"-i '{p}'" for p in audio_paths[1:]]
+            graph += ";\n" + _audio_mix_filter(paddings, first_input=len(inputs) - len(audio_paths[1:]))
+            maps += " -map '[aout]' -c:a aac -b:a 256k -shortest"
+
+        script = graph_dir / "program.txt"
+        script.write_text(graph)
+        cmd = (
+            f"ffmpeg -loglevel error -threads {threads} {' '.join(inputs)} "
+            f"-filter_complex_script '{script}' {maps} {VIDEO_ENCODE} -y '{output_path}'"
+        )
+        print(f"[multicam] rendering {len(chunks[0])} segments in one pass: {cmd}")
+        subprocess.run(cmd, shell=True, check=True)
+        timer.finish("single pass")
+        return
+
+    # Too many segments for one graph: render the chunks (in parallel), then
+    # stitch them and put the audio mix on.
+    workers = max(1, min(render_workers or _default_render_workers(threads), len(chunks)))
+    threads_per_worker = max(1, threads // workers)
+
+    jobs: list[tuple[int, str]] = []
+    chunk_files: list[Path] = []
+    for chunk_idx, chunk in enumerate(chunks):
+        inputs, graph = _timeline_graph(chunk, video_paths, video_format)
+        script = graph_dir / f"chunk_{chunk_idx:04d}.txt"
+        script.write_text(graph)
+        out_file = graph_dir / f"chunk_{chunk_idx:04d}.mp4"
+        jobs.append(
+            (
+                chunk_idx,
+                f"ffmpeg -loglevel error -threads {threads_per_worker} {' '.join(inputs)} "
+                f"-filter_complex_script '{script}' -map '[vout]' {VIDEO_ENCODE} -an -y '{out_file}'",
+            )
+        )
+        chunk_files.append(out_file)
+
+    print(f"[multicam] rendering {len(chunks)} chunks with {workers} workers")
+    _run_ffmpeg_jobs(jobs, workers, "chunk")
+
+    _concat_and_mux(chunk_files, graph_dir, audio_mix, output_path, threads, timer)
+
+
+def _render_mezzanine(
+    final_segments: List[Tuple[int, float, float]],
+    src_segments: List[Tuple[int, float, float]],
+    video_paths: List[str],
+    paddings: List[float],
+    output_path: Path,
+    threads: int,
+    bucket: float,
+    audio_mix: Future | None,
+    timer: _BranchTimer,
+    use_cache: bool,
+):
+    """Normalize the cameras once, then cut the timeline by pure stream copy."""
+
+    main_video = media_index(video_paths[0]).video
+    video_format = (int(main_video["width"]), int(main_video["height"]), main_video["r_frame_rate"])
+    duration = max(start + length for _, start, length in final_segments)
+
+    mezzanines = normalize(
+        video_paths, paddings, duration, video_format, bucket, threads, use_cache
+    )
+    timer.finish("mezzanine")
+
+    # The mezzanines share the main timeline, so cut at timeline positions. The
+    # camera still comes from the mapped segment, which falls back to the main
+    # camera where a person hadn't started recording yet.
+    pieces: list[Path] = []
+    ranges: list[tuple[float, float]] = []
+    for (vid_idx, _, _), (_, local_start, length) in zip(src_segments, final_segments):
+        pieces.append(mezzanines[vid_idx])
+        ranges.append((local_start, local_start + length))
+
+    piece_dir = Path("temp/mezzanine")
+    _safe_mkdir(piece_dir)
+    print(f"[multicam] stream-copying {len(pieces)} segments out of the mezzanines")
+    _concat_and_mux(pieces, piece_dir, audio_mix, output_path, threads, timer, ranges)
+
+
+def _render_smart(
+    src_segments: List[Tuple[int, float, float]],
+    video_paths: List[str],
+    output_path: Path,
+    threads: int,
+    render_workers: int,
+    audio_mix: Future | None,
+    timer: _BranchTimer,
+    use_cache: bool = True,
+):
+    """Re-encode only the partial GOPs at each end of a segment, copy the rest.
+
+    Pieces are written as MPEG-TS so the re-encoded heads carry their own
+    parameter sets in-band and the concat demuxer can splice them onto the
+    copied camera streams. That only works when every camera shares codec,
+    profile, level, resolution, pixel format, frame rate and timebase and is
+    progressive; otherwise this falls back to the segments backend.
+    """
+
+    used = sorted({vid_idx for vid_idx, _, _ in src_segments})
+    indexes = {vid_idx: media_index(video_paths[vid_idx], use_cache) for vid_idx in used}
+    streams = {vid_idx: index.video for vid_idx, index in indexes.items()}
+    reference = streams[used[0]]
+    matching_keys = (
+        "codec_name", "profile", "level", "pix_fmt", "width", "height", "r_frame_rate", "time_base"
+    )
+    compatible = (
+        reference.get("codec_name") in MATCHING_ENCODERS
+        # the heads are encoded progressive
+        and reference.get("field_order", "progressive") in ("progressive", "unknown")
+        and all(
+            all(stream.get(key) == reference.get(key) for key in matching_keys + ("field_order",))
+            for stream in streams.values()
+        )
+    )
+    if not compatible:
+        print("[multicam] cameras don't share one codec/format, smart render falls back to segments")
+        _render_segments(
+            src_segments, video_paths, output_path, threads, render_workers, audio_mix, timer,
+            use_cache,
+        )
+        return
+
+    piece_dir = Path("temp/smart")
+    _safe_mkdir(piece_dir)
+
+    # match the camera stream so the copied and re-encoded parts splice cleanly
+    encode = " ".join(matching_encode(reference, "ultrafast"))
+
+    workers = max(1, render_workers or _default_render_workers(threads))
+    threads_per_worker = max(1, threads // workers)
+
+    jobs: list[tuple[int, str]] = []
+    pieces: list[Path] = []
+
+    def _encode(src_path: str, start: float, end: float, piece: Path):
+        jobs.append(
+            (
+                len(jobs),
+                f"ffmpeg -loglevel error -threads {threads_per_worker} -ss {start} "
+                f"-t {end - start} -i '{src_path}' {encode} -an -y '{piece}'",
+            )
+        )
+        pieces.append(piece)
+
+    copied = 0.0
+    for seg_idx, (vid_idx, src_start, duration) in enumerate(src_segments):
+        src_path = video_paths[vid_idx]
+        end = src_start + duration
+        index = indexes[vid_idx]
+
+        # Only whole GOPs are copied: from the first keyframe in the segment
+        # to the last one, where a copy cut off mid-GOP would leave trailing
+        # B-frames without their forward references. Keyframe times count
+        # from the file's start_time, like -ss does.
+        next_kf = index.keyframe_after(src_start)
+        if next_kf is None or next_kf >= end - 1e-3:
+            next_kf = end
+        copy_end = max(next_kf, index.keyframe_before(end))
+        if copy_end >= end - 1e-3:
+            copy_end = end
+
+        if next_kf - src_start > 1e-3:
+            _encode(src_path, src_start, next_kf, piece_dir / f"seg_{seg_idx:04d}_head.ts")
+
+        if copy_end - next_kf > 1e-3:
+            body = piece_dir / f"seg_{seg_idx:04d}_body.ts"
+            jobs.append(
+                (
+                    len(jobs),
+                    f"ffmpeg -loglevel error -ss {next_kf} -i '{src_path}' -t {copy_end - next_kf} "
+                    f"-map 0:v:0 -c:v copy -an -y '{body}'",
+                )
+            )
+            pieces.append(body)
+            copied += copy_end - next_kf
+
+        if end - copy_end > 1e-3:
+            _encode(src_path, copy_end, end, piece_dir / f"seg_{seg_idx:04d}_tail.ts")
+
+    total = sum(duration for _, _, duration in src_segments)
+    print(
+        f"[multicam] smart render: {copied:.0f}s of {total:.0f}s stream-copied, "
+        f"{len(jobs)} pieces with {workers} workers"
+    )
+    _run_ffmpeg_jobs(jobs, min(workers, len(jobs)), "piece")
+
+    _concat_and_mux(pieces, piece_dir, audio_mix, output_path, threads, timer)
@@ -1,13 +1,18 @@
 from glob import glob
 import os
 import random
-import subprocess
 import shutil
 import time
+from pathlib import Path
 
 from multicam_podcast_editor.analyze_video import analyze
 from multicam_podcast_editor.cut_video import cut_video
 from multicam_podcast_editor.args_parser import Args
+from multicam_podcast_editor.candidates import (
+    find_short_candidates,
+    load_transcript,
+    write_short_ranges,
+)
 from multicam_podcast_editor.audio_enhancement import podcast_audio
 from multicam_podcast_editor.captioning import caption_video, transcribe_file
 from multicam_podcast_editor.collage import (
@@ -15,10 +20,12 @@ from multicam_podcast_editor.collage import (
     create_music_video_with_videos,
     populate_file_with_images,
 )
+from multicam_podcast_editor.ingest import ingest
 from multicam_podcast_editor.jumpcuts import apply_jumpcuts
 from multicam_podcast_editor.multicam import multicam
-from multicam_podcast_editor.short_creator import shortcut
-from multicam_podcast_editor.transcribe import transcribe
+from multicam_podcast_editor.short_creator import load_short_ranges, shortcut, shortcuts
+from multicam_podcast_editor.transcribe import speaker_name, transcribe
+from multicam_podcast_editor.whisper_models import release_models
 
 
 def run(options: Args):
@@ -39,11 +46,6 @@ def run(options: Args):
     os.makedirs("temp", exist_ok=True)
     os.makedirs("output", exist_ok=True)
 
-    def _copy_to_temp(file: str):
-        new_file = "temp/" + os.path.basename(file)
-        shutil.copy(file, new_file)
-        return new_file
-
     if options.collage:
         assert len(options.inputs) == 2, "must provide both movie and image directory"
 
@@ -52,29 +54,18 @@ def run(options: Args):
 
         populate_file_with_images(moviefile, art_dir, options.output_name)
 
-    if options.multicam or options.short is not None:
+    shorts = list(options.shorts)
+    if options.shorts_file is not None:
+        shorts += load_short_ranges(options.shorts_file)
+
+    finding_shorts = options.find_shorts > 0
+    if options.multicam or options.short is not None or len(shorts) > 0 or finding_shorts:
         assert len(options.inputs) >= 2, "multicam must have 2 or more files"
-        for vid_index, dir in enumerate(options.inputs):
+        for dir in options.inputs:
             assert os.path.exists(dir), f"vid file {dir} not a valid file"
-            temp_file = _copy_to_temp(dir)
-            options.inputs[vid_index] = temp_file
 
     ##################################################
 
-    if options.short is not None:
-        max_time = options.till or options.short + 180
-        print(f"trimming until time {max_time + 10}s")
-
-        assert len(options.inputs) >= 2, (
-            "creating short from multicam must have 2 or more files"
-        )
-        for vid_index, dir in enumerate(options.inputs):
-            assert os.path.exists(dir), f"vid file {dir} not a valid file"
-            fp_vid = os.path.abspath(dir)
-            command = f"ffmpeg -i '{fp_vid}' -t {max_time + 10} -c copy temp/output.mp4"
-            subprocess.run(command, shell=True)
-            shutil.move("temp/output.mp4", fp_vid)
-
     print(options.inputs)
 
     average_volumes = []
@@ -83,29 +74,74 @@ def run(options: Args):
     if (
         options.multicam
         or options.short
+        or len(shorts) > 0
+        or finding_shorts
         or (options.transcribe and len(options.inputs) >= 2)
     ):
         max_time = -1
-        if options.short is not None:
-            max_time = options.till or options.short + 180
+        if (options.short is not None or len(shorts) > 0) and not finding_shorts:
+            # one analysis covers every short
+            ends = [till or start + 180 for start, till, _ in shorts]
+            if options.short is not None:
+                ends.append(options.till or options.short + 180)
+            max_time = max(ends)
+            print(f"only analyzing until time {max_time + 10}s")
+
+        # the inputs are read in place – the short range and the audio-sync
+        # offsets are applied virtually instead of rewriting the files
+        sources = ingest(
+            options.inputs, max_time, options.skip_bitrate_sync, options.threads
+        )
 
-        vids, average_volumes, paddings = analyze(
-            options.inputs,
+        vids, average_volumes, paddings, _ = analyze(
+            sources,
             max_time,
             options.align_videos,
-            options.skip_bitrate_sync,
             options.threads,
+            options.bucket_size,
+            options.use_cache,
         )
 
+    if finding_shorts:
+        transcript = None
+        if os.path.exists("output/transcript.txt"):
+            transcript = load_transcript("output/transcript.txt")
+
+        # the transcript names speakers the way transcribe() did, per input
+        speaker_paddings = {
+            speaker_name(vid, i): paddings[i + 1] for i, vid in enumerate(options.inputs[1:])
+        }
+        candidates = find_short_candidates(
+            average_volumes,
+            transcript,
+            options.short_length,
+            options.find_shorts,
+            options.bucket_size,
+            speaker_paddings,
+        )
+        write_short_ranges(
+            Path(f"output/{options.output_name}.shorts.txt"), candidates, options.output_name
+        )
+        shorts += [
+            (start, end, f"{options.output_name}-short{n}")
+            for n, (start, end, _) in enumerate(candidates, start=1)
+        ]
+
     if options.multicam:
         multicam(
             options.screenshare_input,
-            options.inputs,  # original file paths in temp folder
+            options.inputs,  # original file paths, read in place
             vids,
             average_volumes,
             paddings,
             options.threads,
             options.output_name,
+            options.bucket_size,
+            [s.audio_path for s in sources],
+            options.render_workers,
+            options.multicam_backend,
+            options.plan_only,
+            options.use_cache,
         )
 
     if options.short is not None:
@@ -116,6 +152,25 @@ def run(options: Args):
             options.till,
             options.threads,
             options.output_name,
+            options.bucket_size,
+            options.inputs,
+            paddings,
+            [s.audio_path for s in sources],
+            options.short_backend,
+        )
+
+    if len(shorts) > 0:
+        shortcuts(
+            vids,
+            average_volumes,
+            shorts,
+            options.threads,
+            options.bucket_size,
+            options.inputs,
+            paddings,
+            [s.audio_path for s in sources],
+            options.short_backend,
+            options.render_workers,
         )
 
     # Handle cutting (standalone or after short)
@@ -134,16 +189,19 @@ def run(options: Args):
                 options.cut,
                 options.threads,
                 options.output_name,
+                options.cut_mode,
             )
 
+    # what this run rendered, by name: the multicam / cut video, the single
+    # short and every short of a batch
+    rendered = [options.output_name, f"{options.output_name}-short"]
+    rendered += [name for _, _, name in shorts]
+
     print(f"apply jumpcuts? {options.jump_cuts}")
     if options.jump_cuts:
-        vids_to_jumpcut: list[str] = []
-        if os.path.exists(f"output/{options.output_name}.mp4"):
-            vids_to_jumpcut.append(f"output/{options.output_name}.mp4")
-
-        if os.path.exists(f"output/{options.output_name}-short.mp4"):
-            vids_to_jumpcut.append(f"output/{options.output_name}-short.mp4")
+        vids_to_jumpcut = [
+            f"output/{name}.mp4" for name in rendered if os.path.exists(f"output/{name}.mp4")
+        ]
 
         if len(vids_to_jumpcut) == 0 and len(options.inputs) == 1:
             vids_to_jumpcut.append(options.inputs[0])
@@ -152,13 +210,24 @@ def run(options: Args):
             vids_to_jumpcut,
             options.jump_cuts_margin,
             options.output_name,
+            options.threads,
+            options.jump_cuts_engine,
+            options.jump_cuts_threshold,
+            options.use_cache,
         )
 
     if options.transcribe:
         if len(options.inputs) == 1:
             transcribe_file(options.inputs[0])
         elif len(options.inputs) >= 2:
-            transcribe(options.inputs[1:], options.word_pause)
+            transcribe(
+                options.inputs[1:],
+                options.word_pause,
+                options.transcribe_workers,
+                options.threads,
+            )
+        # nothing after this point transcribes
+        release_models()
 
     if options.caption_video:
         if options.caption_csv is None or options.caption_csv == "":
@@ -210,19 +279,12 @@ def run(options: Args):
             )
 
     if options.audio_podcast_enhancements or options.audio_music_enhancements:
-        vids_to_enhance: list[str] = []
-
-        if os.path.exists(f"output/{options.output_name}.mp4"):
-            vids_to_enhance.append(f"output/{options.output_name}.mp4")
-
-        if os.path.exists(f"output/{options.output_name}-short.mp4"):
-            vids_to_enhance.append(f"output/{options.output_name}-short.mp4")
-
-        if os.path.exists(f"output/{options.output_name}-jumpcut.mp4"):
-            vids_to_enhance.append(f"output/{options.output_name}-jumpcut.mp4")
-
-        if os.path.exists(f"output/{options.output_name}-short-jumpcut.mp4"):
-            vids_to_enhance.append(f"output/{options.output_name}-short-jumpcut.mp4")
+        vids_to_enhance = [
+            f"output/{name}{suffix}.mp4"
+            for suffix in ("", "-jumpcut")
+            for name in rendered
+            if os.path.exists(f"output/{name}{suffix}.mp4")
+        ]
 
         if len(vids_to_enhance) == 0 and len(options.inputs) == 1:
             input = options.inputs[0]
@@ -236,4 +298,11 @@ def run(options: Args):
 
         enhance_type = "music" if options.audio_music_enhancements else "podcast"
 
-        podcast_audio(vids_to_enhance, enhance_type, options.threads)
+        podcast_audio(
+            vids_to_enhance,
+            enhance_type,
+            options.threads,
+            options.two_pass_loudnorm,
+            options.use_cache,
+            options.audio_engine,
+        )
@@ -0,0 +1,124 @@
+import subprocess
+import tempfile
+from typing import Iterator
+
+import numpy as np
+
+
+def _pcm_command(
+    path: str,
+    sample_rate: int,
+    channels: int,
+    start: float = 0.0,
+    duration: float | None = None,
+) -> list[str]:
+    cmd = ["ffmpeg", "-v", "error", "-nostdin"]
+    if start > 0:
+        # input-side seek so ffmpeg doesn't decode everything before `start`
+        cmd += ["-ss", f"{start:.6f}"]
+    cmd += ["-i", path]
+    if duration is not None:
+        cmd += ["-t", f"{duration:.6f}"]
+    cmd += [
+        "-vn",
+        "-map",
+        "0:a:0",
+        "-ac",
+        str(channels),
+        "-ar",
+        str(sample_rate),
+        "-f",
+        "s16le",
+        "-",
+    ]
+    return cmd
+
+
+def iter_pcm_blocks(
+    path: str,
+    sample_rate: int = 44100,
+    channels: int = 2,
+    block_frames: int = 1 << 18,
+    start: float = 0.0,
+    duration: float | None = None,
+) -> Iterator[np.ndarray]:
+    """Decode the first audio stream of `path` through an ffmpeg pipe.
+
+    Yields float32 arrays of shape ``(frames, channels)`` scaled to [-1, 1],
+    each at most `block_frames` long. A negative `start` yields that many
+    seconds of leading silence before the file's first sample, which is how
+    the callers express audio-sync padding.
+    """
+
+    if start < 0:
+        silence = int(round(-start * sample_rate))
+        if duration is not None:
+            silence = min(silence, int(round(duration * sample_rate)))
+            duration = max(0.0, duration + start)
+        while silence > 0:
+            n = min(silence, block_frames)
+            yield np.zeros((n, channels), dtype=np.float32)
+            silence -= n
+        start = 0.0
+
+        if duration is not None and duration <= 0:
+            return
+
+    block_bytes = block_frames * channels * 2
+    # stderr goes to a file: nothing reads it until stdout is done, and a
+    # full pipe would stall ffmpeg in the middle of a long decode
+    errors = tempfile.TemporaryFile()
+    process = subprocess.Popen(
+        _pcm_command(path, sample_rate, channels, start, duration),
+        stdout=subprocess.PIPE,
+        stderr=errors,
+    )
+    assert process.stdout is not None
+
+    try:
+        leftover = b""
+        while True:
+            chunk = process.stdout.read(block_bytes)
+            if not chunk:
+                break
+
+            chunk = leftover + chunk
+            usable = len(chunk) - len(chunk) % (channels * 2)
+            leftover = chunk[usable:]
+
+            samples = np.frombuffer(chunk[:usable], dtype=np.int16)
+            yield (samples.astype(np.float32) / 32768.0).reshape(-1, channels)
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+        errors.seek(0)
+        stderr = errors.read()
+        errors.close()
+
+    if returncode != 0:
+        raise RuntimeError(
+            f"ffmpeg failed decoding audio of {path}: {stderr.decode(errors='ignore')}"
+        )
+
+
+def read_pcm(
+    path: str,
+    sample_rate: int = 44100,
+    channels: int = 1,
+    start: float = 0.0,
+    duration: float | None = None,
+) -> np.ndarray:
+    """Decode a (section of a) track into a single float32 array.
+
+    Mono audio comes back 1-D, anything else as ``(frames, channels)``.
+    Only use this for bounded sections or low sample rates; long tracks should
+    go through :pyfunc:`iter_pcm_blocks`.
+    """
+
+    blocks = list(iter_pcm_blocks(path, sample_rate, channels, 1 << 20, start, duration))
+    if len(blocks) == 0:
+        audio = np.zeros((0, channels), dtype=np.float32)
+    else:
+        audio = np.concatenate(blocks)
+
+    return audio[:, 0] if channels == 1 else audio
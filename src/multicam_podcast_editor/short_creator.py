@@ -1,5 +1,9 @@
 import math
-from typing import List
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
 
 from multicam_podcast_editor.tprint import print_decorator
 from moviepy import (
@@ -11,6 +15,82 @@ from moviepy import (
 
 print = print_decorator(print)
 
+SHORT_BACKENDS = ("moviepy", "ffmpeg")
+SHORT_SIZE = (1080, 1920)
+
+# (timeline start, timeline end, top person, bottom person or None), with
+# person indices counted without the main video
+Layout = Tuple[float, float, int, int | None]
+
+# (start, end or None for a minute, output name)
+ShortRange = Tuple[float, float | None, str]
+
+
+def load_short_ranges(path: str) -> List[ShortRange]:
+    """Read one ``start end name`` short per line (comma or whitespace separated).
+
+    Blank lines and ``#`` comments are skipped, an empty or ``-`` end means
+    one minute.
+    """
+
+    shorts: List[ShortRange] = []
+    seen: dict[str, int] = {}
+    for line_no, line in enumerate(Path(path).read_text().splitlines(), start=1):
+        line = line.split("#", 1)[0].strip()
+        if line == "":
+            continue
+
+        parts = line.replace(",", " ").split()
+        assert len(parts) == 3, f"{path}:{line_no}: expected 'start end name', got {line!r}"
+        start, end, name = parts
+        # the name is the output file, two shorts can't share it
+        assert name not in seen, f"{path}:{line_no}: short name {name} already used on line {seen[name]}"
+        seen[name] = line_no
+        shorts.append((float(start), None if end == "-" else float(end), name))
+
+    return shorts
+
+
+def plan_short(
+    average_volumes: List[List[float]],
+    short_start: float,
+    till: float,
+    bucket: float = 5.0,
+) -> List[Layout]:
+    """Decide per bucket whether to show the loudest person alone or stacked
+    with the runner-up, merging consecutive buckets with the same layout.
+
+    The first and last bucket are clipped to `short_start` / `till`.
+    """
+
+    people_vols = average_volumes[1:]
+
+    start_interval = math.floor(short_start / bucket)
+    end_interval = math.ceil(till / bucket)
+
+    layouts: List[Layout] = []
+    for i in range(start_interval, end_interval):
+        sec = max(i * bucket, short_start)
+        n_sec = min((i + 1) * bucket, till)
+
+        vols = [xvol[i] if i < len(xvol) else -100 for xvol in people_vols]
+        sorted_vols = sorted(enumerate(vols), key=lambda x: x[1], reverse=True)
+
+        top = sorted_vols[0][0]
+        second = None
+        if len(sorted_vols) > 1:
+            print(f"comparing {sorted_vols[0][1]} to {sorted_vols[1][1]}")
+            if sorted_vols[0][1] * 0.08 < sorted_vols[1][1]:
+                second = sorted_vols[1][0]
+
+        print(f"Iteration {i} using {'one' if second is None else 'two'} video")
+        if layouts and layouts[-1][2:] == (top, second):
+            layouts[-1] = (layouts[-1][0], n_sec, top, second)
+        else:
+            layouts.append((sec, n_sec, top, second))
+
+    return layouts
+
 
 def shortcut(
     vids: List[VideoClip],
@@ -19,67 +99,264 @@ def shortcut(
     till: float | None,
     threads: int = 10,
     output_name: str = "final",
+    bucket: float = 5.0,
+    video_paths: List[str] | None = None,
+    paddings: List[float] | None = None,
+    audio_paths: List[str] | None = None,
+    backend: str = "moviepy",
 ):
+    """Render a vertical short of the people cameras between `short_start` and `till`.
+
+    ``moviepy`` composites every bucket in Python, ``ffmpeg`` compiles the same
+    layout into one filter graph and needs the on-disk `video_paths` and
+    audio-sync `paddings` (and `audio_paths` when the audio was resampled).
+    """
+
+    assert backend in SHORT_BACKENDS, f"unknown short backend {backend}"
     till = till or (short_start + 60)
+    layouts = plan_short(average_volumes, short_start, till, bucket)
+    output_path = Path("output") / f"{output_name}.mp4"
 
-    people_vols = average_volumes[1:]
-    people = vids[1:]
+    if backend == "ffmpeg":
+        assert video_paths is not None and paddings is not None, "ffmpeg shorts need the file paths"
+        _render_short_ffmpeg(
+            layouts,
+            video_paths,
+            paddings,
+            audio_paths or video_paths,
+            short_start,
+            till,
+            output_path,
+            threads,
+        )
+    else:
+        _render_short_moviepy(vids, layouts, short_start, till, output_path, threads)
 
-    final_clips: List[VideoClip] = []
+    print(f"Short saved to {output_path}")
+
+
+def shortcuts(
+    vids: List[VideoClip],
+    average_volumes: List[List[float]],
+    shorts: List[ShortRange],
+    threads: int = 10,
+    bucket: float = 5.0,
+    video_paths: List[str] | None = None,
+    paddings: List[float] | None = None,
+    audio_paths: List[str] | None = None,
+    backend: str = "moviepy",
+    workers: int = 0,
+):
+    """Render several shorts off the same analysis.
 
-    start_interval = math.floor(short_start / 5)
-    end_interval = math.ceil(till / 5)
+    With the ``ffmpeg`` backend every short is its own ffmpeg process reading
+    the inputs in place, so they render concurrently with `threads` split
+    between `workers` (``0`` picks one worker per two threads). MoviePy clips
+    share their file readers, so ``moviepy`` shorts render one after another.
+    """
 
-    padd_start = short_start - start_interval * 5
-    padd_end = end_interval * 5 - till
+    names = [name for _, _, name in shorts]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    assert not duplicates, f"several shorts named {', '.join(duplicates)} would overwrite each other"
 
-    # Going through every 5 seconds of the audio clips
-    for i in range(start_interval, end_interval):
-        sec = i * 5
-        n_sec = sec + 5
+    if backend != "ffmpeg" or len(shorts) < 2:
+        for short_start, till, name in shorts:
+            shortcut(
+                vids, average_volumes, short_start, till, threads, name, bucket,
+                video_paths, paddings, audio_paths, backend,
+            )
+        return
 
-        vols = [xvol[i] for xvol in people_vols]
-        sorted_vols = sorted(enumerate(vols), key=lambda x: x[1], reverse=True)
+    workers = max(1, min(workers or threads // 2, len(shorts)))
+    threads_per_worker = max(1, threads // workers)
+    print(f"rendering {len(shorts)} shorts with {workers} workers x {threads_per_worker} threads")
+
+    def _render(short: ShortRange) -> str | None:
+        short_start, till, name = short
+        try:
+            shortcut(
+                vids, average_volumes, short_start, till, threads_per_worker, name, bucket,
+                video_paths, paddings, audio_paths, backend,
+            )
+        except Exception as e:
+            return str(e)
+        return None
 
-        top_indices = [index for index, _ in sorted_vols[:2]]
-        vid1: VideoClip = people[top_indices[0]].subclipped(sec, n_sec)  # pyright: ignore
-        vid2 = None
+    failures: list[str] = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for (_, _, name), error in zip(shorts, pool.map(_render, shorts)):
+            if error is not None:
+                print(f"❌ short {name} failed: {error}")
+                failures.append(name)
 
-        print(f"comparing {sorted_vols[0][1]} to {sorted_vols[1][1]}")
-        if len(top_indices) > 1 and sorted_vols[0][1] * 0.08 < sorted_vols[1][1]:
-            vid2 = people[top_indices[1]].subclipped(sec, n_sec)
+    if failures:
+        raise RuntimeError(f"failed to render shorts {', '.join(failures)}")
 
-        if vid2 is None:
+
+def _render_short_moviepy(
+    vids: List[VideoClip],
+    layouts: List[Layout],
+    short_start: float,
+    till: float,
+    output_path: Path,
+    threads: int,
+):
+    people = vids[1:]
+
+    final_clips: List[VideoClip] = []
+    for sec, n_sec, top, bottom in layouts:
+        vid1: VideoClip = people[top].subclipped(sec, n_sec)  # pyright: ignore
+
+        if bottom is None:
             vid1 = vid1.resized(height=1920)  # pyright: ignore
             vid1 = vid1.with_position(("center", "top"))  # pyright: ignore
-            new_clip = CompositeVideoClip([vid1], size=(1080, 1920))
+            new_clip = CompositeVideoClip([vid1], size=SHORT_SIZE)
         else:
+            vid2 = people[bottom].subclipped(sec, n_sec)
             vid1 = vid1.resized(height=960)  # pyright: ignore
             vid1 = vid1.with_position(("center", "top"))  # pyright: ignore
             vid2 = vid2.resized(height=960)  # pyright: ignore
             vid2 = vid2.with_position(("center", "bottom"))  # pyright: ignore
-            new_clip = CompositeVideoClip([vid1, vid2], size=(1080, 1920))
+            new_clip = CompositeVideoClip([vid1, vid2], size=SHORT_SIZE)
 
-        print(f"Iteration {i} using {'one' if vid2 is None else 'two'} video")
         final_clips.append(new_clip)
 
     final = concatenate_videoclips(final_clips)
-    final_audio = CompositeAudioClip(
-        [v.subclipped(start_interval * 5, end_interval * 5).audio for v in people]
-    )
-
-    final2 = final.with_audio(final_audio)
-    print(f"padding the video by {padd_start} and {-padd_end}")
-    final2: VideoClip = final2.subclipped(
-        padd_start, -padd_end if padd_end > 0 else None
-    )
+    final_audio = CompositeAudioClip([v.subclipped(short_start, till).audio for v in people])
 
-    output_path = f"output/{output_name}.mp4"
+    final2: VideoClip = final.with_audio(final_audio)
     final2.write_videofile(
-        output_path,
+        str(output_path),
         threads=threads,
         codec="libx264",
         preset="slow",
         bitrate="3000k",
     )
-    print(f"Short saved to {output_path}")
+
+
+def _fit(height: int) -> str:
+    """Scale to `height` and center-crop (or pad) to the short's width.
+
+    Same framing as resizing to `height` and centering on the canvas, but the
+    source is cropped to the visible part first so nothing wider than the
+    short gets scaled.
+    """
+
+    width = SHORT_SIZE[0]
+    return (
+        f"crop=w='min(iw,ih*{width}/{height})':h=ih,scale=-2:{height},"
+        f"crop=w='min(iw,{width})':h={height},pad={width}:{height}:(ow-iw)/2:0,setsar=1"
+    )
+
+
+def short_graph(
+    layouts: List[Layout],
+    video_paths: List[str],
+    paddings: List[float],
+    audio_paths: List[str],
+    short_start: float,
+    till: float,
+    fps: int = 30,
+) -> Tuple[List[str], str]:
+    """Compile the layouts into ffmpeg inputs and a graph ending in ``[vout]``/``[aout]``.
+
+    Every person is opened once, seeked to `short_start` on the main timeline
+    (black in front where they hadn't started recording yet) and split
+    between the segments that show them.
+    """
+
+    people_paths = video_paths[1:]
+    people_paddings = paddings[1:]
+
+    uses: dict[int, int] = {}
+    for _, _, top, bottom in layouts:
+        for person in (top, bottom):
+            if person is not None:
+                uses[person] = uses.get(person, 0) + 1
+
+    inputs: list[str] = []
+    filters: list[str] = []
+    streams: dict[int, list[str]] = {}
+    for person, count in sorted(uses.items()):
+        pad = people_paddings[person]
+        seek = max(0.0, short_start - pad)
+        lead = max(0.0, pad - short_start)
+        input_idx = len(inputs)
+        inputs.append(f"-ss {seek:.3f} -t {till - short_start:.3f} -i '{people_paths[person]}'")
+
+        # a recording that ends early holds its last frame
+        labels = [f"p{person}_{n}" for n in range(count)]
+        chain = (
+            f"[{input_idx}:v]tpad=start_duration={lead:.3f}:"
+            f"stop_mode=clone:stop_duration={till - short_start:.3f},"
+        )
+        chain += f"fps={fps},split={count}" + "".join(f"[{label}]" for label in labels)
+        filters.append(chain)
+        streams[person] = labels
+
+    concat_labels: list[str] = []
+    for seg_idx, (sec, n_sec, top, bottom) in enumerate(layouts):
+        trim = f"trim=start={sec - short_start:.3f}:end={n_sec - short_start:.3f},setpts=PTS-STARTPTS"
+        if bottom is None:
+            filters.append(f"[{streams[top].pop()}]{trim},{_fit(SHORT_SIZE[1])}[s{seg_idx}]")
+        else:
+            half = SHORT_SIZE[1] // 2
+            filters.append(f"[{streams[top].pop()}]{trim},{_fit(half)}[s{seg_idx}t]")
+            filters.append(f"[{streams[bottom].pop()}]{trim},{_fit(half)}[s{seg_idx}b]")
+            filters.append(f"[s{seg_idx}t][s{seg_idx}b]vstack[s{seg_idx}]")
+        concat_labels.append(f"[s{seg_idx}]")
+
+    filters.append(
+        "".join(concat_labels) + f"concat=n={len(concat_labels)}:v=1:a=0,format=yuv420p[vout]"
+    )
+
+    # every person's audio, summed like moviepy's CompositeAudioClip
+    mix_labels: list[str] = []
+    for person, path in enumerate(audio_paths[1:]):
+        pad = people_paddings[person]
+        seek = max(0.0, short_start - pad)
+        lead_ms = int(max(0.0, pad - short_start) * 1000)
+        input_idx = len(inputs)
+        inputs.append(f"-ss {seek:.3f} -t {till - short_start:.3f} -i '{path}'")
+        filters.append(f"[{input_idx}:a]adelay={lead_ms}|{lead_ms}[a{person}]")
+        mix_labels.append(f"[a{person}]")
+
+    filters.append(
+        "".join(mix_labels)
+        + f"amix=inputs={len(mix_labels)}:duration=longest:normalize=0,"
+        + f"atrim=end={till - short_start:.3f}[aout]"
+    )
+
+    return inputs, ";\n".join(filters)
+
+
+def _render_short_ffmpeg(
+    layouts: List[Layout],
+    video_paths: List[str],
+    paddings: List[float],
+    audio_paths: List[str],
+    short_start: float,
+    till: float,
+    output_path: Path,
+    threads: int,
+):
+    inputs, graph = short_graph(layouts, video_paths, paddings, audio_paths, short_start, till)
+
+    # unique per render, shorts of one batch run at the same time
+    Path("temp").mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        "w", dir="temp", prefix=f"{output_path.stem}.", suffix=".short_graph.txt", delete=False
+    ) as f:
+        f.write(graph)
+    script = Path(f.name)
+
+    cmd = (
+        f"ffmpeg -loglevel error -threads {threads} {' '.join(inputs)} "
+        f"-filter_complex_script '{script}' -map '[vout]' -map '[aout]' "
+        f"-c:v libx264 -preset slow -b:v 3000k -c:a aac -b:a 192k -y '{output_path}'"
+    )
+    print(f"rendering short with ffmpeg: {cmd}")
+    try:
+        subprocess.run(cmd, shell=True, check=True)
+    finally:
+        script.unlink(missing_ok=True)
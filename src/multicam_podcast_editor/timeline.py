@@ -0,0 +1,216 @@
+import json
+import math
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+# (video index, start, duration) – start on the multicam timeline or in the
+# source file depending on the stage
+Segment = Tuple[int, float, float]
+
+
+def _in_intervals(times: np.ndarray, intervals: List[Tuple[float, float]]) -> np.ndarray:
+    """Which `times` fall strictly inside any of the (start, end) intervals."""
+
+    if len(intervals) == 0:
+        return np.zeros(len(times), dtype=bool)
+
+    # union of open intervals; touching ones stay apart since their shared
+    # end point is in neither
+    merged: list[list[float]] = []
+    for start, end in sorted(intervals):
+        if merged and start < merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+
+    starts = np.array([m[0] for m in merged])
+    ends = np.array([m[1] for m in merged])
+    idx = np.searchsorted(starts, times, side="left") - 1
+    valid = idx >= 0
+    inside = np.zeros(len(times), dtype=bool)
+    inside[valid] = times[valid] < ends[idx[valid]]
+    return inside
+
+
+def loudest_people(people_vols: List[List[float]], bucket_total: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Loudest person per bucket and whether they clearly dominate it.
+
+    A person dominates when the runner-up is below 5% of their peak. Buckets
+    past the end of a person's volumes count as -100.
+    """
+
+    people = len(people_vols)
+    vols = np.full((people, bucket_total), -100.0)
+    for p, xvol in enumerate(people_vols):
+        n = min(len(xvol), bucket_total)
+        vols[p, :n] = xvol[:n]
+
+    # argmax keeps the lowest index on ties, like the stable sort it replaces
+    winner = np.argmax(vols, axis=0)
+    if people < 2:
+        return winner, np.ones(bucket_total, dtype=bool)
+
+    top_two = -np.partition(-vols, 1, axis=0)[:2]
+    dominant = top_two[0] * 0.05 > top_two[1]
+    return winner, dominant
+
+
+def plan_multicam(
+    average_volumes: List[List[float]],
+    main_duration: float,
+    person_durations: List[float],
+    reduced_focus_times: List[Tuple[float, float]],
+    bucket: float = 5.0,
+) -> List[Segment]:
+    """Decide which camera to show per bucket and merge it into segments.
+
+    Returns merged ``(video index, timeline start, duration)`` segments where
+    index 0 is the main camera.
+    """
+
+    bucket_total = math.ceil(main_duration / bucket)
+    times = np.arange(bucket_total) * bucket
+
+    # When a person's video ends before the main video, avoid showing a frozen
+    # last frame.
+    mandatory_unfocus = [
+        (duration - 5, duration + 5) for duration in person_durations if duration < main_duration
+    ]
+
+    forced_main = _in_intervals(times, mandatory_unfocus) | (times > main_duration - 11)
+    screenshare = _in_intervals(times, reduced_focus_times)
+    winner, dominant = loudest_people(average_volumes[1:], bucket_total)
+
+    # The focus rules were written for 5 second buckets ("no more than two in a
+    # row"), so keep them as ~10 seconds whatever the bucket size.
+    max_streak = max(1, round(10 / bucket))
+
+    # First 5 seconds are always the main.
+    first_bucket = max(1, math.ceil(5 / bucket - 1e-9))
+
+    # The hysteresis is inherently sequential, so it runs as a small state
+    # machine over the precomputed arrays.
+    choice = np.zeros(bucket_total, dtype=np.int64)
+    forced_main_l = forced_main.tolist()
+    screenshare_l = screenshare.tolist()
+    dominant_l = dominant.tolist()
+    winner_l = winner.tolist()
+
+    unfocused_count = 0
+    focused_count = 0
+    for i in range(first_bucket, bucket_total):
+        # Person stopped recording, or closing seconds of the main video.
+        if forced_main_l[i]:
+            continue
+
+        # In a screenshare window & haven't been unfocused for >10 seconds.
+        if unfocused_count < max_streak and screenshare_l[i]:
+            unfocused_count, focused_count = unfocused_count + 1, 0
+            continue
+
+        if focused_count < max_streak and dominant_l[i]:
+            # plus 1 because the people exclude main
+            choice[i] = winner_l[i] + 1
+            unfocused_count, focused_count = 0, focused_count + 1
+            continue
+
+        unfocused_count, focused_count = unfocused_count + 1, 0
+
+    return merge_choices(choice, bucket)
+
+
+def merge_choices(choice: np.ndarray, bucket: float) -> List[Segment]:
+    """Run-length encode per-bucket camera choices into segments."""
+
+    if len(choice) == 0:
+        return []
+
+    cuts = np.flatnonzero(np.diff(choice)) + 1
+    starts = np.concatenate([[0], cuts])
+    ends = np.concatenate([cuts, [len(choice)]])
+
+    return [
+        (int(choice[s]), float(s * bucket), float((e - s) * bucket))
+        for s, e in zip(starts.tolist(), ends.tolist())
+    ]
+
+
+def source_segments(final_segments: List[Segment], paddings: List[float]) -> List[Segment]:
+    """Map (video index, timeline start, duration) to positions in the files."""
+
+    mapped: List[Segment] = []
+    for vid_idx, local_start, duration in final_segments:
+        # Map local timeline to original file timeline.
+        src_start = local_start - paddings[vid_idx]
+
+        # If the calculated start would be before 0, we fallback to main
+        # camera for safety.
+        if src_start < 0:
+            vid_idx = 0
+            src_start = local_start
+
+        mapped.append((vid_idx, src_start, duration))
+
+    return mapped
+
+
+def write_plan_json(
+    path: Path,
+    final_segments: List[Segment],
+    video_paths: List[str],
+    paddings: List[float],
+    bucket: float,
+):
+    mapped = source_segments(final_segments, paddings)
+    plan = {
+        "bucket": bucket,
+        "sources": [{"path": p, "padding": pad} for p, pad in zip(video_paths, paddings)],
+        "segments": [
+            {
+                "source": vid_idx,
+                "timeline_start": round(local_start, 3),
+                "source_start": round(src_start, 3),
+                "duration": round(duration, 3),
+            }
+            for (_, local_start, duration), (vid_idx, src_start, _) in zip(final_segments, mapped)
+        ],
+    }
+    path.write_text(json.dumps(plan, indent=2))
+
+
+def _timecode(seconds: float, fps: int) -> str:
+    frames = int(round(seconds * fps))
+    hours, frames = divmod(frames, 3600 * fps)
+    minutes, frames = divmod(frames, 60 * fps)
+    secs, frames = divmod(frames, fps)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}:{frames:02d}"
+
+
+def write_edl(
+    path: Path,
+    final_segments: List[Segment],
+    video_paths: List[str],
+    paddings: List[float],
+    fps: int = 30,
+    title: str = "multicam",
+):
+    """Write the timeline as a CMX3600 edit decision list (video track only)."""
+
+    lines = [f"TITLE: {title}", "FCM: NON-DROP FRAME", ""]
+    mapped = source_segments(final_segments, paddings)
+    for event, ((_, local_start, duration), (vid_idx, src_start, _)) in enumerate(
+        zip(final_segments, mapped), start=1
+    ):
+        clip = Path(video_paths[vid_idx]).name
+        reel = f"CAM{vid_idx}"[:8]
+        lines.append(
+            f"{event:03d}  {reel:<8} V     C        "
+            f"{_timecode(src_start, fps)} {_timecode(src_start + duration, fps)} "
+            f"{_timecode(local_start, fps)} {_timecode(local_start + duration, fps)}"
+        )
+        lines.append(f"* FROM CLIP NAME: {clip}")
+        lines.append("")
+
+    path.write_text("\n".join(lines))
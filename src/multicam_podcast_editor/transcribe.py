@@ -1,24 +1,33 @@
 import os
 import re
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-import torch
-from faster_whisper import WhisperModel
 from moviepy import (
     VideoFileClip,
 )
 
+from multicam_podcast_editor.whisper_models import get_model
+
+
+def speaker_name(vid: str, index: int) -> str:
+    """Name a speaker's lines are attributed to: the one in a recorder's
+    ``_-_1-name-webcam`` file name, else Person<index>."""
+
+    match = re.search(r"_-_\d-(.*)-webcam", vid)
+    if match:
+        return match.group(1)
+    return f"Person{index}"
 
-def transcribe(individuals, word_pause=1.0):
-    print("list of vids found to transcribe " + str(individuals))
 
-    def _extract_name(file_name):
-        pattern = r"_-_\d-(.*)-webcam"
-        match = re.search(pattern, file_name)
-        if match:
-            name = match.group(1)
-            print(f"found name {name}")
-            return name
-        return None
+def transcribe(individuals, word_pause=1.0, workers=1, threads=10):
+    """Chat-style transcript of every speaker's track into output/transcript.txt.
+
+    With `workers` > 1 that many speakers are transcribed at the same time,
+    on a model with as many ctranslate2 replicas splitting `threads` cores.
+    """
+
+    print("list of vids found to transcribe " + str(individuals))
 
     def _format_seconds(seconds):
         hours = int(seconds // 3600)
@@ -31,37 +40,37 @@ def transcribe(individuals, word_pause=1.0):
     def _format_chat(entry):
         return f"[{_format_seconds(entry[1])}] {entry[0]}: {entry[3]}\n"
 
-    transcription = []
-
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    print(f"using {device}")
-
-    model = WhisperModel("large-v3", device)
-    for i, vid in enumerate(individuals):
+    def _transcribe_speaker(model, vid, i):
         print(f"transcribing video {vid}")
-        name = _extract_name(vid) or f"Person{i}"
+        name = speaker_name(vid, i)
+        print(f"found name {name}")
 
+        # one file per speaker so they can be transcribed at the same time
+        wav = f"temp/transcribe_{i}.wav"
         video = VideoFileClip(vid)
-        video.audio.write_audiofile("temp/temp.wav")  # pyright: ignore
-        segments, _ = model.transcribe(
-            "temp/temp.wav",
+        video.audio.write_audiofile(wav, logger="bar" if workers == 1 else None)  # pyright: ignore
+
+        start = time.perf_counter()
+        segments, info = model.transcribe(
+            wav,
             suppress_tokens=[],
             vad_filter=True,
             vad_parameters={"speech_pad_ms": 1000},
             initial_prompt="transcribe the following and include a *laughing* when there is laughter'",
             condition_on_previous_text=True,
-            log_progress=True,
+            log_progress=workers == 1,
             beam_size=5,
             word_timestamps=True,
             hotwords="laughing laugh laughter",
         )
 
+        speeches = []
         current_speech = [name, 0, 0, ""]
         for segment in segments:
             for word in segment.words or []:
                 if word.end - current_speech[2] > word_pause:
                     if current_speech[3] != "":
-                        transcription.append(current_speech)
+                        speeches.append(current_speech)
                     # we use end as start since start isn't accurate
                     current_speech = [name, word.end - 0.5, word.end, word.word]
                 else:
@@ -69,9 +78,31 @@ def transcribe(individuals, word_pause=1.0):
                     current_speech[2] = word.end
 
         if current_speech[3] != "":
-            transcription.append(current_speech)
-        print(f"finished transcribing {name}")
-        os.remove("temp/temp.wav")
+            speeches.append(current_speech)
+
+        # the segments are decoded lazily, so this includes the transcription
+        elapsed = time.perf_counter() - start
+        rtf = elapsed / max(info.duration, 1e-6)
+        print(f"finished transcribing {name} in {elapsed:.1f}s (RTF {rtf:.2f}, {1 / max(rtf, 1e-6):.1f}x realtime)")
+        os.remove(wav)
+        return speeches
+
+    workers = max(1, min(workers, len(individuals)))
+    if workers == 1:
+        model = get_model("large-v3")
+    else:
+        # one ctranslate2 replica per speaker, each on its share of the cores
+        model = get_model(
+            "large-v3", cpu_threads=max(1, threads // workers), num_workers=workers
+        )
+
+    transcription = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for speeches in pool.map(
+            lambda job: _transcribe_speaker(model, *job),
+            [(vid, i) for i, vid in enumerate(individuals)],
+        ):
+            transcription.extend(speeches)
 
     transcription.sort(key=lambda x: x[1])
 
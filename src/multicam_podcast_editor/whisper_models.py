@@ -0,0 +1,85 @@
+import gc
+import os
+import resource
+import time
+from threading import Lock
+
+import torch
+from faster_whisper import WhisperModel
+
+from multicam_podcast_editor.tprint import print_decorator
+
+print = print_decorator(print)
+
+_models: dict[tuple, WhisperModel] = {}
+_lock = Lock()
+
+
+def default_device() -> str:
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def default_compute_type(device: str) -> str:
+    # large-v3 ships as float16, which CPUs run as float32 anyway
+    return "float16" if device == "cuda" else "float32"
+
+
+def _rss_mb() -> float:
+    """Resident memory of this process (peak where the current one is unknown)."""
+
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def get_model(
+    size: str = "large-v3",
+    device: str | None = None,
+    compute_type: str | None = None,
+    **kwargs,
+) -> WhisperModel:
+    """The Whisper model for (size, device, compute_type), loaded on first use.
+
+    Every later call with the same key gets the same instance until
+    `release_models`. Load options in `kwargs` (cpu_threads, num_workers,
+    ...) are part of the key too, since they're fixed once loaded.
+    """
+
+    device = device or default_device()
+    compute_type = compute_type or default_compute_type(device)
+    key = (size, device, compute_type, *sorted(kwargs.items()))
+
+    with _lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+
+        rss = _rss_mb()
+        start = time.perf_counter()
+        model = WhisperModel(size, device, compute_type=compute_type, **kwargs)
+        options = ", ".join([device, compute_type] + [f"{k}={v}" for k, v in sorted(kwargs.items())])
+        print(
+            f"loaded whisper {size} ({options}) in {time.perf_counter() - start:.1f}s, "
+            f"resident memory {rss:.0f} -> {_rss_mb():.0f} MB"
+        )
+        _models[key] = model
+        return model
+
+
+def release_models():
+    """Drop every loaded model so its memory can be returned."""
+
+    with _lock:
+        if len(_models) == 0:
+            return
+        keys = list(_models)
+        _models.clear()
+
+    rss = _rss_mb()
+    gc.collect()
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+    print(f"released whisper models {keys}, resident memory {rss:.0f} -> {_rss_mb():.0f} MB")
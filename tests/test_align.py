@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from scipy import signal
+
+from multicam_podcast_editor import align
+
+
+def _noise(seconds: float, rate: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal(int(seconds * rate)).astype(np.float32)
+
+
+@pytest.mark.parametrize("lag", [0, 1234, -777])
+def test_gcc_phat_finds_a_shift(lag):
+    reference = _noise(5, 8000, 1)
+    # other[n] ~ reference[n + lag], plus a different microphone's noise
+    other = np.roll(reference, -lag) + 0.5 * _noise(5, 8000, 2)
+    assert align._best_lag(reference, other, 2000) == lag
+
+
+def _recording(seconds: float, seed: int):
+    """Band-limited noise that can be read at both of align's rates."""
+
+    fine = signal.sosfilt(
+        signal.butter(8, 3500, fs=align.FINE_RATE, output="sos"), _noise(seconds, align.FINE_RATE, seed)
+    )
+    versions = {
+        align.FINE_RATE: fine,
+        align.COARSE_RATE: signal.resample_poly(fine, align.COARSE_RATE // 100, align.FINE_RATE // 100),
+    }
+
+    def read(start: float, duration: float, rate: int) -> np.ndarray:
+        first = int(round(start * rate))
+        return versions[rate][first : first + int(duration * rate)].astype(np.float32)
+
+    return read
+
+
+@pytest.mark.parametrize("offset", [2.345678, -1.234567])
+def test_find_offset(monkeypatch, offset):
+    recording = _recording(60, 3)
+
+    def read_pcm(path, sample_rate, channels, start=0.0, duration=None):
+        # "other" started recording `offset` seconds late (early if negative)
+        shift = 10.0 + (offset if path == "other" else 0.0)
+        return recording(start + shift, duration, sample_rate)
+
+    monkeypatch.setattr(align, "read_pcm", read_pcm)
+    monkeypatch.setattr(align, "FINE_SECONDS", 5.0)
+    found = align.find_offset("target", "other", search_seconds=20.0, max_offset=5.0)
+    assert found == pytest.approx(offset, abs=2 / align.FINE_RATE)
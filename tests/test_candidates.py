@@ -0,0 +1,38 @@
+from multicam_podcast_editor.candidates import find_short_candidates
+
+
+def _volumes(buckets: int, lively: range) -> list[list[float]]:
+    """Main plus two people taking turns in `lively` and one monologue elsewhere."""
+
+    a = [0.8 if i not in lively or i % 2 == 0 else 0.0 for i in range(buckets)]
+    b = [0.0 if i not in lively or i % 2 == 0 else 0.8 for i in range(buckets)]
+    return [[0.0] * buckets, a, b]
+
+
+def test_finds_the_back_and_forth():
+    candidates = find_short_candidates(_volumes(120, range(60, 72)), length=60.0, count=1)
+    assert len(candidates) == 1
+    start, end, _ = candidates[0]
+    assert end - start == 60.0
+    assert 60 * 5 - 30 <= start <= 60 * 5 + 30
+
+
+def test_candidates_do_not_overlap_and_are_best_first():
+    candidates = find_short_candidates(_volumes(240, range(100, 140)), length=30.0, count=5)
+    assert len(candidates) == 5
+    scores = [score for _, _, score in candidates]
+    assert scores == sorted(scores, reverse=True)
+    ranges = sorted((start, end) for start, end, _ in candidates)
+    assert all(end <= next_start for (_, end), (next_start, _) in zip(ranges, ranges[1:]))
+
+
+def test_transcript_laughter_and_paddings():
+    volumes = [[0.0] * 60, [0.5] * 60, [0.5] * 60]
+    # bob's recording started 100 s late, so his laughs at 10-40 s in his
+    # own file are at 110-140 s on the timeline
+    transcript = [("bob", float(t), "haha that's great") for t in range(10, 40, 2)]
+    candidates = find_short_candidates(
+        volumes, transcript, length=30.0, count=1, speaker_paddings={"bob": 100.0}
+    )
+    start, end, _ = candidates[0]
+    assert start <= 110 and end >= 135
@@ -0,0 +1,13 @@
+from multicam_podcast_editor.cut_video import _play_segments
+
+
+def test_keeps_everything_without_cuts():
+    assert _play_segments([], 30.0) == [(0, 30.0)]
+
+
+def test_keeps_the_parts_between_unsorted_cuts():
+    assert _play_segments([(20.0, 25.0), (5.0, 10.0)], 30.0) == [(0, 5.0), (10.0, 20.0), (25.0, 30.0)]
+
+
+def test_cuts_at_the_start_and_end():
+    assert _play_segments([(0.0, 3.0), (27.0, 30.0)], 30.0) == [(3.0, 27.0)]
@@ -0,0 +1,37 @@
+import numpy as np
+
+from multicam_podcast_editor.envelope import LEVELS, EnvelopePyramid, bucket_count
+
+
+def test_range_max_many_matches_brute_force():
+    rng = np.random.default_rng(0)
+    base = rng.random(12345).astype(np.float32)
+    envelope = EnvelopePyramid(base, base**2, len(base) * LEVELS[0])
+
+    # whole cells, sub-cell ranges, ranges past the end and empty ones
+    starts = rng.uniform(-1, envelope.duration, 2000)
+    starts[:100] = np.round(starts[:100])
+    ends = starts + rng.choice([0.0, 0.005, 0.05, 0.37, 3.0, 40.0, 200.0], size=len(starts))
+
+    expected = []
+    for start, end in zip(starts, ends):
+        lo = int(np.clip(np.floor(start / LEVELS[0] + 1e-6), 0, len(base)))
+        hi = int(np.clip(np.ceil(end / LEVELS[0] - 1e-6), 0, len(base)))
+        expected.append(base[lo:hi].max(initial=0.0))
+
+    np.testing.assert_array_equal(envelope.range_max_many(starts, ends), expected)
+    assert envelope.range_max(0.0, envelope.duration) == base.max()
+
+
+def test_bucket_count_matches_the_old_range():
+    for duration in np.arange(0, 60, 0.01).tolist() + [3599.99, 3600.0, 3604.999, 3605.0]:
+        assert bucket_count(duration, 5.0) == len(range(0, int(duration - 5) + 1, 5)), duration
+
+
+def test_bucket_count_keeps_sub_second_tails():
+    # windows starting at 0.0, 0.25, ..., 9.5 fit in 9.8 s
+    assert bucket_count(9.8, 0.25) == 39
+    assert bucket_count(0.3, 0.25) == 1
+    assert bucket_count(0.1, 0.25) == 1
+    assert bucket_count(1.0, 0.1) == 10
+    assert bucket_count(0.0, 5.0) == 0
@@ -0,0 +1,20 @@
+from multicam_podcast_editor.jumpcuts import keep_intervals
+
+
+def test_keeps_everything_without_silences():
+    assert keep_intervals([], 30.0, 0.5) == [(0.0, 30.0)]
+
+
+def test_cuts_silences_minus_padding():
+    # the second silence is exactly both paddings long, so nothing is cut there
+    silences = [(5.0, 8.0), (20.0, 21.0)]
+    assert keep_intervals(silences, 30.0, 0.5) == [(0.0, 5.5), (7.5, 30.0)]
+
+
+def test_skips_silences_shorter_than_both_paddings():
+    assert keep_intervals([(5.0, 5.8), (10.0, 12.0)], 30.0, 0.5) == [(0.0, 10.5), (11.5, 30.0)]
+
+
+def test_merges_overlapping_silences_and_pads_the_ends_too():
+    silences = [(12.0, 20.0), (0.0, 4.0), (10.0, 15.0), (27.0, 30.0)]
+    assert keep_intervals(silences, 30.0, 1.0) == [(0.0, 1.0), (3.0, 11.0), (19.0, 28.0), (29.0, 30.0)]
@@ -0,0 +1,85 @@
+import math
+
+import numpy as np
+import pytest
+
+from multicam_podcast_editor.timeline import merge_choices, plan_multicam
+
+
+def _loop_plan(average_volumes, main_duration, person_durations, reduced_focus_times):
+    """The per-bucket loop multicam() used before plan_multicam, 5 s buckets."""
+
+    bucket_total = math.ceil(main_duration / 5)
+    people_vols = average_volumes[1:]
+    mandatory_unfocus = [(d - 5, d + 5) for d in person_durations if d < main_duration]
+
+    final_segments = [(0, 0, 5)]
+    unfocused_count = 0
+    focused_count = 0
+    for i in range(1, bucket_total):
+        sec = i * 5
+        if any(start < sec < end for start, end in mandatory_unfocus):
+            final_segments.append((0, sec, 5))
+            continue
+        if sec > main_duration - 11:
+            final_segments.append((0, sec, 5))
+            continue
+        if unfocused_count < 2 and any(start < sec < end for start, end in reduced_focus_times):
+            final_segments.append((0, sec, 5))
+            unfocused_count, focused_count = unfocused_count + 1, 0
+            continue
+        if focused_count < 2:
+            vols = [xvol[i] if len(xvol) > i else -100 for xvol in people_vols]
+            ranked = sorted(enumerate(vols), key=lambda x: x[1], reverse=True)
+            first = ranked[0]
+            second = ranked[1] if len(ranked) > 1 else None
+            if second is None or first[1] * 0.05 > second[1]:
+                final_segments.append((first[0] + 1, sec, 5))
+                unfocused_count, focused_count = 0, focused_count + 1
+                continue
+        final_segments.append((0, sec, 5))
+        unfocused_count, focused_count = unfocused_count + 1, 0
+
+    merged = [final_segments[0]]
+    for idx, start, duration in final_segments[1:]:
+        cur_idx, cur_start, cur_duration = merged[-1]
+        if idx == cur_idx and abs(cur_start + cur_duration - start) < 1e-3:
+            merged[-1] = (cur_idx, cur_start, cur_duration + duration)
+        else:
+            merged.append((idx, start, duration))
+    return merged
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_plan_matches_old_loop(seed):
+    rng = np.random.default_rng(seed)
+    people = int(rng.integers(1, 5))
+    main_duration = float(rng.uniform(30, 900))
+    person_durations = [float(rng.uniform(0.5, 1.1) * main_duration) for _ in range(people)]
+
+    average_volumes = [[0.0]]
+    for duration in person_durations:
+        buckets = int(duration // 5)
+        # mostly silence with a dominant voice now and then, and some ties
+        vols = rng.choice([0.0, 0.01, 0.3, 1.0], size=buckets, p=[0.3, 0.3, 0.2, 0.2])
+        average_volumes.append(vols.tolist())
+
+    screenshares = []
+    for _ in range(int(rng.integers(0, 4))):
+        start = float(rng.uniform(0, main_duration))
+        screenshares.append((start, start + float(rng.uniform(5, 60))))
+
+    planned = plan_multicam(average_volumes, main_duration, person_durations, screenshares)
+    expected = _loop_plan(average_volumes, main_duration, person_durations, screenshares)
+    assert planned == [(idx, float(start), float(duration)) for idx, start, duration in expected]
+
+
+def test_merge_choices():
+    assert merge_choices(np.array([], dtype=np.int64), 5.0) == []
+    assert merge_choices(np.array([0, 0, 2, 2, 2, 1, 0]), 5.0) == [
+        (0, 0.0, 10.0),
+        (2, 10.0, 15.0),
+        (1, 25.0, 5.0),
+        (0, 30.0, 5.0),
+    ]
+    assert merge_choices(np.array([3]), 2.5) == [(3, 0.0, 2.5)]